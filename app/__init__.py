@@ -1,26 +1,30 @@
+import time
+_import_started = time.perf_counter()
+
 from whitenoise import WhiteNoise
-from flask import Flask, g, render_template
+from flask import Flask, render_template
+import click
 import os
 from config import Config
 
-def create_app():
-    app = Flask(__name__)
+_import_finished = time.perf_counter()
 
-    print(f"App template folder: {app.template_folder}")
-    print(f"App root path: {app.root_path}")
-    print(f"Full template path: {os.path.join(app.root_path, app.template_folder)}")
+def create_app():
+    started = time.perf_counter()
+    timings = {'import': (_import_finished - _import_started) * 1000}
 
-    template_dir = os.path.join(app.root_path, app.template_folder)
-    if os.path.exists(template_dir):
-        print(f"Files in template directory: {os.listdir(template_dir)}")
-    else:
-        print(f"Template directory does not exist: {template_dir}")
+    app = Flask(__name__)
 
     app.wsgi_app = WhiteNoise(app.wsgi_app, root='app/static/', prefix='static/')
 
-    app.config.from_object(Config)
+    app.config.from_object(Config())
     app.config['CACHE_FOLDER'] = '/tmp/cache'
 
+    if app.config['TRUSTED_PROXIES']:
+        # remote_addr becomes the client, as seen by the outermost trusted proxy
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+
     os.makedirs(app.config['CACHE_FOLDER'], exist_ok=True)
     if not app.config.get('IS_PRODUCTION'):
         try:
@@ -32,14 +36,30 @@ def create_app():
         except Exception as e:
             app.logger.warning(f"Could not create upload directories: {e}")
 
+    timings['config'] = (time.perf_counter() - started) * 1000
+    checkpoint = time.perf_counter()
+
+    try:
+        from app.database import close_db
+        app.teardown_appcontext(close_db)
+    except Exception as e:
+        app.logger.warning(f"Could not register database teardown: {e}")
+
+    bootstrap_ran = None
     try:
-        from app.database import init_db, close_db
+        from app.database import init_db
         with app.app_context():
-            init_db(app.config)
-        app.logger.info("Database initialized successfully")
+            bootstrap_ran = init_db(app.config)
+        if bootstrap_ran:
+            app.logger.info("Database initialized successfully")
+        else:
+            app.logger.info("Schema fingerprint matches, skipped database bootstrap")
     except Exception as e:
         app.logger.exception(f"Error initializing database: {e}")
 
+    timings['db_bootstrap'] = (time.perf_counter() - checkpoint) * 1000
+    checkpoint = time.perf_counter()
+
     try:
         from app.routes.main import main_bp
         app.register_blueprint(main_bp)
@@ -92,18 +112,23 @@ def create_app():
         raise
 
     try:
-        from app.database import close_db
-        app.teardown_appcontext(close_db)
-    except Exception as e:
-        app.logger.warning(f"Could not register database teardown: {e}")
-
-    try:
-        from app.services.storage_service import optimize_image_url, get_file_url
+        from app.services.storage_service import optimize_image_url, get_file_url, responsive_image_attrs
 
         @app.template_global()
         def get_optimized_url(stored_path, size='medium', quality=85):
             return optimize_image_url(stored_path, size, quality)
 
+        @app.template_global()
+        def responsive_image(stored_path, width=None, height=None, size='medium', sizes='100vw', style=None,
+                             placeholder=None, color=None):
+            return responsive_image_attrs(stored_path, width, height, size, sizes, style, placeholder, color)
+
+        from app.services.outfit_service import outfit_image_attrs
+
+        @app.template_global()
+        def outfit_image(oc, version, sizes='100vw', placeholder=None, color=None):
+            return outfit_image_attrs(oc, version, sizes, placeholder, color)
+
         @app.template_global()
         def get_file_url_global(stored_path):
             return get_file_url(stored_path)
@@ -116,12 +141,70 @@ def create_app():
         def get_optimized_url(stored_path, size='medium', quality=85):
             return f"/static/uploads/{stored_path}"
 
+        @app.template_global()
+        def responsive_image(stored_path, width=None, height=None, size='medium', sizes='100vw', style=None,
+                             placeholder=None, color=None):
+            from markupsafe import Markup, escape
+            attrs = f'src="/static/uploads/{escape(stored_path)}"'
+            if style:
+                attrs += f' style="{escape(style)}"'
+            return Markup(attrs)
+
+        @app.template_global()
+        def outfit_image(oc, version, sizes='100vw', placeholder=None, color=None):
+            return responsive_image(oc['base_image'])
+
         @app.template_global()
         def get_file_url_global(stored_path):
             return f"/static/uploads/{stored_path}"
         
         app.logger.info("Fallback template globals registered")
 
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """Fail if any query the app issues needs a full table scan, or a request fails"""
+        from app.query_plans import check_query_plans
+
+        failures, problems = check_query_plans(app)
+        for request_line, problem in problems:
+            print(f"REQUEST FAILED ({problem}): {request_line}")
+        for statement, scans in failures:
+            print(f"FULL SCAN ({', '.join(scans)}): {statement}")
+        if failures or problems:
+            raise SystemExit(1)
+        print("No full table scans found")
+
+    @app.cli.command('backfill-images')
+    @click.option('--force', is_flag=True, help='Recompute placeholders that are already set')
+    def backfill_images_command(force):
+        """Compute placeholders, colors and missing dimensions for existing images"""
+        from app.backfill import backfill_images
+
+        updated, failed = backfill_images(app, force)
+        print(f"Backfilled {updated} images, {failed} failed")
+        if failed:
+            raise SystemExit(1)
+
+    @app.cli.command('build-geoip')
+    @click.argument('source', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--locations', type=click.Path(exists=True, dir_okay=False),
+                  help='GeoLite2 country locations CSV, for a GeoLite2 blocks file')
+    @click.option('--output', type=click.Path(dir_okay=False), help='Defaults to GEOIP_DB_PATH')
+    def build_geoip_command(source, locations, output):
+        """Build the comment country table from a CSV or .mmdb range dump"""
+        from app.geoip import build_table, read_csv_ranges, read_mmdb_ranges
+
+        if source.endswith('.mmdb'):
+            ranges = read_mmdb_ranges(source)
+        else:
+            ranges = read_csv_ranges(source, locations)
+        output = output or app.config['GEOIP_DB_PATH']
+        try:
+            v4, v6 = build_table(ranges, output)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        print(f"Wrote {v4} IPv4 and {v6} IPv6 ranges to {output}")
+
     @app.errorhandler(500)
     def internal_error(error):
         app.logger.exception(f"500 error: {error}")
@@ -144,5 +227,18 @@ def create_app():
             app.logger.exception(f"Error rendering 404 template: {template_error}")
             return f"<h1>404 Page Not Found</h1><p>{str(error)}</p>", 404
 
+    timings['blueprints'] = (time.perf_counter() - checkpoint) * 1000
+    timings['total'] = (time.perf_counter() - _import_started) * 1000
+    app.config['STARTUP_TIMINGS'] = {
+        'timings_ms': {name: round(value, 1) for name, value in timings.items()},
+        'db_bootstrap_ran': bootstrap_ran,
+        'budget_ms': app.config.get('COLD_START_BUDGET_MS'),
+    }
+
+    summary = ' '.join(f"{name}={value:.1f}ms" for name, value in timings.items())
+    app.logger.info(f"Cold start: {summary}")
+    if timings['total'] > app.config.get('COLD_START_BUDGET_MS', 500):
+        app.logger.warning(f"Cold start over budget ({app.config.get('COLD_START_BUDGET_MS')}ms): {summary}")
+
     app.logger.info("Flask app created successfully")
     return app
@@ -0,0 +1,93 @@
+import hashlib
+from app.database import execute_batch, invalidate_tables
+from app.process_pool import DEFAULT_WORKERS, submit_to_pool
+from app.services.image_service import render_placeholder
+from app.services.storage_service import read_stored
+
+# (table, stored path column, column prefix) for every image the site
+# renders; the prefix names the <prefix>width/height/placeholder/color columns
+IMAGE_COLUMNS = (
+    ('gallery_images', 'filename', ''),
+    ('ocs', 'base_image', 'base_'),
+    ('ocs', 'profile_image', 'profile_'),
+    ('blog_posts', 'featured_image', 'featured_'),
+    ('oc_clothing', 'filename', ''),
+)
+
+def _backfill_batch(app, table, column, prefix, rows, workers):
+    """Render placeholders for one batch of rows and write them in one transaction
+
+    Returns (updated, failed) counts for the batch.
+    """
+    failed = 0
+    jobs = []
+    for row in rows:
+        try:
+            source = read_stored(row['path'])
+            digest = hashlib.sha256(source).hexdigest()
+            jobs.append((row, digest, len(source), submit_to_pool(render_placeholder, source, max_workers=workers)))
+        except Exception as e:
+            app.logger.error(f"Could not read {row['path']}: {e}")
+            failed += 1
+
+    statements = []
+    stored = []
+    for row, digest, size, future in jobs:
+        try:
+            image = future.result()
+        except Exception as e:
+            app.logger.error(f"Could not render a placeholder for {row['path']}: {e}")
+            failed += 1
+            continue
+        # Dimensions recorded at upload win over the re-derived ones
+        statements.append((f'''
+            UPDATE {table} SET
+                {prefix}placeholder = ?,
+                {prefix}color = ?,
+                {prefix}width = COALESCE({prefix}width, ?),
+                {prefix}height = COALESCE({prefix}height, ?)
+            WHERE id = ?
+        ''', (image['placeholder'], image['color'], image['width'], image['height'], row['id']), None))
+        stored.append(('''
+            INSERT INTO stored_images (digest, path, bytes, width, height, placeholder, color)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (digest) DO NOTHING
+        ''', (digest, row['path'], size, image['width'], image['height'],
+              image['placeholder'], image['color']), None))
+
+    if statements:
+        execute_batch(statements + stored, transaction=True)
+        invalidate_tables(table)
+    return len(statements), failed
+
+def backfill_images(app, force=False):
+    """Fill in placeholders, colors and missing dimensions for existing images
+
+    Each image read is also registered in stored_images, so new uploads of
+    the same content reuse it. Rows that already have a placeholder are
+    skipped unless force is set. Rows are read, rendered and committed a
+    batch at a time (twice the worker count), so memory stays bounded and
+    an interrupted run keeps what it finished. Returns (updated, failed)
+    counts.
+    """
+    updated = failed = 0
+    with app.app_context():
+        workers = app.config.get('IMAGE_WORKERS')
+        batch_size = (workers or DEFAULT_WORKERS) * 2
+        for table, column, prefix in IMAGE_COLUMNS:
+            condition = f'{column} IS NOT NULL'
+            if not force:
+                condition += f' AND {prefix}placeholder IS NULL'
+            last_id = 0
+            while True:
+                rows = execute_batch([(
+                    f'SELECT id, {column} AS path FROM {table} WHERE {condition} AND id > ? ORDER BY id LIMIT ?',
+                    (last_id, batch_size), 'all'
+                )])[0] or []
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                batch_updated, batch_failed = _backfill_batch(app, table, column, prefix, rows, workers)
+                updated += batch_updated
+                failed += batch_failed
+    return updated, failed
@@ -0,0 +1,195 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import requests
+
+BLOB_API_VERSION = '7'
+
+# Vercel Blob rejects multipart parts under 5MB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Status codes worth another attempt; other 4xx are the caller's fault
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    """Keep-alive session for Blob, separate from the Turso transport
+
+    Uploads hold connections for as long as a part takes, so sharing
+    app.http_pool's session would make database calls wait behind them and
+    fold Blob traffic into its /api/pool_stats counters.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = requests.Session()
+    return _session
+
+class BlobError(Exception):
+    """A Blob API call failed for good (after any retries)"""
+
+class _Retryable(Exception):
+    """Internal: a failure that may succeed on another attempt"""
+
+class BlobClient:
+    """Uploads to Vercel Blob's REST API without buffering whole files
+
+    Files up to multipart_threshold go up in one PUT. Anything larger uses
+    the multipart protocol (create, upload parts, complete): parts are read
+    from the stream one at a time and uploaded on `concurrency` threads,
+    with at most that many parts in memory. An upload whose parts fail is
+    aborted so the parts already sent are not left behind. Each request is retried with
+    exponential backoff and jitter.
+
+    api_url is configurable (BLOB_API_URL) so a local stand-in server can
+    take the place of blob.vercel-storage.com.
+    """
+    def __init__(self, token, api_url='https://blob.vercel-storage.com', part_size=8 * 1024 * 1024,
+                 multipart_threshold=8 * 1024 * 1024, concurrency=3, retries=3, backoff=0.5,
+                 timeout=30, session=None):
+        self.token = token
+        self.api_url = api_url.rstrip('/')
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.multipart_threshold = multipart_threshold
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = session or _get_session()
+
+    def _headers(self, content_type=None, **extra):
+        headers = {
+            'Authorization': f'Bearer {self.token}',
+            'x-api-version': BLOB_API_VERSION,
+            # Stored names are already unique
+            'x-add-random-suffix': '0',
+        }
+        if content_type:
+            headers['x-content-type'] = content_type
+        headers.update(extra)
+        return headers
+
+    def _request(self, method, path, pathname, headers, data=None):
+        """One API call with retries; returns the decoded JSON body"""
+        url = f'{self.api_url}{path}?pathname={quote(pathname)}'
+        for attempt in range(self.retries + 1):
+            try:
+                try:
+                    response = self.session.request(method, url, headers=headers, data=data, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    raise _Retryable(str(e))
+                if response.status_code in RETRY_STATUSES:
+                    raise _Retryable(f'{response.status_code} {response.text[:200]}')
+                if not response.ok:
+                    raise BlobError(f'Blob {method} {path} failed: {response.status_code} {response.text[:200]}')
+                return response.json()
+            except _Retryable as e:
+                if attempt == self.retries:
+                    raise BlobError(f'Blob {method} {path} failed after {attempt + 1} attempts: {e}')
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+    def put(self, pathname, stream, content_type=None):
+        """Upload a binary stream to pathname and return the blob URL"""
+        head = _read_full(stream, self.multipart_threshold + 1)
+        if len(head) <= self.multipart_threshold:
+            result = self._request('PUT', '/', pathname, self._headers(content_type), head)
+        else:
+            result = self._put_multipart(pathname, head, stream, content_type)
+        return result['url']
+
+    def _put_multipart(self, pathname, head, stream, content_type):
+        created = self._request('POST', '/mpu', pathname, self._headers(content_type, **{'x-mpu-action': 'create'}))
+        upload_headers = {
+            'x-mpu-action': 'upload',
+            'x-mpu-key': quote(created['key'], safe=''),
+            'x-mpu-upload-id': created['uploadId'],
+        }
+
+        def upload_part(number, data):
+            try:
+                headers = self._headers(content_type, **upload_headers, **{'x-mpu-part-number': str(number)})
+                return {'partNumber': number, 'etag': self._request('POST', '/mpu', pathname, headers, data)['etag']}
+            finally:
+                slots.release()
+
+        # Bounds the parts that are read but not yet uploaded
+        slots = threading.BoundedSemaphore(self.concurrency)
+        futures = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                try:
+                    buffer = head
+                    number = 1
+                    while True:
+                        slots.acquire()
+                        if len(buffer) < self.part_size:
+                            buffer += _read_full(stream, self.part_size - len(buffer))
+                        if not buffer:
+                            slots.release()
+                            break
+                        futures.append(executor.submit(upload_part, number, buffer))
+                        buffer = b''
+                        number += 1
+                        # Stop reading early once a part has failed for good
+                        if any(future.done() and future.exception() for future in futures):
+                            break
+                    parts = [future.result() for future in futures]
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        except BaseException:
+            # Parts still in flight have finished once the executor is shut down
+            self._abort_multipart(pathname, content_type, upload_headers)
+            raise
+
+        complete_headers = self._headers(content_type, **{
+            **upload_headers,
+            'x-mpu-action': 'complete',
+            'Content-Type': 'application/json',
+        })
+        return self._request('POST', '/mpu', pathname, complete_headers, json.dumps(parts))
+
+    def _abort_multipart(self, pathname, content_type, upload_headers):
+        """Ask the API to discard an unfinished upload's parts
+
+        Best effort and a single attempt: the caller is already raising the
+        error that made the upload fail, which matters more than this one.
+        """
+        headers = self._headers(content_type, **{**upload_headers, 'x-mpu-action': 'abort'})
+        try:
+            self.session.request(
+                'POST', f'{self.api_url}/mpu?pathname={quote(pathname)}',
+                headers=headers, timeout=self.timeout
+            )
+        except requests.RequestException:
+            pass
+
+def _read_full(stream, size):
+    """Read up to size bytes, looping over short reads"""
+    chunks = []
+    while size > 0:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def get_blob_client(config):
+    """Blob client configured from the app config"""
+    return BlobClient(
+        config.get('BLOB_READ_WRITE_TOKEN'),
+        api_url=config.get('BLOB_API_URL', 'https://blob.vercel-storage.com'),
+        part_size=config.get('BLOB_PART_SIZE', 8 * 1024 * 1024),
+        multipart_threshold=config.get('BLOB_MULTIPART_THRESHOLD', 8 * 1024 * 1024),
+        concurrency=config.get('BLOB_UPLOAD_CONCURRENCY', 3),
+        retries=config.get('BLOB_UPLOAD_RETRIES', 3),
+        timeout=config.get('BLOB_TIMEOUT', 30),
+    )
@@ -1,7 +1,12 @@
 from flask import g, current_app
 import sqlite3
 import requests
-import json
+import base64
+import hashlib
+import os
+from collections.abc import Sequence
+from app.http_pool import get_session
+from app.query_cache import get_cache, cache_key, tables_in
 
 def get_db():
     """Get database connection for current request"""
@@ -13,12 +18,18 @@ def get_db():
                 # Production: Use HTTP client for Turso instead of libsql-client
                 g.db = TursoHTTPClient(
                     url=config['TURSO_DATABASE_URL'],
-                    auth_token=config['TURSO_AUTH_TOKEN']
+                    auth_token=config['TURSO_AUTH_TOKEN'],
+                    session=get_session(
+                        pool_size=config.get('TURSO_POOL_SIZE', 10),
+                        idle_timeout=config.get('TURSO_POOL_IDLE_TIMEOUT', 60)
+                    )
                 )
             else:
                 # Development: Use SQLite
                 g.db = sqlite3.connect(config['DATABASE_URL'])
                 g.db.row_factory = sqlite3.Row
+                if config.get('SQL_TRACE_CALLBACK'):
+                    g.db.set_trace_callback(config['SQL_TRACE_CALLBACK'])
         except Exception as e:
             current_app.logger.exception(f"Error connecting to database: {e}")
             # Fallback to SQLite if Turso connection fails
@@ -30,7 +41,7 @@ def get_db():
 
 class TursoHTTPClient:
     """HTTP client for Turso database"""
-    def __init__(self, url, auth_token):
+    def __init__(self, url, auth_token, session=None):
         # Extract database name from libsql URL
         if url.startswith('libsql://'):
             db_host = url.replace('libsql://', '')
@@ -44,121 +55,274 @@ class TursoHTTPClient:
             self.base_url = url.rstrip('/') + '/v2/pipeline'
         
         self.auth_token = auth_token
-        self.session = requests.Session()
-        self.session.headers.update({
+        # The session is the shared keep-alive transport, so auth goes on
+        # each request rather than on the session
+        self.session = session or get_session()
+        self.headers = {
             'Authorization': f'Bearer {auth_token}',
             'Content-Type': 'application/json'
-        })
+        }
+
+        # Hrana stream state, kept for the lifetime of the client so that
+        # consecutive statements share one server stream
+        self.baton = None
     
-    def execute(self, query, params=None):
-        """Execute query via HTTP using Turso's v2/pipeline API"""
+    def _format_args(self, params):
+        """Format query parameters as Hrana values"""
+        args = []
+        if params:
+            for param in params:
+                if param is None:
+                    args.append({"type": "null", "value": None})
+                elif isinstance(param, bool):
+                    # Convert boolean to integer (True=1, False=0)
+                    args.append({"type": "integer", "value": str(int(param))})
+                elif isinstance(param, int):
+                    args.append({"type": "integer", "value": str(param)})
+                elif isinstance(param, float):
+                    args.append({"type": "float", "value": str(param)})
+                elif isinstance(param, str):
+                    args.append({"type": "text", "value": param})
+                else:
+                    args.append({"type": "text", "value": str(param)})
+        return args
+
+    def _stmt(self, query, params=None):
+        """Build a Hrana statement object"""
+        stmt = {"sql": query}
+        args = self._format_args(params)
+        if args:
+            stmt["args"] = args
+        return stmt
+
+    def _pipeline(self, requests_list, close=False):
+        """Send a list of pipeline requests on the current stream"""
+        all_requests = requests_list
+        if close:
+            all_requests = all_requests + [{"type": "close"}]
+
+        request_data = {"baton": self.baton, "requests": all_requests}
+
         try:
-            # Format parameters for Turso API
-            args = []
-            if params:
-                for param in params:
-                    if param is None:
-                        args.append({"type": "null", "value": None})
-                    elif isinstance(param, bool):
-                        # Convert boolean to integer (True=1, False=0)
-                        args.append({"type": "integer", "value": str(int(param))})
-                    elif isinstance(param, int):
-                        args.append({"type": "integer", "value": str(param)})
-                    elif isinstance(param, float):
-                        args.append({"type": "float", "value": str(param)})
-                    elif isinstance(param, str):
-                        args.append({"type": "text", "value": param})
-                    else:
-                        args.append({"type": "text", "value": str(param)})
-            
-            # Format the request for Turso's v2/pipeline API
-            request_data = {
-                "requests": [
-                    {
-                        "type": "execute",
-                        "stmt": {
-                            "sql": query
-                        }
-                    },
-                    {
-                        "type": "close"
-                    }
-                ]
-            }
-            
-            # Add parameters if provided
-            if args:
-                request_data["requests"][0]["stmt"]["args"] = args
-            
-            # Make the request
-            response = self.session.post(self.base_url, json=request_data, timeout=10)
-            
+            response = self.session.post(self.base_url, json=request_data, headers=self.headers, timeout=10)
+
             # Log the response for debugging
             current_app.logger.debug(f"Turso response status: {response.status_code}")
             current_app.logger.debug(f"Turso response: {response.text}")
-            
+
             response.raise_for_status()
-            
-            result_data = response.json()
-            
-            # Return a result object that mimics libsql-client behavior
-            return TursoResult(result_data)
-            
+
+            response_data = response.json()
         except requests.exceptions.RequestException as e:
+            # The stream is unusable once a request fails
+            self.baton = None
             current_app.logger.error(f"HTTP error executing Turso query: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 current_app.logger.error(f"Response content: {e.response.text}")
             raise
+
+        # Keep the stream open for the next request
+        self.baton = response_data.get('baton')
+        if response_data.get('base_url'):
+            self.base_url = response_data['base_url'].rstrip('/') + '/v2/pipeline'
+
+        # Drop the close result, surface per-request errors
+        results = response_data.get('results', [])[:len(requests_list)]
+        for result in results:
+            if result.get('type') == 'error':
+                raise TursoError(result.get('error', {}).get('message', 'Unknown Turso error'))
+        return results
+
+    def execute(self, query, params=None):
+        """Execute query via HTTP using Turso's v2/pipeline API"""
+        try:
+            results = self._pipeline([
+                {"type": "execute", "stmt": self._stmt(query, params)}
+            ])
+            # Return a result object that mimics libsql-client behavior
+            return TursoResult(results[0]['response'].get('result'))
+        except requests.exceptions.RequestException:
+            raise
         except Exception as e:
             current_app.logger.exception(f"Error executing Turso query: {e}")
             raise
+
+    def execute_batch(self, statements, transaction=False):
+        """Execute several statements in a single pipeline request
+
+        statements is a list of (query, params) pairs. Returns one TursoResult
+        per statement. The statements run as one Hrana batch, each step
+        conditional on the one before, so like the SQLite fallback nothing
+        runs after the first failure. With transaction=True the batch is
+        also wrapped in BEGIN/COMMIT and rolled back on failure.
+        """
+        if not statements:
+            return []
+
+        try:
+            steps = [{"stmt": {"sql": "BEGIN"}}] if transaction else []
+            first = len(steps)
+            for query, params in statements:
+                step = {"stmt": self._stmt(query, params)}
+                if steps:
+                    step["condition"] = {"type": "ok", "step": len(steps) - 1}
+                steps.append(step)
+            end = len(steps)
+            if transaction:
+                # COMMIT if everything succeeded, ROLLBACK otherwise
+                steps.append({
+                    "stmt": {"sql": "COMMIT"},
+                    "condition": {"type": "ok", "step": end - 1}
+                })
+                steps.append({
+                    "stmt": {"sql": "ROLLBACK"},
+                    "condition": {"type": "not", "cond": {"type": "ok", "step": end}}
+                })
+
+            results = self._pipeline([{"type": "batch", "batch": {"steps": steps}}])
+            batch_result = results[0]['response']['result']
+
+            for error in batch_result.get('step_errors', []):
+                if error:
+                    raise TursoError(error.get('message', 'Unknown Turso error'))
+
+            step_results = batch_result.get('step_results', [])
+            return [TursoResult(result) for result in step_results[first:end]]
+        except requests.exceptions.RequestException:
+            raise
+        except Exception as e:
+            current_app.logger.exception(f"Error executing Turso batch: {e}")
+            raise
     
     def close(self):
-        """Close the session"""
-        self.session.close()
+        """Close the stream, keeping the pooled connection alive"""
+        try:
+            if self.baton:
+                self._pipeline([], close=True)
+        finally:
+            self.baton = None
+
+class TursoError(Exception):
+    """Error returned by Turso for a statement"""
+    pass
+
+def _decode_value(cell):
+    """Convert a Hrana value to the matching Python type"""
+    if not isinstance(cell, dict):
+        return cell
+    value_type = cell.get('type')
+    if value_type == 'text':
+        return cell['value']
+    if value_type == 'integer':
+        return int(cell['value'])
+    if value_type == 'null':
+        return None
+    if value_type == 'float':
+        return float(cell['value'])
+    if value_type == 'blob':
+        return base64.b64decode(cell.get('base64', ''))
+    return cell.get('value')
+
+class TursoRow:
+    """Lightweight result row backed by a tuple
+
+    Supports row['name'], row[0] and row.name, and behaves like
+    sqlite3.Row for keys() and dict(row). The column map is shared by all
+    rows of a result.
+    """
+    __slots__ = ('_columns', '_values')
+
+    def __init__(self, columns, values):
+        self._columns = columns
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._values[self._columns[key]]
+        return self._values[key]
+
+    def __getattr__(self, name):
+        try:
+            return self._values[self._columns[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, TursoRow):
+            return self._columns.keys() == other._columns.keys() and self._values == other._values
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TursoRow({dict(self)!r})"
+
+    def keys(self):
+        return list(self._columns)
+
+    def get(self, key, default=None):
+        index = self._columns.get(key)
+        return default if index is None else self._values[index]
+
+class TursoRows(Sequence):
+    """Rows of a Turso result, decoded lazily as they are accessed"""
+    __slots__ = ('_columns', '_raw')
+
+    def __init__(self, columns, raw_rows):
+        self._columns = columns
+        self._raw = raw_rows
+
+    def _decode(self, raw):
+        return TursoRow(self._columns, tuple(_decode_value(cell) for cell in raw))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(raw) for raw in self._raw[index]]
+        return self._decode(self._raw[index])
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __iter__(self):
+        decode = self._decode
+        for raw in self._raw:
+            yield decode(raw)
+
+    def __bool__(self):
+        return bool(self._raw)
 
 class TursoResult:
-    """Result wrapper for Turso HTTP responses"""
+    """Result wrapper for a single Turso statement result"""
+    __slots__ = ('_rows', 'lastrowid', 'rowcount')
+
     def __init__(self, result_data):
-        self.result_data = result_data
-        self._rows = None
-    
+        result_data = result_data or {}
+
+        # Build the column-index map once for the whole result
+        columns = {}
+        for i, col in enumerate(result_data.get('cols', [])):
+            columns.setdefault(col.get('name') or f'col_{i}', i)
+
+        self._rows = TursoRows(columns, result_data.get('rows', []))
+
+        # Row id of the last inserted row and number of rows changed,
+        # like sqlite3 cursors
+        last_insert_rowid = result_data.get('last_insert_rowid')
+        self.lastrowid = int(last_insert_rowid) if last_insert_rowid is not None else None
+        self.rowcount = result_data.get('affected_row_count', 0)
+
     @property
     def rows(self):
         """Get rows from the result"""
-        if self._rows is None:
-            self._rows = []
-            
-            # Handle Turso's v2/pipeline API response format
-            if self.result_data and 'results' in self.result_data:
-                results = self.result_data['results']
-                # Look for the execute result (not the close result)
-                for result in results:
-                    if result.get('type') == 'ok' and 'response' in result:
-                        response = result['response']
-                        if 'result' in response:
-                            result_obj = response['result']
-                            
-                            # Get column names and rows
-                            columns = result_obj.get('cols', [])
-                            rows = result_obj.get('rows', [])
-                            
-                            # Process each row
-                            for row_data in rows:
-                                if isinstance(row_data, list):
-                                    row_dict = {}
-                                    for i, cell in enumerate(row_data):
-                                        column_name = columns[i]['name'] if i < len(columns) else f'col_{i}'
-                                        # Extract value from cell object
-                                        if isinstance(cell, dict) and 'value' in cell:
-                                            row_dict[column_name] = cell['value']
-                                        else:
-                                            row_dict[column_name] = cell
-                                    self._rows.append(row_dict)
-                            break  # Found our execute result
-        
         return self._rows
 
+    def __iter__(self):
+        return iter(self._rows)
+
 def close_db(error):
     """Close database connection"""
     db = g.pop('db', None)
@@ -179,13 +343,7 @@ def execute_query(query, params=None, fetch=None):
             # Turso HTTP client
             result = db.execute(query, params)
 
-            if fetch == 'all':
-                return result.rows
-            elif fetch == 'one':
-                rows = result.rows
-                return rows[0] if rows else None
-            else:
-                return result
+            return _fetch_result(result, fetch)
         else:
             # SQLite
             cursor = db.cursor()
@@ -205,102 +363,250 @@ def execute_query(query, params=None, fetch=None):
         current_app.logger.exception(f"Error executing query: {e}")
         raise
 
-def init_db(config):
-    """Initialize database with tables"""
-    tables = [
-        '''CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            ip_address TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_admin BOOLEAN DEFAULT FALSE
-        )''',
-        '''CREATE TABLE IF NOT EXISTS gallery_images (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT NOT NULL,
-            title TEXT NOT NULL,
-            caption TEXT,
-            tags TEXT,
-            width INTEGER,
-            height INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''',
-        '''CREATE TABLE IF NOT EXISTS ocs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+def _fetch_result(result, fetch):
+    """Shape a Turso result the same way execute_query does"""
+    if fetch == 'all':
+        return result.rows
+    elif fetch == 'one':
+        rows = result.rows
+        return rows[0] if rows else None
+    return result
+
+def execute_batch(statements, transaction=False, cache=False):
+    """Execute several queries in one round trip
+
+    Each statement is a (query, params) or (query, params, fetch) tuple, with
+    fetch meaning the same as in execute_query. Returns one result per
+    statement. With transaction=True either every statement is applied or
+    none of them are.
+
+    cache=True serves every 'all'/'one' statement through the query cache; a
+    list of booleans selects statements individually. Only cache misses are
+    sent to the database.
+    """
+    statements = [tuple(stmt) + (None,) * (3 - len(stmt)) for stmt in statements]
+
+    query_cache = get_cache(current_app.config) if cache else None
+    if query_cache is None or transaction:
+        return _run_batch(statements, transaction)
+
+    flags = cache if isinstance(cache, (list, tuple)) else [True] * len(statements)
+    results = [None] * len(statements)
+    misses = []
+    for i, (query, params, fetch) in enumerate(statements):
+        key = None
+        if flags[i] and fetch in ('all', 'one'):
+            key = cache_key(query, params, fetch)
+            entry = query_cache.get(key)
+            if entry is not None:
+                results[i] = entry[0]
+                continue
+        misses.append((i, key))
+
+    if misses:
+        fresh = _run_batch([statements[i] for i, _ in misses], transaction)
+        for (i, key), result in zip(misses, fresh):
+            if key is not None:
+                query, _, fetch = statements[i]
+                result = _detach_rows(result, fetch)
+                # Wrapped in a tuple so a cached "no row" is not a miss
+                query_cache.set(key, (result,), tables_in(query))
+            results[i] = result
+
+    return results
+
+def cached_query(query, params=None, fetch='all'):
+    """execute_query for reads that go through the query cache"""
+    return execute_batch([(query, params, fetch)], cache=True)[0]
+
+def invalidate_tables(*tables):
+    """Drop cached results that read from any of the given tables"""
+    query_cache = get_cache(current_app.config)
+    if query_cache is not None:
+        query_cache.invalidate(*tables)
+
+def get_cache_stats():
+    """Return query cache counters, or None when caching is off"""
+    query_cache = get_cache(current_app.config)
+    if query_cache is None:
+        return None
+    stats = query_cache.stats.snapshot()
+    stats['entries'] = len(query_cache)
+    return stats
+
+def _detach_rows(result, fetch):
+    """Copy rows into plain dicts that are safe to cache and share"""
+    if fetch == 'all':
+        return [dict(row) for row in result]
+    if fetch == 'one':
+        return dict(result) if result is not None else None
+    return result
+
+def _run_batch(statements, transaction=False):
+    """Send normalized (query, params, fetch) statements to the database"""
+    db = get_db()
+    config = current_app.config
+
+    try:
+        if config.get('IS_PRODUCTION'):
+            # Turso HTTP client: one pipeline request for the whole batch
+            results = db.execute_batch(
+                [(query, params) for query, params, _ in statements],
+                transaction=transaction
+            )
+            return [
+                _fetch_result(result, fetch)
+                for result, (_, _, fetch) in zip(results, statements)
+            ]
+        else:
+            # SQLite
+            results = []
+            if transaction:
+                # sqlite3 only opens transactions implicitly for DML, so
+                # begin explicitly to cover DDL statements as well
+                if db.in_transaction:
+                    db.commit()
+                db.execute('BEGIN')
+            try:
+                for query, params, fetch in statements:
+                    cursor = db.cursor()
+                    if params:
+                        cursor.execute(query, params)
+                    else:
+                        cursor.execute(query)
+
+                    if fetch == 'all':
+                        results.append(cursor.fetchall())
+                    elif fetch == 'one':
+                        results.append(cursor.fetchone())
+                    else:
+                        results.append(cursor)
+                db.commit()
+            except Exception:
+                if transaction:
+                    db.rollback()
+                else:
+                    db.commit()
+                raise
+            return results
+    except Exception as e:
+        current_app.logger.exception(f"Error executing batch: {e}")
+        raise
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+def split_statements(sql):
+    """Split a SQL script into complete statements (trigger bodies included)"""
+    statements = []
+    buffer = ''
+    for line in sql.splitlines(keepends=True):
+        if not buffer and (not line.strip() or line.lstrip().startswith('--')):
+            continue
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip().rstrip(';').strip())
+            buffer = ''
+    if buffer.strip():
+        statements.append(buffer.strip().rstrip(';').strip())
+    return statements
+
+def load_migrations():
+    """Return (version, name, statements) for every migration file, in order
+
+    Migration files live in app/migrations and are named NNNN_description.sql.
+    """
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith('.sql'):
+            continue
+        version, _, name = filename[:-4].partition('_')
+        if not version.isdigit():
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as f:
+            migrations.append((int(version), name, split_statements(f.read())))
+    return migrations
+
+def run_migrations():
+    """Apply pending migrations and return the resulting schema version
+
+    Each migration runs in its own transaction together with the
+    schema_version row that records it.
+    """
+    _, row = execute_batch([
+        ('''CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
             name TEXT NOT NULL,
-            base_image TEXT NOT NULL,
-            profile_image TEXT,
-            description TEXT,
-            age TEXT,
-            personality TEXT,
-            backstory TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''',
-        '''CREATE TABLE IF NOT EXISTS oc_clothing (
-            id INTEGER PRIMARY KEY,
-            oc_id INTEGER,
-            item_name TEXT NOT NULL,
-            filename TEXT NOT NULL,
-            category TEXT,
-            z_index INTEGER DEFAULT 1,
-            FOREIGN KEY (oc_id) REFERENCES ocs (id)
-        )''',
-        '''CREATE TABLE IF NOT EXISTS blog_posts (
-            id INTEGER PRIMARY KEY,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            summary TEXT,
-            featured_image TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''',
-        '''CREATE TABLE IF NOT EXISTS comments (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER,
-            content_type TEXT NOT NULL,
-            content_id INTEGER NOT NULL,
-            parent_id INTEGER,
-            content TEXT NOT NULL,
-            country TEXT,
-            upvotes INTEGER DEFAULT 0,
-            downvotes INTEGER DEFAULT 0,
-            flagged BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (parent_id) REFERENCES comments (id)
-        )''',
-        '''CREATE TABLE IF NOT EXISTS comment_votes (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER,
-            comment_id INTEGER,
-            vote_type TEXT CHECK(vote_type IN ('up', 'down')),
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (comment_id) REFERENCES comments (id),
-            UNIQUE(user_id, comment_id)
-        )''',
-        '''CREATE TABLE IF NOT EXISTS notifications (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER,
-            type TEXT NOT NULL,
-            title TEXT NOT NULL,
-            content TEXT,
-            link TEXT,
-            read BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )'''
-    ]
-    
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',),
+        ('SELECT MAX(version) AS version FROM schema_version', None, 'one'),
+    ])
+    current_version = (row['version'] if row else None) or 0
+
+    for version, name, statements in load_migrations():
+        if version <= current_version:
+            continue
+        current_app.logger.info(f"Applying migration {version:04d}_{name}")
+        execute_batch(
+            [(statement,) for statement in statements] +
+            [('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))],
+            transaction=True
+        )
+        current_version = version
+
+    return current_version
+
+def schema_fingerprint():
+    """Hash of every migration file, identifying the expected schema"""
+    digest = hashlib.sha256()
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if filename.endswith('.sql'):
+            digest.update(filename.encode('utf-8'))
+            with open(os.path.join(MIGRATIONS_DIR, filename), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+def stored_schema_fingerprint():
+    """Fingerprint recorded by the last full bootstrap, if any
+
+    app_meta is looked up first so a fresh database, which does not have
+    it yet, returns None without a failed query in the logs.
+    """
+    if not execute_query(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'app_meta'",
+        fetch='one'
+    ):
+        return None
+    row = execute_query(
+        'SELECT value FROM app_meta WHERE key = ?',
+        ('schema_fingerprint',),
+        fetch='one'
+    )
+    return row['value'] if row else None
+
+def init_db(config):
+    """Initialize database with migrations and the admin user
+
+    In the default 'fingerprint' bootstrap mode two small queries compare
+    the stored schema fingerprint with the migration files and skip the
+    rest when they match. Returns True if the full bootstrap ran.
+    """
     try:
-        # Execute all table creation queries
-        for table_sql in tables:
-            execute_query(table_sql)
+        fingerprint = schema_fingerprint()
+        if config.get('DB_BOOTSTRAP', 'fingerprint') == 'fingerprint':
+            if stored_schema_fingerprint() == fingerprint:
+                return False
+
+        run_migrations()
         
         # Create admin user if needed
         from app.auth import create_admin_user
         create_admin_user(config)
+
+        execute_query(
+            'INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)',
+            ('schema_fingerprint', fingerprint)
+        )
+        return True
         
     except Exception as e:
         current_app.logger.exception(f"Error initializing database: {e}")
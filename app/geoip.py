@@ -0,0 +1,251 @@
+import csv
+import ipaddress
+import mmap
+import os
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from app.query_cache import CacheStats
+
+# File layout, all big-endian so packed addresses sort like the numbers:
+#   header   MAGIC, v4 count, v6 count, country count, offset of countries
+#   v4       (first u32, last u32, country u16) per range, sorted
+#   v6       (first 16 bytes, last 16 bytes, country u16) per range, sorted
+#   countries (code 2 bytes, name length u8, UTF-8 name) each
+# Ranges never overlap, so the only candidate for an address is the last
+# range starting at or before it.
+MAGIC = b'GEOIP\x00\x01\x00'
+HEADER = struct.Struct('>8sIIII')
+V4_RECORD = struct.Struct('>IIH')
+V6_RECORD = struct.Struct('>16s16sH')
+
+class GeoIP:
+    """Country lookups against a memory-mapped range table
+
+    The table is searched in place (the OS pages in what binary search
+    touches) and only the country names are read up front. Recent answers
+    are kept in an LRU, since comments come in bursts from the same people.
+    """
+    def __init__(self, path, cache_size=4096):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.v4_count, self.v6_count, country_count, countries_at = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a geo-IP table")
+        self._v6_at = HEADER.size + self.v4_count * V4_RECORD.size
+
+        self.countries = []
+        offset = countries_at
+        for _ in range(country_count):
+            code = self._map[offset:offset + 2].decode('ascii')
+            length = self._map[offset + 2]
+            name = self._map[offset + 3:offset + 3 + length].decode('utf-8')
+            self.countries.append((code, name))
+            offset += 3 + length
+
+        self.cache_size = cache_size
+        self.stats = CacheStats()
+        self._cache = OrderedDict()  # address string -> (code, name) or None
+        self._lock = threading.Lock()
+
+    def _search(self, record, base, count, key):
+        """Country index of the range holding key, or None"""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if record.unpack_from(self._map, base + middle * record.size)[0] <= key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+        _, last, country = record.unpack_from(self._map, base + (low - 1) * record.size)
+        return country if key <= last else None
+
+    def lookup(self, address):
+        """(country code, country name) for an IP address string, or None
+
+        Private, loopback and malformed addresses give None.
+        """
+        with self._lock:
+            if address in self._cache:
+                self._cache.move_to_end(address)
+                self.stats.incr('hits')
+                return self._cache[address]
+        self.stats.incr('misses')
+
+        country = None
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            ip = None
+        if ip is not None and ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if ip is not None and ip.is_global:
+            if ip.version == 4:
+                index = self._search(V4_RECORD, HEADER.size, self.v4_count, int(ip))
+            else:
+                index = self._search(V6_RECORD, self._v6_at, self.v6_count, ip.packed)
+            if index is not None:
+                country = self.countries[index]
+
+        with self._lock:
+            self._cache[address] = country
+            self.stats.incr('stores')
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.stats.incr('evictions')
+        return country
+
+    def close(self):
+        self._map.close()
+
+def _networks(first, last):
+    """ip_address pair from the start/end or CIDR columns of a dump row"""
+    if last is None:
+        network = ipaddress.ip_network(first.strip(), strict=False)
+        return network[0], network[-1]
+
+    def parse(value):
+        value = value.strip()
+        # Some dumps give addresses as integers
+        return ipaddress.ip_address(int(value)) if value.isdigit() else ipaddress.ip_address(value)
+    return parse(first), parse(last)
+
+def read_csv_ranges(path, locations=None):
+    """Yield (first, last, code, name) from a CSV range dump
+
+    Understands the common layouts, with or without a header row:
+      first,last,code[,name]   (DB-IP / IP2Location style; addresses
+                                dotted, colon-separated or integers)
+      network,code[,name]      (CIDR per row)
+      GeoLite2 Country blocks  (network,geoname_id,...), given the
+                                matching locations CSV for code and name
+    """
+    geonames = {}
+    if locations:
+        with open(locations, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row.get('country_iso_code'):
+                    geonames[row['geoname_id']] = (row['country_iso_code'], row.get('country_name') or row['country_iso_code'])
+
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        for row in reader:
+            if not row or row[0].startswith('#'):
+                continue
+            try:
+                if geonames:
+                    if row[0] == 'network':
+                        continue
+                    # Fall back to the registered country for anycast/satellite blocks
+                    country = geonames.get(row[1]) or geonames.get(row[2])
+                    if country is None:
+                        continue
+                    first, last = _networks(row[0], None)
+                    yield first, last, country[0], country[1]
+                elif '/' in row[0]:
+                    first, last = _networks(row[0], None)
+                    yield first, last, row[1].strip().upper(), (row[2].strip() if len(row) > 2 else '') or row[1].strip().upper()
+                else:
+                    first, last = _networks(row[0], row[1])
+                    code = row[2].strip().upper()
+                    yield first, last, code, (row[3].strip() if len(row) > 3 else '') or code
+            except (ValueError, IndexError):
+                # Header rows and anything else that is not a range
+                continue
+
+def read_mmdb_ranges(path):
+    """Yield (first, last, code, name) from a MaxMind-format .mmdb file
+
+    Needs the optional maxminddb package.
+    """
+    try:
+        import maxminddb
+    except ImportError:
+        raise ValueError("Reading .mmdb files needs the maxminddb package (pip install maxminddb)")
+
+    with maxminddb.open_database(path) as reader:
+        for network, record in reader:
+            country = (record or {}).get('country') or (record or {}).get('registered_country')
+            if not country or not country.get('iso_code'):
+                continue
+            name = country.get('names', {}).get('en') or country['iso_code']
+            yield network[0], network[-1], country['iso_code'], name
+
+def build_table(ranges, path):
+    """Write a range table for GeoIP from (first, last, code, name) tuples
+
+    Ranges are sorted, overlaps resolved in favour of the earlier start,
+    and neighbours with the same country merged. Written via a temp file
+    and rename, so a running reader never sees a partial table. Returns
+    (v4 ranges, v6 ranges) written.
+    """
+    countries = {}  # code -> index
+    names = []
+    v4, v6 = [], []
+    for first, last, code, name in ranges:
+        if first.version != last.version or int(last) < int(first):
+            continue
+        if code not in countries:
+            countries[code] = len(names)
+            names.append((code, name))
+        (v4 if first.version == 4 else v6).append((int(first), int(last), countries[code]))
+
+    def merge(entries):
+        merged = []
+        for first, last, country in sorted(entries):
+            if merged and first <= merged[-1][1]:
+                # Overlap: keep the earlier range, add only what sticks out
+                if last <= merged[-1][1]:
+                    continue
+                first = merged[-1][1] + 1
+            if merged and merged[-1][2] == country and merged[-1][1] + 1 == first:
+                merged[-1] = (merged[-1][0], last, country)
+            else:
+                merged.append((first, last, country))
+        return merged
+
+    v4, v6 = merge(v4), merge(v6)
+    if len(names) > 0xFFFF:
+        raise ValueError("Too many countries for the table format")
+
+    countries_at = HEADER.size + len(v4) * V4_RECORD.size + len(v6) * V6_RECORD.size
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(v4), len(v6), len(names), countries_at))
+        for first, last, country in v4:
+            f.write(V4_RECORD.pack(first, last, country))
+        for first, last, country in v6:
+            f.write(V6_RECORD.pack(first.to_bytes(16, 'big'), last.to_bytes(16, 'big'), country))
+        for code, name in names:
+            encoded = name.encode('utf-8')[:255]
+            f.write(code.encode('ascii', 'replace')[:2].ljust(2, b'?') + bytes([len(encoded)]) + encoded)
+    os.replace(tmp_path, path)
+    return len(v4), len(v6)
+
+_geoip = None
+_geoip_lock = threading.Lock()
+_geoip_missing = False
+
+def get_geoip(config):
+    """Return the process-wide GeoIP table, or None if there is none"""
+    global _geoip, _geoip_missing
+    if _geoip is None and not _geoip_missing:
+        with _geoip_lock:
+            if _geoip is None and not _geoip_missing:
+                path = config.get('GEOIP_DB_PATH')
+                if path and os.path.exists(path):
+                    _geoip = GeoIP(path, cache_size=config.get('GEOIP_CACHE_SIZE', 4096))
+                else:
+                    # Checked once; comments simply go untagged
+                    _geoip_missing = True
+    return _geoip
+
+def country_name(config, address):
+    """Country name for an IP address, or None when unknown"""
+    geoip = get_geoip(config)
+    country = geoip.lookup(address) if geoip and address else None
+    return country[1] if country else None
@@ -0,0 +1,128 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+class PoolStats:
+    """Thread-safe counters for the shared HTTP transport"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.handshakes = 0
+            self.requests = 0
+            self.pool_waits = 0
+            self.pool_wait_seconds = 0.0
+            self.evictions = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self):
+        """Return the counters as a dict"""
+        with self._lock:
+            return {
+                'handshakes': self.handshakes,
+                'requests': self.requests,
+                'reuses': max(self.requests - self.handshakes, 0),
+                'pool_waits': self.pool_waits,
+                'pool_wait_seconds': round(self.pool_wait_seconds, 6),
+                'evictions': self.evictions,
+            }
+
+stats = PoolStats()
+
+class CountingHTTPConnection(HTTPConnection):
+    """HTTP connection that counts new sockets"""
+    def connect(self):
+        stats.incr('handshakes')
+        super().connect()
+
+class CountingHTTPSConnection(HTTPSConnection):
+    """HTTPS connection that counts new sockets (TCP + TLS handshakes)"""
+    def connect(self):
+        stats.incr('handshakes')
+        super().connect()
+
+class _PooledMixin:
+    """Connection pool behaviour shared by the HTTP and HTTPS pools
+
+    Records how often callers wait for a free connection and closes
+    connections that sat idle longer than idle_timeout, so we never reuse a
+    socket the server (or a load balancer) has already given up on.
+    """
+    idle_timeout = 60
+
+    def _get_conn(self, timeout=None):
+        waited = self.pool is not None and self.pool.empty()
+        start = time.monotonic()
+        conn = super()._get_conn(timeout=timeout)
+        if waited:
+            stats.incr('pool_waits')
+            stats.incr('pool_wait_seconds', time.monotonic() - start)
+
+        last_used = getattr(conn, '_last_used', None)
+        if last_used is not None and time.monotonic() - last_used > self.idle_timeout:
+            if getattr(conn, 'sock', None) is not None:
+                stats.incr('evictions')
+            conn.close()
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._last_used = time.monotonic()
+        super()._put_conn(conn)
+
+    def _make_request(self, conn, *args, **kwargs):
+        stats.incr('requests')
+        return super()._make_request(conn, *args, **kwargs)
+
+class PooledHTTPConnectionPool(_PooledMixin, HTTPConnectionPool):
+    ConnectionCls = CountingHTTPConnection
+
+class PooledHTTPSConnectionPool(_PooledMixin, HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that uses the counting, idle-evicting pools"""
+    def __init__(self, pool_size=10, idle_timeout=60, **kwargs):
+        self.idle_timeout = idle_timeout
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        idle_timeout = self.idle_timeout
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('PooledHTTP', (PooledHTTPConnectionPool,), {'idle_timeout': idle_timeout}),
+            'https': type('PooledHTTPS', (PooledHTTPSConnectionPool,), {'idle_timeout': idle_timeout}),
+        }
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session(pool_size=10, idle_timeout=60):
+    """Return the process-wide keep-alive session
+
+    The session (and the sockets it holds) outlives individual Flask requests,
+    so warm serverless invocations skip DNS and TLS setup. Pool settings are
+    taken from the first call.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = PooledAdapter(pool_size=pool_size, idle_timeout=idle_timeout)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+def get_pool_stats():
+    """Return transport counters for monitoring"""
+    return stats.snapshot()
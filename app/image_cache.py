@@ -0,0 +1,211 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from app.query_cache import CacheStats
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-flight within a process only
+    fcntl = None
+
+DIGEST_MEMO_SIZE = 1024
+
+_digests = OrderedDict()  # (path, mtime_ns, size) -> sha256 hex
+_digests_lock = threading.Lock()
+
+def source_digest(path):
+    """sha256 of a file's content, memoized on (path, mtime, size)"""
+    stat = os.stat(path)
+    memo_key = (path, stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        digest = _digests.get(memo_key)
+        if digest is not None:
+            _digests.move_to_end(memo_key)
+            return digest
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _digests_lock:
+        _digests[memo_key] = digest
+        while len(_digests) > DIGEST_MEMO_SIZE:
+            _digests.popitem(last=False)
+    return digest
+
+def derivative_key(digest, size, fmt, quality):
+    """Cache key from the source content hash and normalized parameters"""
+    return hashlib.sha256(f'{digest}|{size}|{fmt}|{quality}'.encode('utf-8')).hexdigest()
+
+class DerivativeCache:
+    """Content-addressed, byte-bounded cache of rendered images on local disk
+
+    Files live at <root>/<key[:2]>/<key><ext> and are tracked in a SQLite
+    index shared by every worker process on the host, which drives LRU
+    eviction once the total passes max_bytes. Generating a missing entry is
+    single-flight: one caller renders it while concurrent callers for the
+    same key, in this or another process, wait and then reuse the file.
+    """
+    def __init__(self, root, max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._local = threading.local()
+        self._locks = {}  # key -> [threading.Lock, waiters]
+        self._locks_guard = threading.Lock()
+
+        os.makedirs(os.path.join(root, 'locks'), exist_ok=True)
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, 'index.db'), timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def path_for(self, key, ext):
+        return os.path.join(self.root, key[:2], key + ext)
+
+    def _lookup(self, key):
+        """Path of a cached entry, bumping its LRU position, or None"""
+        conn = self._conn()
+        row = conn.execute('SELECT path FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if not os.path.exists(row[0]):
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            return None
+        conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        return row[0]
+
+    def get(self, key):
+        path = self._lookup(key)
+        self.stats.incr('hits' if path else 'misses')
+        return path
+
+    def get_or_create(self, key, ext, render):
+        """Return the cached file for key, calling render() once on a miss
+
+        render returns the encoded bytes. Concurrent misses for the same key
+        share one call.
+        """
+        path = self._lookup(key)
+        if path:
+            self.stats.incr('hits')
+            return path
+
+        with self._key_lock(key):
+            # Someone else may have rendered it while we waited
+            path = self._lookup(key)
+            if path:
+                self.stats.incr('hits')
+                return path
+
+            self.stats.incr('misses')
+            data = render()
+            path = self.path_for(key, ext)
+            self._write(path, data)
+            self._record(key, path, len(data))
+            return path
+
+    @contextmanager
+    def _key_lock(self, key):
+        """Per-key lock across threads, plus a striped file lock across processes"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if fcntl is None:
+                    yield
+                else:
+                    # 256 stripes, so lock files never need cleaning up
+                    with open(os.path.join(self.root, 'locks', key[:2] + '.lock'), 'a') as lock_file:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+                        try:
+                            yield
+                        finally:
+                            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def _write(self, path, data):
+        """Write via a temp file and rename, so readers never see partial files"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _record(self, key, path, size):
+        conn = self._conn()
+        evicted = []
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, path, bytes, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, path, size, time.time())
+            )
+            total = conn.execute('SELECT COALESCE(SUM(bytes), 0) FROM entries').fetchone()[0]
+            if total > self.max_bytes:
+                # Least recently used first, never the entry just written
+                for old_key, old_path, old_size in conn.execute(
+                    'SELECT key, path, bytes FROM entries WHERE key != ? ORDER BY accessed_at', (key,)
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute('DELETE FROM entries WHERE key = ?', (old_key,))
+                    evicted.append(old_path)
+                    total -= old_size
+        self.stats.incr('stores')
+
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+        if evicted:
+            self.stats.incr('evictions', len(evicted))
+
+    def total_bytes(self):
+        return self._conn().execute('SELECT COALESCE(SUM(bytes), 0) FROM entries').fetchone()[0]
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_image_cache(config):
+    """Return the process-wide derivative cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DerivativeCache(
+                    os.path.join(config.get('CACHE_FOLDER', '/tmp/cache'), 'images'),
+                    max_bytes=config.get('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+                )
+    return _cache
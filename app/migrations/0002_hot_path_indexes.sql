@@ -0,0 +1,23 @@
+-- Secondary indexes for the queries that run on every page view.
+
+-- Listings ordered by newest first
+CREATE INDEX IF NOT EXISTS idx_gallery_images_created_at ON gallery_images (created_at);
+CREATE INDEX IF NOT EXISTS idx_blog_posts_created_at ON blog_posts (created_at);
+CREATE INDEX IF NOT EXISTS idx_ocs_created_at ON ocs (created_at);
+
+-- Clothing layers for an OC, in stacking order
+CREATE INDEX IF NOT EXISTS idx_oc_clothing_oc_id ON oc_clothing (oc_id, z_index, category);
+
+-- Comments for a content item, and replies to a comment
+CREATE INDEX IF NOT EXISTS idx_comments_content ON comments (content_type, content_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_comments_parent_id ON comments (parent_id);
+
+-- Vote counts per comment
+CREATE INDEX IF NOT EXISTS idx_comment_votes_comment_id ON comment_votes (comment_id, vote_type);
+
+-- Unread notifications for a user, newest first
+CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications (user_id, read, created_at);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications (user_id, created_at);
+
+-- Admin lookup at startup
+CREATE INDEX IF NOT EXISTS idx_users_is_admin ON users (is_admin);
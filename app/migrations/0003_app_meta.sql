@@ -0,0 +1,7 @@
+-- Key/value settings about the database itself, such as the schema
+-- fingerprint checked at startup.
+
+CREATE TABLE IF NOT EXISTS app_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
@@ -0,0 +1,28 @@
+-- Materialized paths for arbitrarily deep comment threads. path is the
+-- chain of zero-padded ids from the top-level comment down, so ordering by
+-- path walks a thread depth-first and a thread is one index range.
+
+ALTER TABLE comments ADD COLUMN root_id INTEGER;
+ALTER TABLE comments ADD COLUMN depth INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE comments ADD COLUMN path TEXT;
+
+WITH RECURSIVE tree (id, root_id, depth, path) AS (
+    SELECT id, id, 0, printf('%010d', id)
+    FROM comments
+    WHERE parent_id IS NULL
+    UNION ALL
+    SELECT c.id, tree.root_id, tree.depth + 1, tree.path || '/' || printf('%010d', c.id)
+    FROM comments c
+    JOIN tree ON c.parent_id = tree.id
+)
+UPDATE comments SET
+    root_id = (SELECT root_id FROM tree WHERE tree.id = comments.id),
+    depth = COALESCE((SELECT depth FROM tree WHERE tree.id = comments.id), 0),
+    path = (SELECT path FROM tree WHERE tree.id = comments.id);
+
+-- Top-level comments of a content item, in keyset order
+DROP INDEX IF EXISTS idx_comments_content;
+CREATE INDEX IF NOT EXISTS idx_comments_threads ON comments (content_type, content_id, depth, id);
+
+-- Replies of a thread in depth-first order
+CREATE INDEX IF NOT EXISTS idx_comments_root_path ON comments (root_id, path);
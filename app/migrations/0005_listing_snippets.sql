@@ -0,0 +1,22 @@
+-- Card text for listings, precomputed at write time so listing queries
+-- can skip the full caption/content/description columns.
+
+ALTER TABLE gallery_images ADD COLUMN snippet TEXT;
+ALTER TABLE blog_posts ADD COLUMN snippet TEXT;
+ALTER TABLE ocs ADD COLUMN snippet TEXT;
+
+UPDATE gallery_images SET snippet = CASE
+    WHEN length(caption) > 100 THEN substr(caption, 1, 100) || '...'
+    ELSE NULLIF(caption, '')
+END;
+
+UPDATE blog_posts SET snippet = CASE
+    WHEN length(COALESCE(NULLIF(summary, ''), content)) > 200
+        THEN substr(COALESCE(NULLIF(summary, ''), content), 1, 200) || '...'
+    ELSE COALESCE(NULLIF(summary, ''), content)
+END;
+
+UPDATE ocs SET snippet = CASE
+    WHEN length(description) > 80 THEN substr(description, 1, 80) || '...'
+    ELSE NULLIF(description, '')
+END;
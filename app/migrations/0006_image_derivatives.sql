@@ -0,0 +1,16 @@
+-- Resized/re-encoded copies of every uploaded image, generated at upload
+-- time. source is the stored path of the original; path is where the
+-- derivative itself is stored (a local path or a Blob URL).
+
+CREATE TABLE IF NOT EXISTS image_derivatives (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    size TEXT NOT NULL,
+    format TEXT NOT NULL,
+    path TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    bytes INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (source, size, format)
+);
@@ -0,0 +1,3 @@
+-- Content hash of each derivative, used as its strong ETag.
+
+ALTER TABLE image_derivatives ADD COLUMN digest TEXT;
@@ -0,0 +1,34 @@
+-- Stored dimensions for every rendered image, so templates can emit
+-- srcset widths and width/height attributes without touching the file.
+-- gallery_images already has width/height; rows uploaded before this
+-- migration keep NULLs until they are backfilled.
+
+ALTER TABLE ocs ADD COLUMN base_width INTEGER;
+ALTER TABLE ocs ADD COLUMN base_height INTEGER;
+ALTER TABLE ocs ADD COLUMN profile_width INTEGER;
+ALTER TABLE ocs ADD COLUMN profile_height INTEGER;
+ALTER TABLE blog_posts ADD COLUMN featured_width INTEGER;
+ALTER TABLE blog_posts ADD COLUMN featured_height INTEGER;
+ALTER TABLE oc_clothing ADD COLUMN width INTEGER;
+ALTER TABLE oc_clothing ADD COLUMN height INTEGER;
+
+-- Images whose derivatives were already rendered: take the (orientation
+-- corrected) size of the recorded original
+UPDATE ocs SET
+    base_width = (SELECT width FROM image_derivatives d WHERE d.source = ocs.base_image AND d.size = 'original' AND d.format = 'webp'),
+    base_height = (SELECT height FROM image_derivatives d WHERE d.source = ocs.base_image AND d.size = 'original' AND d.format = 'webp'),
+    profile_width = (SELECT width FROM image_derivatives d WHERE d.source = ocs.profile_image AND d.size = 'original' AND d.format = 'webp'),
+    profile_height = (SELECT height FROM image_derivatives d WHERE d.source = ocs.profile_image AND d.size = 'original' AND d.format = 'webp');
+
+UPDATE blog_posts SET
+    featured_width = (SELECT width FROM image_derivatives d WHERE d.source = blog_posts.featured_image AND d.size = 'original' AND d.format = 'webp'),
+    featured_height = (SELECT height FROM image_derivatives d WHERE d.source = blog_posts.featured_image AND d.size = 'original' AND d.format = 'webp');
+
+UPDATE oc_clothing SET
+    width = (SELECT width FROM image_derivatives d WHERE d.source = oc_clothing.filename AND d.size = 'original' AND d.format = 'webp'),
+    height = (SELECT height FROM image_derivatives d WHERE d.source = oc_clothing.filename AND d.size = 'original' AND d.format = 'webp');
+
+UPDATE gallery_images SET
+    width = (SELECT width FROM image_derivatives d WHERE d.source = gallery_images.filename AND d.size = 'original' AND d.format = 'webp'),
+    height = (SELECT height FROM image_derivatives d WHERE d.source = gallery_images.filename AND d.size = 'original' AND d.format = 'webp')
+WHERE width IS NULL OR height IS NULL;
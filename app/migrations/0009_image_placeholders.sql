@@ -0,0 +1,14 @@
+-- Inline low-quality placeholders: a data: URI of a tiny WebP plus the
+-- dominant color, painted behind each image until it loads. Rows from
+-- before this migration are filled by `flask --app run.py backfill-images`.
+
+ALTER TABLE gallery_images ADD COLUMN placeholder TEXT;
+ALTER TABLE gallery_images ADD COLUMN color TEXT;
+ALTER TABLE ocs ADD COLUMN base_placeholder TEXT;
+ALTER TABLE ocs ADD COLUMN base_color TEXT;
+ALTER TABLE ocs ADD COLUMN profile_placeholder TEXT;
+ALTER TABLE ocs ADD COLUMN profile_color TEXT;
+ALTER TABLE blog_posts ADD COLUMN featured_placeholder TEXT;
+ALTER TABLE blog_posts ADD COLUMN featured_color TEXT;
+ALTER TABLE oc_clothing ADD COLUMN placeholder TEXT;
+ALTER TABLE oc_clothing ADD COLUMN color TEXT;
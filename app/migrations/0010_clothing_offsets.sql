@@ -0,0 +1,12 @@
+-- Clothing layers are stored trimmed to their visible pixels; the offset
+-- places the trimmed layer on the base image.
+
+ALTER TABLE oc_clothing ADD COLUMN offset_x INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE oc_clothing ADD COLUMN offset_y INTEGER NOT NULL DEFAULT 0;
+
+-- Existing layers are untrimmed canvases, top-centered on the base
+UPDATE oc_clothing SET offset_x = (
+    SELECT (ocs.base_width - oc_clothing.width) / 2 FROM ocs WHERE ocs.id = oc_clothing.oc_id
+)
+WHERE width IS NOT NULL
+  AND (SELECT base_width FROM ocs WHERE ocs.id = oc_clothing.oc_id) IS NOT NULL;
@@ -0,0 +1,14 @@
+-- One row per distinct uploaded image, keyed by the sha256 of its bytes.
+-- Uploads of content that is already stored reuse path, dimensions,
+-- placeholder and derivatives instead of storing and rendering again.
+
+CREATE TABLE IF NOT EXISTS stored_images (
+    digest TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    bytes INTEGER,
+    width INTEGER,
+    height INTEGER,
+    placeholder TEXT,
+    color TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,35 @@
+-- Unread notification count per user, kept in step with the notifications
+-- table by triggers, so a badge is a primary key lookup rather than a
+-- COUNT over the user's notifications.
+
+ALTER TABLE users ADD COLUMN unread_notifications INTEGER NOT NULL DEFAULT 0;
+
+UPDATE users SET unread_notifications = (
+    SELECT COUNT(*) FROM notifications
+    WHERE notifications.user_id = users.id AND notifications.read = FALSE
+);
+
+CREATE TRIGGER IF NOT EXISTS notifications_unread_insert
+AFTER INSERT ON notifications
+WHEN NOT COALESCE(NEW.read, FALSE)
+BEGIN
+    UPDATE users SET unread_notifications = unread_notifications + 1 WHERE id = NEW.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS notifications_unread_update
+AFTER UPDATE OF read ON notifications
+WHEN COALESCE(OLD.read, FALSE) != COALESCE(NEW.read, FALSE)
+BEGIN
+    UPDATE users SET unread_notifications = MAX(0, unread_notifications + CASE WHEN NEW.read THEN -1 ELSE 1 END)
+    WHERE id = NEW.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS notifications_unread_delete
+AFTER DELETE ON notifications
+WHEN NOT COALESCE(OLD.read, FALSE)
+BEGIN
+    UPDATE users SET unread_notifications = MAX(0, unread_notifications - 1) WHERE id = OLD.user_id;
+END;
+
+-- Users mentioned by @name
+CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users (username COLLATE NOCASE);
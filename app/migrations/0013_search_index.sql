@@ -0,0 +1,86 @@
+-- Full-text index over gallery images, blog posts and OCs for /api/search.
+-- rowid encodes the source row as id * 4 + kind (1 gallery, 2 blog, 3 oc),
+-- so the triggers below can replace or drop an entry by primary key. The
+-- prefix indexes keep search-as-you-type prefix queries cheap.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    title, summary, body, tags,
+    prefix = '2 3',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+-- BM25 column weights used by ORDER BY rank: titles count most, then tags,
+-- summaries/captions/descriptions, and full blog content least
+INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(10.0, 4.0, 1.0, 6.0)');
+
+INSERT INTO search_index (rowid, title, summary, body, tags)
+SELECT id * 4 + 1, title, caption, NULL, tags FROM gallery_images;
+
+INSERT INTO search_index (rowid, title, summary, body, tags)
+SELECT id * 4 + 2, title, summary, content, NULL FROM blog_posts;
+
+INSERT INTO search_index (rowid, title, summary, body, tags)
+SELECT id * 4 + 3, name, description, NULL, NULL FROM ocs;
+
+CREATE TRIGGER IF NOT EXISTS search_gallery_insert
+AFTER INSERT ON gallery_images
+BEGIN
+    INSERT INTO search_index (rowid, title, summary, body, tags)
+    VALUES (NEW.id * 4 + 1, NEW.title, NEW.caption, NULL, NEW.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_gallery_update
+AFTER UPDATE OF title, caption, tags ON gallery_images
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 1;
+    INSERT INTO search_index (rowid, title, summary, body, tags)
+    VALUES (NEW.id * 4 + 1, NEW.title, NEW.caption, NULL, NEW.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_gallery_delete
+AFTER DELETE ON gallery_images
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_blog_insert
+AFTER INSERT ON blog_posts
+BEGIN
+    INSERT INTO search_index (rowid, title, summary, body, tags)
+    VALUES (NEW.id * 4 + 2, NEW.title, NEW.summary, NEW.content, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_blog_update
+AFTER UPDATE OF title, summary, content ON blog_posts
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 2;
+    INSERT INTO search_index (rowid, title, summary, body, tags)
+    VALUES (NEW.id * 4 + 2, NEW.title, NEW.summary, NEW.content, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_blog_delete
+AFTER DELETE ON blog_posts
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 2;
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_oc_insert
+AFTER INSERT ON ocs
+BEGIN
+    INSERT INTO search_index (rowid, title, summary, body, tags)
+    VALUES (NEW.id * 4 + 3, NEW.name, NEW.description, NULL, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_oc_update
+AFTER UPDATE OF name, description ON ocs
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 3;
+    INSERT INTO search_index (rowid, title, summary, body, tags)
+    VALUES (NEW.id * 4 + 3, NEW.name, NEW.description, NULL, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_oc_delete
+AFTER DELETE ON ocs
+BEGIN
+    DELETE FROM search_index WHERE rowid = OLD.id * 4 + 3;
+END;
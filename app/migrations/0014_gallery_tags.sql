@@ -0,0 +1,96 @@
+-- Gallery tags normalized out of the free-text gallery_images.tags column,
+-- which stays the editable source: triggers split it into tags and
+-- gallery_image_tags whenever a row is written, and tags.image_count is
+-- kept in step by triggers on the link table for the tag cloud.
+--
+-- A tag is the trimmed text between commas, at most 50 characters, and
+-- tags differing only in ASCII case are the same tag (the first spelling
+-- seen is kept). The comma string is split with json_each over
+-- '[' || replace(json_quote(tags), ',', '","') || ']': json_quote escapes
+-- quotes and backslashes, so every comma ends up between two elements.
+
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    image_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- created_at is copied from the image so a tag's listing is an index
+-- range scan in (created_at, id) order, like the unfiltered listing
+CREATE TABLE IF NOT EXISTS gallery_image_tags (
+    tag_id INTEGER NOT NULL REFERENCES tags (id),
+    image_id INTEGER NOT NULL REFERENCES gallery_images (id),
+    created_at TIMESTAMP,
+    PRIMARY KEY (tag_id, image_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_gallery_image_tags_listing ON gallery_image_tags (tag_id, created_at, image_id);
+CREATE INDEX IF NOT EXISTS idx_gallery_image_tags_image_id ON gallery_image_tags (image_id);
+CREATE INDEX IF NOT EXISTS idx_tags_image_count ON tags (image_count, name);
+
+INSERT OR IGNORE INTO tags (name)
+SELECT substr(trim(tag.value), 1, 50)
+FROM gallery_images, json_each('[' || replace(json_quote(gallery_images.tags), ',', '","') || ']') AS tag
+WHERE trim(tag.value) != ''
+ORDER BY gallery_images.id;
+
+INSERT OR IGNORE INTO gallery_image_tags (tag_id, image_id, created_at)
+SELECT tags.id, gallery_images.id, gallery_images.created_at
+FROM gallery_images, json_each('[' || replace(json_quote(gallery_images.tags), ',', '","') || ']') AS tag
+JOIN tags ON tags.name = substr(trim(tag.value), 1, 50)
+WHERE trim(tag.value) != '';
+
+UPDATE tags SET image_count = (
+    SELECT COUNT(*) FROM gallery_image_tags WHERE gallery_image_tags.tag_id = tags.id
+);
+
+CREATE TRIGGER IF NOT EXISTS gallery_image_tags_count_insert
+AFTER INSERT ON gallery_image_tags
+BEGIN
+    UPDATE tags SET image_count = image_count + 1 WHERE id = NEW.tag_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS gallery_image_tags_count_delete
+AFTER DELETE ON gallery_image_tags
+BEGIN
+    UPDATE tags SET image_count = MAX(0, image_count - 1) WHERE id = OLD.tag_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS gallery_tags_insert
+AFTER INSERT ON gallery_images
+WHEN NEW.tags IS NOT NULL
+BEGIN
+    INSERT OR IGNORE INTO tags (name)
+    SELECT substr(trim(value), 1, 50)
+    FROM json_each('[' || replace(json_quote(NEW.tags), ',', '","') || ']')
+    WHERE trim(value) != '';
+
+    INSERT OR IGNORE INTO gallery_image_tags (tag_id, image_id, created_at)
+    SELECT tags.id, NEW.id, NEW.created_at
+    FROM json_each('[' || replace(json_quote(NEW.tags), ',', '","') || ']') AS tag
+    JOIN tags ON tags.name = substr(trim(tag.value), 1, 50)
+    WHERE trim(tag.value) != '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS gallery_tags_update
+AFTER UPDATE OF tags ON gallery_images
+BEGIN
+    DELETE FROM gallery_image_tags WHERE image_id = OLD.id;
+
+    INSERT OR IGNORE INTO tags (name)
+    SELECT substr(trim(value), 1, 50)
+    FROM json_each('[' || replace(json_quote(NEW.tags), ',', '","') || ']')
+    WHERE trim(value) != '';
+
+    INSERT OR IGNORE INTO gallery_image_tags (tag_id, image_id, created_at)
+    SELECT tags.id, NEW.id, NEW.created_at
+    FROM json_each('[' || replace(json_quote(NEW.tags), ',', '","') || ']') AS tag
+    JOIN tags ON tags.name = substr(trim(tag.value), 1, 50)
+    WHERE trim(tag.value) != '';
+END;
+
+CREATE TRIGGER IF NOT EXISTS gallery_tags_delete
+AFTER DELETE ON gallery_images
+BEGIN
+    DELETE FROM gallery_image_tags WHERE image_id = OLD.id;
+END;
@@ -0,0 +1,90 @@
+import os
+import threading
+
+# Workers started when IMAGE_WORKERS is not set
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Imported by the fork server before it starts workers, so each worker
+# begins with the job modules (and Pillow) already loaded
+WORKER_PRELOAD = ['__main__', 'app.services.image_service', 'app.services.outfit_service']
+
+def _create_pool(max_workers):
+    """A process pool whose workers never fork from this threaded process
+
+    Workers come from a fork server (spawned where there is none), so a
+    worker never inherits a lock held by one of the app's threads. Where
+    processes cannot be pooled at all, e.g. serverless hosts without POSIX
+    semaphores, jobs run on threads in this process instead.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from flask import current_app, has_app_context
+
+    try:
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(WORKER_PRELOAD)
+        else:
+            context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+    except (OSError, ImportError, NotImplementedError) as e:
+        if has_app_context():
+            current_app.logger.warning(f"Process pool unavailable, running image jobs in-process: {e}")
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-jobs')
+
+def get_process_pool(max_workers=None):
+    """Return the process-wide worker pool for CPU-bound jobs
+
+    Image encoding holds the GIL, so it runs in worker processes rather
+    than threads, when the host allows them (see _create_pool). Workers
+    are started on first use and reused for the life of the instance; the
+    size is taken from the first call.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Created here so cold starts that never upload skip multiprocessing
+                _pool = _create_pool(max_workers or DEFAULT_WORKERS)
+    return _pool
+
+def _discard_pool(broken):
+    """Drop a broken pool so the next get_process_pool starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def submit_to_pool(fn, *args, max_workers=None):
+    """Submit a job to the worker pool, replacing the pool once if it is broken
+
+    A worker that dies (killed for memory, say) breaks its pool for every
+    later job, so the pool is rebuilt instead of failing until a restart.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    pool = get_process_pool(max_workers)
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return get_process_pool(max_workers).submit(fn, *args)
+
+def run_in_pool(fn, *args, max_workers=None):
+    """Run a job on the worker pool and return its result
+
+    If the pool breaks before or while running it, the job is retried once
+    on a fresh pool.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    pool = get_process_pool(max_workers)
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return get_process_pool(max_workers).submit(fn, *args).result()
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)', re.IGNORECASE)
+
+def tables_in(query):
+    """Return the table names a SELECT reads from"""
+    return {name.lower() for name in TABLE_PATTERN.findall(query)}
+
+def cache_key(query, params, fetch):
+    """Key for a query: normalized SQL text, parameters and fetch mode"""
+    sql = ' '.join(query.split())
+    raw = repr((sql, tuple(params) if params else (), fetch))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class CacheStats:
+    """Hit/miss counters shared by the cache backends"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'stores': self.stores,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+            }
+
+class MemoryCache:
+    """In-process LRU cache with per-entry TTL and table tags"""
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()  # key -> (expires_at, tags, value)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.stats.incr('misses')
+                return None
+            self._entries.move_to_end(key)
+        self.stats.incr('hits')
+        return entry[2]
+
+    def set(self, key, value, tags):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tags, value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.incr('evictions')
+        self.stats.incr('stores')
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, set()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.stats.incr('invalidations')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+class DiskCache:
+    """SQLite-file cache shared by every worker process on the host"""
+    def __init__(self, path, max_entries=4096, ttl=300):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entry_tags (
+                tag TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (tag, key)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute('SELECT value, expires_at FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] < now:
+            self.stats.incr('misses')
+            return None
+        conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+        self.stats.incr('hits')
+        return pickle.loads(row[0])
+
+    def set(self, key, value, tags):
+        conn = self._conn()
+        now = time.time()
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, data, now + self.ttl, now)
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO entry_tags (tag, key) VALUES (?, ?)',
+                [(tag, key) for tag in tags]
+            )
+            # Drop expired entries, then the least recently used overflow
+            conn.execute('DELETE FROM entries WHERE expires_at < ?', (now,))
+            overflow = conn.execute(
+                'DELETE FROM entries WHERE key IN ('
+                '  SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?'
+                ')', (self.max_entries,)
+            ).rowcount
+            conn.execute('DELETE FROM entry_tags WHERE key NOT IN (SELECT key FROM entries)')
+        self.stats.incr('stores')
+        if overflow > 0:
+            self.stats.incr('evictions', overflow)
+
+    def invalidate(self, *tags):
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for tag in tags:
+                removed = conn.execute(
+                    'DELETE FROM entries WHERE key IN (SELECT key FROM entry_tags WHERE tag = ?)',
+                    (tag,)
+                ).rowcount
+                conn.execute('DELETE FROM entry_tags WHERE tag = ?', (tag,))
+                if removed > 0:
+                    self.stats.incr('invalidations', removed)
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM entry_tags')
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache(config):
+    """Return the configured cache backend, or None when caching is off"""
+    global _cache
+    backend = config.get('QUERY_CACHE_BACKEND', 'none')
+    if backend not in ('memory', 'disk'):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                ttl = config.get('QUERY_CACHE_TTL', 300)
+                if backend == 'disk':
+                    _cache = DiskCache(
+                        config.get('QUERY_CACHE_PATH', '/tmp/cache/query_cache.db'),
+                        max_entries=config.get('QUERY_CACHE_SIZE', 512),
+                        ttl=ttl
+                    )
+                else:
+                    _cache = MemoryCache(max_entries=config.get('QUERY_CACHE_SIZE', 512), ttl=ttl)
+    return _cache
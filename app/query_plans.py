@@ -0,0 +1,190 @@
+import os
+import re
+import sqlite3
+import tempfile
+from flask import url_for
+
+PLANNED_STATEMENTS = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+CONVERTER_PATTERN = re.compile(r'<(?:(\w+)(?:\([^)]*\))?:)?\w+>')
+# FTS5 reads and writes its shadow tables ('main'.'search_index_data' etc.)
+# with statements of its own, which show up in the trace too
+INTERNAL_STATEMENT = "'main'."
+
+# A scan that walks an index in order is bounded only when LIMIT stops it
+# (keyset pages, "latest N" lists); otherwise it reads the whole index
+LIMIT_PATTERN = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+# Statements that have to read a whole table, by their normalized text.
+# The admin dashboard totals are counts of every row, run on each visit
+# to /admin only.
+ALLOWED_FULL_SCANS = {
+    'SELECT COUNT(*) as count FROM gallery_images',
+    'SELECT COUNT(*) as count FROM ocs',
+    'SELECT COUNT(*) as count FROM blog_posts',
+    'SELECT COUNT(*) as count FROM comments',
+}
+
+CTE_PATTERN = re.compile(r'(?:\bWITH(?:\s+RECURSIVE)?|,)\s*(\w+)\s*(?:\([^)]*\))?\s+AS\s*\(', re.IGNORECASE)
+
+def full_scans(conn, statement):
+    """Return the plan lines of statement that scan a whole table or index
+
+    SCAN ... USING [COVERING] INDEX walks the whole index unless the
+    statement has a LIMIT, so only then does it count as bounded.
+    """
+    limited = bool(LIMIT_PATTERN.search(statement))
+    cte_names = {name.lower() for name in CTE_PATTERN.findall(statement)}
+    placeholders = statement.count('?')
+    plan = conn.execute(f'EXPLAIN QUERY PLAN {statement}', [None] * placeholders).fetchall()
+
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        if not detail.startswith('SCAN '):
+            continue
+        target = detail[5:].split(' ')[0]
+        if 'VIRTUAL TABLE' in detail or (' USING ' in detail and limited):
+            continue
+        if target.startswith('(') or target.lower() in cte_names or target == 'CONSTANT':
+            continue
+        scans.append(detail)
+    return scans
+
+def _seed(execute_query, admin_id):
+    """Insert one row into every content table so every page renders"""
+    execute_query('''
+        INSERT INTO gallery_images (filename, title, caption, tags, width, height)
+        VALUES ('uploads/gallery/check.png', 'Check', 'Caption', 'tag', 10, 10)
+    ''')
+    execute_query('''
+        INSERT INTO ocs (name, base_image, description) VALUES ('Check', 'uploads/ocs/check.png', 'Description')
+    ''')
+    execute_query('''
+        INSERT INTO oc_clothing (oc_id, item_name, filename, category) VALUES (1, 'Hat', 'uploads/ocs/hat.png', 'hat')
+    ''')
+    execute_query('''
+        INSERT INTO blog_posts (title, content, summary) VALUES ('Check', 'Content', 'Summary')
+    ''')
+    execute_query('''
+        INSERT INTO comments (user_id, content_type, content_id, content, root_id, depth, path)
+        VALUES (?, 'gallery', 1, 'Comment', 1, 0, '0000000001')
+    ''', (admin_id,))
+
+def _exercise(app, admin_id):
+    """Request every page and API endpoint the app serves
+
+    Returns (request, problem) for every request that raised, answered
+    with a server error or reported failure in its JSON body: such a
+    request may have stopped before its queries ran, so they went
+    unchecked.
+    """
+    from app.services.listing_service import encode_cursor
+    client = app.test_client()
+    problems = []
+
+    def send(method, url, **kwargs):
+        try:
+            response = client.open(url, method=method, **kwargs)
+        except Exception as e:
+            problems.append((f'{method} {url}', repr(e)))
+            return
+        if response.status_code >= 500:
+            problems.append((f'{method} {url}', f'HTTP {response.status_code}'))
+        elif response.is_json and (response.get_json(silent=True) or {}).get('success') is False:
+            problems.append((f'{method} {url}', response.get_json().get('message', 'success: false')))
+
+    with client.session_transaction() as session:
+        session['user_id'] = admin_id
+        session['username'] = app.config.get('ADMIN_USERNAME', 'admin')
+
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint.endswith('static'):
+            continue
+        if 'debug' in rule.endpoint or rule.endpoint == 'auth.logout':
+            continue
+        if any(converter != 'int' for converter in CONVERTER_PATTERN.findall(rule.rule)):
+            continue
+        with app.test_request_context():
+            url = url_for(rule.endpoint, **{arg: 1 for arg in rule.arguments})
+        send('GET', url)
+
+    send('GET', '/api/comments/gallery/1?cursor=0')
+    send('GET', '/api/optimize_image/uploads/gallery/check.png?size=medium', headers={'Accept': 'image/webp'})
+    cursor = encode_cursor({'created_at': '2000-01-01 00:00:00', 'id': 1})
+    for listing in ('gallery', 'blog', 'ocs'):
+        send('GET', f'/api/feed/{listing}?limit=1')
+        send('GET', f'/api/feed/{listing}?after={cursor}')
+    send('GET', '/gallery/?tag=Tag')
+    send('GET', f'/api/feed/gallery?tag=tag&after={cursor}')
+    send('GET', f'/notifications?after={cursor}')
+    send('GET', '/api/search?q=check+cap')
+    send('GET', '/api/search?q=check&type=gallery&cursor=20')
+    send('POST', '/api/add_comment', data={
+        'content_type': 'gallery', 'content_id': '1', 'comment': 'Reply to @admin', 'parent_id': '1'
+    })
+    send('POST', '/api/notifications/read', json={'ids': [1, 2]})
+    send('POST', '/api/notifications/read', json={'all': True, 'up_to': 2})
+    send('POST', '/api/vote_comment', json={'comment_id': 1, 'vote_type': 'up'})
+    send('POST', '/api/vote_comment', json={'comment_id': 1, 'vote_type': 'down'})
+    send('POST', '/api/reorder_clothing', json={'oc_id': 1, 'clothing_order': [{'id': 1, 'z_index': 2}]})
+    return problems
+
+def check_query_plans(app):
+    """Run the app against a scratch SQLite database and explain every query
+
+    Returns (failures, problems): (statement, scans) for statements that
+    need a full table scan, and (request, problem) for exercised requests
+    that failed, see _exercise.
+    """
+    from app.database import init_db, execute_query
+
+    statements = []
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+
+    saved = {key: app.config.get(key) for key in (
+        'IS_PRODUCTION', 'DATABASE_URL', 'QUERY_CACHE_BACKEND', 'SQL_TRACE_CALLBACK',
+        'NOTIFICATIONS_WAIT', 'SECRET_KEY'
+    )}
+    app.config.update(
+        # The exercise logs in through the session, which needs a key
+        SECRET_KEY=app.config.get('SECRET_KEY') or os.urandom(16).hex(),
+        IS_PRODUCTION=False,
+        # Fan-out inline, so its statements are traced
+        NOTIFICATIONS_WAIT=True,
+        DATABASE_URL=db_path,
+        QUERY_CACHE_BACKEND='none',
+        SQL_TRACE_CALLBACK=None,
+    )
+    try:
+        with app.app_context():
+            init_db(app.config)
+            admin = execute_query('SELECT id FROM users WHERE is_admin = TRUE', fetch='one')
+            _seed(execute_query, admin['id'])
+
+        app.config['SQL_TRACE_CALLBACK'] = statements.append
+        problems = _exercise(app, admin['id'])
+        app.config['SQL_TRACE_CALLBACK'] = None
+
+        failures = []
+        seen = set()
+        conn = sqlite3.connect(db_path)
+        try:
+            for statement in statements:
+                statement = statement.strip()
+                normalized = ' '.join(statement.split())
+                if normalized in seen or not normalized.upper().startswith(PLANNED_STATEMENTS):
+                    continue
+                if INTERNAL_STATEMENT in normalized or normalized in ALLOWED_FULL_SCANS:
+                    continue
+                seen.add(normalized)
+                scans = full_scans(conn, statement)
+                if scans:
+                    failures.append((normalized, scans))
+        finally:
+            conn.close()
+        app.logger.info(f"Explained {len(seen)} distinct statements")
+        return failures, problems
+    finally:
+        app.config.update(saved)
+        os.remove(db_path)
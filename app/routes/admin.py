@@ -1,11 +1,21 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
-from werkzeug.utils import secure_filename
+from flask import (
+    Blueprint, render_template, request, flash, current_app, jsonify, Response,
+    stream_with_context
+)
 from app.auth import admin_required
-from app.database import execute_query
-from app.services.admin_service import handle_file_upload, get_admin_stats
-import os
-import uuid
-from PIL import Image
+from app.database import execute_query, invalidate_tables
+from app.services.admin_service import (
+    handle_image_upload, handle_layer_upload, get_admin_stats, gallery_row, insert_gallery_rows,
+    bulk_upload_sources, bulk_gallery_upload
+)
+from app.services.outfit_service import schedule_default_outfit
+from app.services.listing_service import (
+    make_snippet, BLOG_SNIPPET_LENGTH, OC_SNIPPET_LENGTH
+)
+import json
+
+# Values of an optional image field that was left empty
+NO_IMAGE = ('path', 'width', 'height', 'placeholder', 'color')
 
 admin_bp = Blueprint(
     'admin',
@@ -42,6 +52,34 @@ def upload():
     stats = get_admin_stats()
     return render_template('admin_upload.html', stats=stats)
 
+@admin_bp.route('/upload/bulk', methods=['POST'])
+@admin_required
+def bulk_upload():
+    """Upload many gallery images at once: files[] and/or a zip in archive
+
+    metadata is an optional JSON object mapping file names to
+    {title, caption, tags}, on top of any metadata.json in the zip; tags
+    applies to files without their own. Responds with NDJSON, one line per
+    file as it is stored and a final summary once the rows are saved.
+    """
+    try:
+        sources, metadata = bulk_upload_sources(request.files.getlist('files'), request.files.get('archive'))
+        if request.form.get('metadata'):
+            form_metadata = json.loads(request.form['metadata'])
+            if not isinstance(form_metadata, dict):
+                raise ValueError("metadata must be a JSON object")
+            metadata.update(form_metadata)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if not sources:
+        return jsonify({'success': False, 'message': 'No files provided'}), 400
+
+    lines = bulk_gallery_upload(sources, metadata, request.form.get('tags', ''))
+    return Response(
+        stream_with_context(json.dumps(line) + '\n' for line in lines),
+        mimetype='application/x-ndjson'
+    )
+
 def handle_gallery_upload(request):
     """Handle gallery image upload"""
     file = request.files['file']
@@ -52,17 +90,8 @@ def handle_gallery_upload(request):
     if not file or not file.filename:
         raise ValueError("No file provided")
 
-    filename = handle_file_upload(file, 'gallery')
-
-    # Get image dimensions
-    width, height = get_image_dimensions(
-        os.path.join(current_app.config['UPLOAD_FOLDER'], 'gallery', filename)
-    )
-
-    execute_query('''
-        INSERT INTO gallery_images (filename, title, caption, tags, width, height)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (filename, title, caption, tags, width, height))
+    image = handle_image_upload(file, 'gallery')
+    insert_gallery_rows([gallery_row(image, title, caption, tags)])
 
 def handle_oc_upload(request):
     """Handle OC creation"""
@@ -72,22 +101,30 @@ def handle_oc_upload(request):
     description = request.form.get('description', '')
     backstory = request.form.get('backstory', '')
 
-    base_image_filename = None
-    profile_image_filename = None
+    base = dict.fromkeys(NO_IMAGE)
+    profile = dict.fromkeys(NO_IMAGE)
 
     if 'base_image' in request.files and request.files['base_image'].filename:
-        base_image_filename = handle_file_upload(request.files['base_image'], 'ocs')
+        base = handle_image_upload(request.files['base_image'], 'ocs')
 
     if 'profile_image' in request.files and request.files['profile_image'].filename:
-        profile_image_filename = handle_file_upload(request.files['profile_image'], 'ocs')
+        profile = handle_image_upload(request.files['profile_image'], 'ocs')
 
-    if not base_image_filename:
+    if not base['path']:
         raise ValueError("Base image is required")
 
-    execute_query('''
-        INSERT INTO ocs (name, base_image, profile_image, description, age, personality, backstory)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (name, base_image_filename, profile_image_filename, description, age, personality, backstory))
+    oc_id = execute_query('''
+        INSERT INTO ocs (name, base_image, profile_image, description, age, personality, backstory, snippet,
+                         base_width, base_height, base_placeholder, base_color,
+                         profile_width, profile_height, profile_placeholder, profile_color)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (name, base['path'], profile['path'], description, age, personality, backstory,
+          make_snippet(description, OC_SNIPPET_LENGTH),
+          base['width'], base['height'], base['placeholder'], base['color'],
+          profile['width'], profile['height'], profile['placeholder'], profile['color'])).lastrowid
+    # The insert trigger indexed it for search too
+    invalidate_tables('ocs', 'search_index')
+    schedule_default_outfit(oc_id)
 
 def handle_blog_upload(request):
     """Handle blog post creation"""
@@ -95,14 +132,17 @@ def handle_blog_upload(request):
     content = request.form['content']
     summary = request.form.get('summary', '')
 
-    featured_image_filename = None
+    featured = dict.fromkeys(NO_IMAGE)
     if 'featured_image' in request.files and request.files['featured_image'].filename:
-        featured_image_filename = handle_file_upload(request.files['featured_image'], 'blog')
+        featured = handle_image_upload(request.files['featured_image'], 'blog')
 
     execute_query('''
-        INSERT INTO blog_posts (title, content, summary, featured_image)
-        VALUES (?, ?, ?, ?)
-    ''', (title, content, summary, featured_image_filename))
+        INSERT INTO blog_posts (title, content, summary, featured_image, snippet,
+                                featured_width, featured_height, featured_placeholder, featured_color)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (title, content, summary, featured['path'], make_snippet(summary or content, BLOG_SNIPPET_LENGTH),
+          featured['width'], featured['height'], featured['placeholder'], featured['color']))
+    invalidate_tables('blog_posts', 'search_index')
 
 def handle_clothing_upload(request):
     """Handle clothing item upload"""
@@ -114,20 +154,20 @@ def handle_clothing_upload(request):
     if 'clothing_file' not in request.files:
         raise ValueError("No clothing file provided")
 
-    filename = handle_file_upload(request.files['clothing_file'], 'ocs')
+    image = handle_layer_upload(request.files['clothing_file'], 'ocs')
 
-    execute_query('''
-        INSERT INTO oc_clothing (oc_id, item_name, filename, category, z_index)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (oc_id, item_name, filename, category, z_index))
+    # Offsets are relative to the base image; a canvas of another size is
+    # centered on it horizontally, as the layers always have been
+    oc = execute_query('SELECT base_width FROM ocs WHERE id = ?', (oc_id,), fetch='one')
+    base_width = oc['base_width'] if oc and oc['base_width'] else image['canvas_width']
+    offset_x = (base_width - image['canvas_width']) // 2 + image['left']
+    offset_y = image['top']
 
-def get_image_dimensions(filepath):
-    """Get image dimensions using Pillow"""
-    try:
-        img = Image.open(filepath)
-        width, height = img.size
-        img.close()
-        return width, height
-    except Exception as e:
-        current_app.logger.error(f"Error getting image dimensions: {e}")
-        return None, None
+    execute_query('''
+        INSERT INTO oc_clothing (oc_id, item_name, filename, category, z_index, width, height, placeholder, color,
+                                 offset_x, offset_y)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (oc_id, item_name, image['path'], category, z_index, image['width'], image['height'],
+          image['placeholder'], image['color'], offset_x, offset_y))
+    invalidate_tables('oc_clothing')
+    schedule_default_outfit(oc_id)
@@ -1,9 +1,16 @@
-from flask import Blueprint, request, jsonify, session, send_file, current_app
+from flask import Blueprint, request, jsonify, session, current_app, render_template
 from app.auth import login_required, admin_required
-from app.database import execute_query
-from app.services.comment_service import add_comment, vote_comment
+from app.database import execute_batch, invalidate_tables, get_cache_stats
+from app.geoip import country_name
+from app.services.comment_service import (
+    add_comment, vote_comment, get_comments_with_replies, get_thread_replies,
+    COMMENTS_PER_PAGE, REPLIES_PER_PAGE
+)
 from app.services.image_service import optimize_image
-import os
+from app.services.listing_service import LISTINGS, get_listing_page, page_size
+from app.services.notification_service import notify_comment, mark_read
+from app.services.search_service import search, SEARCH_PAGE_SIZE
+from app.services.outfit_service import serve_outfit, schedule_default_outfit, get_outfit_layers, outfit_version
 
 api_bp = Blueprint(
     'api',
@@ -25,16 +32,125 @@ def add_comment_api():
         if not comment_text.strip():
             return jsonify({'success': False, 'message': 'Comment cannot be empty'})
 
-        ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR'))
-        country = get_user_country(ip_address)
+        country = country_name(current_app.config, request.remote_addr)
 
-        add_comment(session['user_id'], content_type, content_id, comment_text, parent_id, country)
+        comment_id = add_comment(session['user_id'], content_type, content_id, comment_text, parent_id, country)
+        try:
+            notify_comment(comment_id, session['user_id'], session.get('username'),
+                           content_type, content_id, comment_text)
+        except Exception as e:
+            # The comment is saved either way
+            current_app.logger.exception(f"Error notifying for comment {comment_id}: {e}")
 
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'comment_id': comment_id})
     except Exception as e:
         current_app.logger.exception(f"Error adding comment: {e}")
         return jsonify({'success': False, 'message': 'Failed to add comment'})
 
+COMMENT_CONTENT_TYPES = ('gallery', 'blog', 'oc')
+MAX_PAGE_SIZE = 50
+
+def _page_size(default):
+    """Page size from ?limit=, clamped to a sane range"""
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PAGE_SIZE))
+
+def _comment_json(comment):
+    """Serialize a comment (and its loaded replies) for the comments API"""
+    data = {key: comment[key] for key in (
+        'id', 'parent_id', 'root_id', 'depth', 'path', 'username', 'content',
+        'country', 'upvotes', 'downvotes', 'created_at'
+    )}
+    if 'replies' in comment:
+        data['replies'] = [_comment_json(reply) for reply in comment['replies']]
+    if 'more_replies' in comment:
+        data['more_replies'] = comment['more_replies']
+        data['replies_cursor'] = comment['replies_cursor']
+    return data
+
+@api_bp.route('/comments/<content_type>/<int:content_id>')
+def comments_page(content_type, content_id):
+    """Next page of comment threads, keyed by the last top-level comment id"""
+    if content_type not in COMMENT_CONTENT_TYPES:
+        return jsonify({'success': False, 'message': 'Unknown content type'}), 404
+    try:
+        comments, next_cursor = get_comments_with_replies(
+            content_type, content_id,
+            after_id=request.args.get('cursor', type=int),
+            limit=_page_size(COMMENTS_PER_PAGE)
+        )
+        return jsonify({
+            'success': True,
+            'comments': [_comment_json(comment) for comment in comments],
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        current_app.logger.exception(f"Error loading comments: {e}")
+        return jsonify({'success': False, 'message': 'Failed to load comments'})
+
+@api_bp.route('/comments/<int:root_id>/replies')
+def comment_replies(root_id):
+    """Next replies of a thread, in depth-first order after a path cursor"""
+    try:
+        replies, next_cursor = get_thread_replies(
+            root_id,
+            after_path=request.args.get('after'),
+            limit=_page_size(REPLIES_PER_PAGE)
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception(f"Error loading replies: {e}")
+        return jsonify({'success': False, 'message': 'Failed to load replies'})
+    return jsonify({
+        'success': True,
+        'replies': [_comment_json(reply) for reply in replies],
+        'next_cursor': next_cursor
+    })
+
+@api_bp.route('/feed/<listing>')
+def listing_feed(listing):
+    """Next page of a gallery/blog/OC listing for infinite scroll"""
+    if listing not in LISTINGS:
+        return jsonify({'success': False, 'message': 'Unknown listing'}), 404
+    try:
+        items, next_cursor = get_listing_page(
+            listing, request.args.get('after'),
+            page_size(current_app.config, request.args.get('limit', type=int)),
+            tag=request.args.get('tag', '').strip() or None
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception(f"Error loading {listing} feed: {e}")
+        return jsonify({'success': False, 'message': 'Failed to load more items'})
+    return jsonify({
+        'success': True,
+        'count': len(items),
+        'html': render_template('_feed.html', listing=listing, items=items),
+        'next_cursor': next_cursor
+    })
+
+@api_bp.route('/search')
+def search_api():
+    """Ranked full-text search; the last word of q matches as a prefix"""
+    try:
+        results, next_cursor = search(
+            request.args.get('q', ''),
+            kind=request.args.get('type') or None,
+            offset=max(0, request.args.get('cursor', 0, type=int)),
+            limit=_page_size(SEARCH_PAGE_SIZE)
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception(f"Error searching: {e}")
+        return jsonify({'success': False, 'message': 'Search failed'})
+    return jsonify({
+        'success': True,
+        'results': results,
+        'next_cursor': next_cursor
+    })
+
 @api_bp.route('/vote_comment', methods=['POST'])
 @login_required
 def vote_comment_api():
@@ -54,6 +170,26 @@ def vote_comment_api():
         current_app.logger.exception(f"Error voting on comment: {e}")
         return jsonify({'success': False, 'message': 'Failed to vote on comment'})
 
+@api_bp.route('/notifications/read', methods=['POST'])
+@login_required
+def mark_notifications_read():
+    """Mark notifications read: {"ids": [...]} or {"all": true, "up_to": id}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if data.get('all'):
+            unread = mark_read(session['user_id'], up_to=data.get('up_to'))
+        else:
+            ids = data.get('ids')
+            if not isinstance(ids, list):
+                return jsonify({'success': False, 'message': 'ids must be a list'}), 400
+            unread = mark_read(session['user_id'], ids=ids)
+        return jsonify({'success': True, 'unread': unread})
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception(f"Error marking notifications read: {e}")
+        return jsonify({'success': False, 'message': 'Failed to mark notifications read'})
+
 @api_bp.route('/calculate_commission', methods=['POST'])
 def calculate_commission():
     try:
@@ -93,6 +229,11 @@ def optimize_image_api(filename):
     """Serve optimized images"""
     return optimize_image(filename, request.args)
 
+@api_bp.route('/ocs/<int:oc_id>/outfit')
+def oc_outfit(oc_id):
+    """Serve an OC with the selected clothing flattened into one image"""
+    return serve_outfit(oc_id, request.args)
+
 @api_bp.route('/reorder_clothing', methods=['POST'])
 @admin_required
 def reorder_clothing():
@@ -101,24 +242,39 @@ def reorder_clothing():
         oc_id = data['oc_id']
         clothing_order = data['clothing_order']
 
-        for item in clothing_order:
-            execute_query(
+        execute_batch([
+            (
                 'UPDATE oc_clothing SET z_index = ? WHERE id = ? AND oc_id = ?',
                 (item['z_index'], item['id'], oc_id)
             )
+            for item in clothing_order
+        ], transaction=True)
+        invalidate_tables('oc_clothing')
+        schedule_default_outfit(oc_id)
 
-        return jsonify({'success': True})
+        # New stacking order, new outfit URLs
+        oc, clothing = get_outfit_layers(oc_id)
+        version = outfit_version(oc['base_image'], clothing) if oc else None
+        return jsonify({'success': True, 'outfit_version': version})
     except Exception as e:
         current_app.logger.exception(f"Error reordering clothing: {e}")
         return jsonify({'success': False, 'message': 'Failed to reorder clothing'})
 
-def get_user_country(ip_address):
-    """Get user country from IP (simplified)"""
-    try:
-        import requests
-        response = requests.get(f'http://ip-api.com/json/{ip_address}', timeout=2)
-        data = response.json()
-        return data.get('country', 'Unknown')
-    except Exception as e:
-        current_app.logger.exception(f"Error getting user country: {e}")
-        return 'Unknown'
+@api_bp.route('/pool_stats')
+@admin_required
+def pool_stats():
+    """Connection reuse counters for the shared Turso transport"""
+    from app.http_pool import get_pool_stats
+    return jsonify(get_pool_stats())
+
+@api_bp.route('/cache_stats')
+@admin_required
+def cache_stats():
+    """Hit/miss counters for the query cache"""
+    return jsonify(get_cache_stats() or {'enabled': False})
+
+@api_bp.route('/startup_stats')
+@admin_required
+def startup_stats():
+    """Cold-start timings for this instance"""
+    return jsonify(current_app.config.get('STARTUP_TIMINGS', {}))
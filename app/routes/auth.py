@@ -25,7 +25,7 @@ def login():
             session['user_id'] = user['id']
             session['username'] = user['username']
 
-            ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR'))
+            ip_address = request.remote_addr
             execute_query(
                 'UPDATE users SET ip_address = ? WHERE id = ?', 
                 (ip_address, user['id'])
@@ -47,7 +47,7 @@ def register():
             flash('Username must be at least 3 characters and password at least 6 characters')
             return render_template('register.html')
         
-        ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR'))
+        ip_address = request.remote_addr
         
         if create_user(username, password, ip_address):
             flash('Registration successful! Please log in.')
@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template, redirect, url_for
-from app.database import execute_query
-from app.services.comment_service import get_comments_with_replies
+from flask import Blueprint, render_template, request, redirect, url_for, current_app
+from app.database import execute_batch
+from app.services.comment_service import comments_query, build_comment_threads
+from app.services.listing_service import get_listing_page, page_size
 
 blog_bp = Blueprint(
     'blog',
@@ -12,15 +13,24 @@ blog_bp = Blueprint(
 
 @blog_bp.route('/')
 def index():
-    posts = execute_query('SELECT * FROM blog_posts ORDER BY created_at DESC', fetch='all')
-    return render_template('blog.html', posts=posts)
+    try:
+        posts, next_cursor = get_listing_page(
+            'blog', request.args.get('after'),
+            page_size(current_app.config, request.args.get('limit', type=int))
+        )
+    except ValueError:
+        return redirect(url_for('blog.index'))
+    return render_template('blog.html', posts=posts, next_cursor=next_cursor)
 
 @blog_bp.route('/<int:post_id>')
 def post_detail(post_id):
-    post = execute_query('SELECT * FROM blog_posts WHERE id = ?', (post_id,), fetch='one')
+    post, all_comments = execute_batch([
+        ('SELECT * FROM blog_posts WHERE id = ?', (post_id,), 'one'),
+        comments_query('blog', post_id),
+    ], cache=True)
     
     if not post:
         return redirect(url_for('blog.index'))
     
-    comments = get_comments_with_replies('blog', post_id)
-    return render_template('blog_post.html', post=post, comments=comments)
+    comments, comments_cursor = build_comment_threads(all_comments)
+    return render_template('blog_post.html', post=post, comments=comments, comments_cursor=comments_cursor)
@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session
-from app.database import execute_query
-from app.services.comment_service import get_comments_with_replies
+from flask import Blueprint, render_template, request, redirect, url_for, current_app
+from app.database import execute_batch
+from app.services.comment_service import comments_query, build_comment_threads
+from app.services.listing_service import listing_query, split_page, page_size
+from app.services.tag_service import tag_cloud_query, image_tags_query, build_tag_cloud
 
 gallery_bp = Blueprint(
     'gallery',
@@ -12,23 +14,31 @@ gallery_bp = Blueprint(
 
 @gallery_bp.route('/')
 def index():
-    images = execute_query(
-        'SELECT * FROM gallery_images ORDER BY created_at DESC', 
-        fetch='all'
-    )
-    return render_template('gallery.html', images=images)
+    tag = request.args.get('tag', '').strip() or None
+    limit = page_size(current_app.config, request.args.get('limit', type=int))
+    try:
+        statement = listing_query('gallery', request.args.get('after'), limit, tag)
+    except ValueError:
+        return redirect(url_for('gallery.index', tag=tag))
+
+    # The page and the tag cloud in one round trip
+    rows, cloud = execute_batch([statement, tag_cloud_query()], cache=True)
+    images, next_cursor = split_page(rows, limit)
+    return render_template('gallery.html', images=images, next_cursor=next_cursor,
+                           tag=tag, tag_cloud=build_tag_cloud(cloud))
 
 @gallery_bp.route('/<int:image_id>')
 def image_detail(image_id):
-    image = execute_query(
-        'SELECT * FROM gallery_images WHERE id = ?', 
-        (image_id,), 
-        fetch='one'
-    )
+    image, tags, all_comments = execute_batch([
+        ('SELECT * FROM gallery_images WHERE id = ?', (image_id,), 'one'),
+        image_tags_query(image_id),
+        comments_query('gallery', image_id),
+    ], cache=True)
     
     if not image:
         return redirect(url_for('gallery.index'))
 
-    comments = get_comments_with_replies('gallery', image_id)
+    comments, comments_cursor = build_comment_threads(all_comments)
     
-    return render_template('gallery_image.html', image=image, comments=comments)
+    return render_template('gallery_image.html', image=image, tags=tags or [],
+                           comments=comments, comments_cursor=comments_cursor)
@@ -1,8 +1,15 @@
-from flask import Blueprint, render_template, session, current_app
+from flask import Blueprint, render_template, request, session, current_app, redirect, url_for, abort
 from markupsafe import Markup
-from app.database import execute_query
+from app.database import execute_batch
+from app.services.listing_service import listing_query, split_page
+from app.services.notification_service import get_notifications_page, unread_count_query
 import os
 
+# Homepage previews; the full listings page through the rest
+HOME_GALLERY_LIMIT = 12
+HOME_BLOG_LIMIT = 6
+HOME_OCS_LIMIT = 12
+
 main_bp = Blueprint(
     'main',
     __name__,
@@ -18,62 +25,44 @@ def index():
         gallery_images = []
         blog_posts = []
         ocs = []
-        notifications = []
-        
-        try:
-            current_app.logger.info("Fetching gallery images")
-            gallery_images = execute_query('''
-                SELECT * FROM gallery_images 
-                ORDER BY created_at DESC 
-                LIMIT 12
-            ''', fetch='all') or []
-            current_app.logger.info(f"Found {len(gallery_images)} gallery images")
-        except Exception as e:
-            current_app.logger.exception(f"Error fetching gallery images: {e}")
-            gallery_images = []
-        
-        try:
-            current_app.logger.info("Fetching blog posts")
-            blog_posts = execute_query('''
-                SELECT * FROM blog_posts 
-                ORDER BY created_at DESC 
-                LIMIT 6
-            ''', fetch='all') or []
-            current_app.logger.info(f"Found {len(blog_posts)} blog posts")
-        except Exception as e:
-            current_app.logger.exception(f"Error fetching blog posts: {e}")
-            blog_posts = []
-        
-        try:
-            current_app.logger.info("Fetching OCs")
-            ocs = execute_query(
-                'SELECT * FROM ocs ORDER BY created_at DESC', 
-                fetch='all'
-            ) or []
-            current_app.logger.info(f"Found {len(ocs)} OCs")
-        except Exception as e:
-            current_app.logger.exception(f"Error fetching OCs: {e}")
-            ocs = []
+        unread_notifications = 0
+        gallery_cursor = blog_cursor = ocs_cursor = None
         
+        statements = [
+            listing_query('gallery', limit=HOME_GALLERY_LIMIT),
+            listing_query('blog', limit=HOME_BLOG_LIMIT),
+            listing_query('ocs', limit=HOME_OCS_LIMIT),
+        ]
+        if 'user_id' in session:
+            # The badge reads the counter the notification triggers maintain
+            statements.append(unread_count_query(session['user_id']))
+
         try:
-            if 'user_id' in session:
-                current_app.logger.info(f"Fetching notifications for user {session['user_id']}")
-                notifications = execute_query('''
-                    SELECT * FROM notifications 
-                    WHERE user_id = ? AND read = FALSE
-                    ORDER BY created_at DESC
-                ''', (session['user_id'],), fetch='all') or []
-                current_app.logger.info(f"Found {len(notifications)} notifications")
+            # One round trip for every section of the homepage
+            current_app.logger.info("Fetching homepage content")
+            # Public listings come from the query cache, notifications never do
+            results = execute_batch(statements, cache=[True, True, True, False])
+            gallery_images, gallery_cursor = split_page(results[0], HOME_GALLERY_LIMIT)
+            blog_posts, blog_cursor = split_page(results[1], HOME_BLOG_LIMIT)
+            ocs, ocs_cursor = split_page(results[2], HOME_OCS_LIMIT)
+            if len(results) > 3:
+                unread_notifications = results[3]['unread_notifications'] if results[3] else 0
+            current_app.logger.info(
+                f"Found {len(gallery_images)} gallery images, {len(blog_posts)} blog posts, "
+                f"{len(ocs)} OCs, {unread_notifications} unread notifications"
+            )
         except Exception as e:
-            current_app.logger.exception(f"Error fetching notifications: {e}")
-            notifications = []
+            current_app.logger.exception(f"Error fetching homepage content: {e}")
         
         current_app.logger.info("Rendering template")
         return render_template('index.html', 
                              gallery_images=gallery_images,
                              blog_posts=blog_posts,
                              ocs=ocs,
-                             notifications=notifications)
+                             unread_notifications=unread_notifications,
+                             more_gallery=gallery_cursor is not None,
+                             more_blog=blog_cursor is not None,
+                             more_ocs=ocs_cursor is not None)
     
     except Exception as e:
         current_app.logger.exception(f"Error in index route: {e}")
@@ -93,13 +82,18 @@ def notifications_page():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
 
-    notifications = execute_query('''
-        SELECT * FROM notifications
-        WHERE user_id = ?
-        ORDER BY created_at DESC
-    ''', (session['user_id'],), fetch='all') or []
+    try:
+        notifications, next_cursor, unread = get_notifications_page(
+            session['user_id'], after=request.args.get('after')
+        )
+    except ValueError:
+        abort(400)
 
-    return render_template('notifications.html', notifications=notifications)
+    return render_template('notifications.html',
+                           notifications=notifications,
+                           next_cursor=next_cursor,
+                           unread=unread,
+                           first_page=not request.args.get('after'))
 
 @main_bp.route('/debug-info')
 def debug_info():
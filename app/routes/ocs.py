@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, redirect, url_for
-from app.database import execute_query
-from app.services.comment_service import get_comments_with_replies
+from flask import Blueprint, render_template, request, redirect, url_for, current_app
+from app.database import execute_batch
+from app.services.comment_service import comments_query, build_comment_threads
+from app.services.listing_service import get_listing_page, page_size
+from app.services.outfit_service import outfit_version
 
 ocs_bp = Blueprint(
     'ocs',
@@ -12,24 +14,36 @@ ocs_bp = Blueprint(
 
 @ocs_bp.route('/')
 def index():
-    ocs = execute_query('SELECT * FROM ocs ORDER BY created_at DESC', fetch='all')
-    return render_template('ocs.html', ocs=ocs)
+    try:
+        ocs, next_cursor = get_listing_page(
+            'ocs', request.args.get('after'),
+            page_size(current_app.config, request.args.get('limit', type=int))
+        )
+    except ValueError:
+        return redirect(url_for('ocs.index'))
+    return render_template('ocs.html', ocs=ocs, next_cursor=next_cursor)
 
 @ocs_bp.route('/<int:oc_id>')
 def detail(oc_id):
-    oc = execute_query('SELECT * FROM ocs WHERE id = ?', (oc_id,), fetch='one')
+    # OC, clothing items and comments in one round trip
+    oc, clothing_items, all_comments = execute_batch([
+        ('SELECT * FROM ocs WHERE id = ?', (oc_id,), 'one'),
+        ('''
+            SELECT * FROM oc_clothing 
+            WHERE oc_id = ? 
+            ORDER BY z_index ASC, category ASC
+        ''', (oc_id,), 'all'),
+        comments_query('oc', oc_id),
+    ], cache=True)
     
     if not oc:
         return redirect(url_for('ocs.index'))
     
-    # Get clothing items
-    clothing_items = execute_query('''
-        SELECT * FROM oc_clothing 
-        WHERE oc_id = ? 
-        ORDER BY z_index ASC, category ASC
-    ''', (oc_id,), fetch='all')
-    
-    # Get comments
-    comments = get_comments_with_replies('oc', oc_id)
-    
-    return render_template('oc_detail.html', oc=oc, clothing_items=clothing_items, comments=comments)
+    comments, comments_cursor = build_comment_threads(all_comments)
+
+    # Version of the layer stack, in z_index order as the compositor sees it
+    layers = sorted(clothing_items or [], key=lambda item: (item['z_index'], item['id']))
+    version = outfit_version(oc['base_image'], layers) if oc['base_image'] else None
+
+    return render_template('oc_detail.html', oc=oc, clothing_items=clothing_items, comments=comments,
+                           comments_cursor=comments_cursor, outfit_version=version)
@@ -1,37 +1,258 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import current_app
+from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
-from app.database import execute_query
+from app.database import execute_batch, invalidate_tables
+from app.process_pool import run_in_pool
+from app.services.storage_service import upload_file, store_bytes, hash_upload
+from app.services.image_service import (
+    read_image_header, schedule_derivatives, describe_image, render_trimmed_layer, find_stored_image,
+    record_stored_image
+)
+from app.services.listing_service import make_snippet, GALLERY_SNIPPET_LENGTH
+import hashlib
+import io
+import json
+import mimetypes
 import os
+import posixpath
 import uuid
+import zipfile
 
-def handle_file_upload(file, folder):
-    """Handle file upload using storage service"""
-    return upload_file(file, folder)
+GALLERY_COLUMNS = ('filename', 'title', 'caption', 'tags', 'width', 'height', 'snippet', 'placeholder', 'color')
+
+# Rows per INSERT statement; keeps each under SQLite's default limit of
+# 999 bound parameters
+GALLERY_INSERT_CHUNK = 100
+
+# Bulk uploads only take these; zips often carry notes and thumbnails too
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp'}
+
+# Per-file titles, captions and tags may ride along inside a zip
+BULK_METADATA_NAME = 'metadata.json'
+
+def _reuse_stored_image(digest, folder):
+    """Image dict of identical content stored before, or None
+
+    Derivatives are queued again only if they were never recorded.
+    """
+    existing = find_stored_image(digest)
+    if existing is None:
+        return None
+    if not existing['has_derivatives']:
+        schedule_derivatives(existing['path'], folder)
+    return {key: existing[key] for key in ('path', 'width', 'height', 'placeholder', 'color')}
+
+def handle_image_upload(file, folder):
+    """Store an uploaded image and queue its size/format derivatives
+
+    The image header is checked first, so a file that is not a readable
+    image raises ValueError and nothing is stored. The upload is then
+    hashed locally: content that was uploaded before is not stored again
+    and keeps its first copy, placeholder and derivatives. Otherwise it is
+    streamed to storage and the placeholder and color are rendered from
+    the stored file on the worker pool. Returns a dict with the stored
+    path plus the width, height, inline placeholder and dominant color to
+    keep on the row.
+    """
+    header = read_image_header(file.stream)
+    digest, size = hash_upload(file)
+    image = _reuse_stored_image(digest, folder)
+    if image:
+        return image
+
+    path = upload_file(file, folder, header['content_type'])
+    image = describe_image(path)
+    # Dimensions from the header stand in if the placeholder render failed
+    image['width'] = image['width'] or header['width']
+    image['height'] = image['height'] or header['height']
+    image['path'] = path
+    schedule_derivatives(path, folder)
+    record_stored_image(digest, image, size)
+    return image
+
+def handle_layer_upload(file, folder):
+    """Store a clothing overlay trimmed to its visible pixels, as PNG
+
+    Most of an overlay's canvas is transparent, so only the bounding box
+    of its visible pixels is kept. Returns handle_image_upload's dict plus
+    left/top (where the trimmed layer sat on the uploaded canvas) and
+    canvas_width/canvas_height.
+    """
+    # Trimming needs the whole image, so the overlay is read into memory
+    file.stream.seek(0)
+    source = file.stream.read()
+    layer = run_in_pool(render_trimmed_layer, source, max_workers=current_app.config.get('IMAGE_WORKERS'))
+    if layer is None:
+        raise ValueError("Clothing image has no visible pixels")
+
+    # Identical layers trim to identical PNGs
+    digest = hashlib.sha256(layer['data']).hexdigest()
+    image = _reuse_stored_image(digest, folder)
+    if image is None:
+        name = os.path.splitext(secure_filename(file.filename))[0] or 'layer'
+        image = describe_image(layer['data'])
+        image['path'] = store_bytes(layer['data'], folder, f"{uuid.uuid4()}_{name}.png", 'image/png')
+        schedule_derivatives(image['path'], folder, layer['data'])
+        record_stored_image(digest, image, len(layer['data']))
+    return {
+        **image,
+        'left': layer['left'],
+        'top': layer['top'],
+        'canvas_width': layer['canvas_width'],
+        'canvas_height': layer['canvas_height'],
+    }
+
+def gallery_row(image, title, caption='', tags=''):
+    """Values for one gallery_images row, in GALLERY_COLUMNS order"""
+    return (image['path'], title, caption, tags, image['width'], image['height'],
+            make_snippet(caption, GALLERY_SNIPPET_LENGTH), image['placeholder'], image['color'])
+
+def insert_gallery_rows(rows):
+    """Insert gallery rows as multi-row INSERTs in one transaction and round trip"""
+    row_params = '(' + ', '.join('?' * len(GALLERY_COLUMNS)) + ')'
+    statements = []
+    for start in range(0, len(rows), GALLERY_INSERT_CHUNK):
+        chunk = rows[start:start + GALLERY_INSERT_CHUNK]
+        statements.append((
+            f"INSERT INTO gallery_images ({', '.join(GALLERY_COLUMNS)}) VALUES {', '.join([row_params] * len(chunk))}",
+            tuple(value for row in chunk for value in row),
+        ))
+    # Triggers split the tags column into tags/gallery_image_tags and
+    # update the tag counts in the same transaction
+    execute_batch(statements, transaction=True)
+    invalidate_tables('gallery_images', 'search_index', 'tags', 'gallery_image_tags')
+
+def bulk_upload_sources(files, archive=None):
+    """Collect the images of a bulk upload
+
+    files are posted FileStorage objects; archive is an optional zip whose
+    members are added after them. Returns ([(name, open_file)], metadata):
+    open_file gives a FileStorage, reading a zip member only when called,
+    and metadata is the zip's metadata.json ({} without one). Raises
+    ValueError for a bad zip or more than BULK_UPLOAD_MAX_FILES files.
+    """
+    config = current_app.config
+    sources = [(file.filename, lambda file=file: file) for file in files if file and file.filename]
+    metadata = {}
+
+    if archive and archive.filename:
+        try:
+            bundle = zipfile.ZipFile(archive.stream)
+        except zipfile.BadZipFile:
+            raise ValueError(f"{archive.filename} is not a zip file")
+        max_bytes = config.get('MAX_CONTENT_LENGTH')
+
+        def open_member(info):
+            # The declared size is checked first, so a zip bomb is never inflated
+            if max_bytes and info.file_size > max_bytes:
+                raise ValueError("File is too large")
+            return FileStorage(
+                io.BytesIO(bundle.read(info)), filename=posixpath.basename(info.filename),
+                content_type=mimetypes.guess_type(info.filename)[0]
+            )
+
+        for info in bundle.infolist():
+            base = posixpath.basename(info.filename)
+            # Folders, and the resource forks and dotfiles macOS adds
+            if info.is_dir() or info.filename.startswith('__MACOSX/') or base.startswith('.'):
+                continue
+            if base == BULK_METADATA_NAME:
+                try:
+                    metadata = json.loads(bundle.read(info))
+                except ValueError:
+                    raise ValueError(f"{info.filename} is not valid JSON")
+                continue
+            sources.append((info.filename, lambda info=info: open_member(info)))
+
+    if len(sources) > config.get('BULK_UPLOAD_MAX_FILES', 500):
+        raise ValueError(f"Too many files (at most {config.get('BULK_UPLOAD_MAX_FILES', 500)} per upload)")
+    return sources, metadata
+
+def _default_title(name):
+    """Title from a file name: 'sunset_over-sea.png' -> 'sunset over sea'"""
+    stem = os.path.splitext(posixpath.basename(name))[0]
+    return ' '.join(stem.replace('_', ' ').replace('-', ' ').split()) or 'Untitled'
+
+def _store_bulk_image(app, name, open_file):
+    """Probe, store and queue derivatives for one bulk file, on a pool thread"""
+    if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+        raise ValueError("Not an image file")
+    with app.app_context():
+        return handle_image_upload(open_file(), 'gallery')
+
+def bulk_gallery_upload(sources, metadata=None, tags=''):
+    """Store a batch of gallery images concurrently, yielding progress
+
+    Files are probed, stored and queued for derivatives on a pool of
+    BULK_UPLOAD_WORKERS threads (the image work itself goes to the process
+    pool). A dict is yielded per file as it finishes, then every stored
+    file's row is inserted at once and a final {'done': True, ...} summary
+    is yielded. metadata maps a file name (or its base name) to its title,
+    caption and tags; tags is the default for files without any.
+    """
+    app = current_app._get_current_object()
+    metadata = metadata or {}
+    rows = {}
+    failed = 0
+
+    with ThreadPoolExecutor(max_workers=app.config.get('BULK_UPLOAD_WORKERS', 4)) as executor:
+        futures = {
+            executor.submit(_store_bulk_image, app, name, open_file): (index, name)
+            for index, (name, open_file) in enumerate(sources)
+        }
+        try:
+            for future in as_completed(futures):
+                index, name = futures[future]
+                progress = {'file': name, 'completed': len(rows) + failed + 1, 'total': len(futures)}
+                try:
+                    image = future.result()
+                except Exception as e:
+                    app.logger.warning(f"Bulk upload of {name} failed: {e}")
+                    failed += 1
+                    yield {**progress, 'success': False, 'message': str(e)}
+                    continue
+
+                meta = metadata.get(name) or metadata.get(posixpath.basename(name)) or {}
+                rows[index] = gallery_row(
+                    image, meta.get('title') or _default_title(name),
+                    meta.get('caption', ''), meta.get('tags', tags)
+                )
+                yield {**progress, 'success': True, 'path': image['path']}
+        except GeneratorExit:
+            # The client went away: skip whatever has not started yet
+            for future in futures:
+                future.cancel()
+            raise
+
+    # Keep the upload order, so ids follow it
+    ordered = [rows[index] for index in sorted(rows)]
+    try:
+        if ordered:
+            insert_gallery_rows(ordered)
+    except Exception as e:
+        app.logger.exception(f"Error saving bulk upload: {e}")
+        yield {'done': True, 'success': False, 'message': f'Saving failed: {e}',
+               'inserted': 0, 'failed': failed + len(ordered)}
+        return
+    yield {'done': True, 'success': True, 'inserted': len(ordered), 'failed': failed}
 
 def get_admin_stats():
     """Get statistics for admin dashboard"""
     stats = {}
 
     try:
-        stats['gallery_count'] = execute_query(
-            'SELECT COUNT(*) as count FROM gallery_images',
-            fetch='one'
-        )['count']
-
-        stats['oc_count'] = execute_query(
-            'SELECT COUNT(*) as count FROM ocs',
-            fetch='one'
-        )['count']
-
-        stats['blog_count'] = execute_query(
-            'SELECT COUNT(*) as count FROM blog_posts',
-            fetch='one'
-        )['count']
-
-        stats['comment_count'] = execute_query(
-            'SELECT COUNT(*) as count FROM comments',
-            fetch='one'
-        )['count']
+        counts = execute_batch([
+            ('SELECT COUNT(*) as count FROM gallery_images', None, 'one'),
+            ('SELECT COUNT(*) as count FROM ocs', None, 'one'),
+            ('SELECT COUNT(*) as count FROM blog_posts', None, 'one'),
+            ('SELECT COUNT(*) as count FROM comments', None, 'one'),
+        ])
+
+        stats['gallery_count'] = counts[0]['count']
+        stats['oc_count'] = counts[1]['count']
+        stats['blog_count'] = counts[2]['count']
+        stats['comment_count'] = counts[3]['count']
     except Exception as e:
         current_app.logger.exception(f"Error getting admin stats: {e}")
         return None
@@ -1,91 +1,200 @@
-from app.database import execute_query
+import re
+from app.database import execute_batch, invalidate_tables
 
-def get_comments_with_replies(content_type, content_id):
-    """Get all comments and replies in a single query to avoid N+1 problem"""
-    
-    # Single query to get all comments and replies
-    all_comments = execute_query('''
-        SELECT c.*, u.username,
-               CASE 
-                   WHEN c.parent_id IS NULL THEN c.id 
-                   ELSE c.parent_id 
-               END as thread_id
+COMMENTS_PER_PAGE = 20
+REPLIES_PER_THREAD = 3
+REPLIES_PER_PAGE = 20
+
+COMMENT_COLUMNS = '''
+    c.id, c.user_id, c.content_type, c.content_id, c.parent_id, c.root_id,
+    c.depth, c.path, c.content, c.country, c.upvotes, c.downvotes, c.created_at,
+    u.username
+'''
+
+PATH_PATTERN = re.compile(r'^\d{10}(/\d{10})*$')
+
+def comment_path(comment_id):
+    """Path segment for a comment id, zero-padded so paths sort correctly"""
+    return f"{int(comment_id):010d}"
+
+def comments_query(content_type, content_id, after_id=None, limit=COMMENTS_PER_PAGE, replies=REPLIES_PER_THREAD):
+    """Statement loading one page of threads for a content item
+
+    Top-level comments are paged by id (keyset, oldest first). Each thread
+    comes with its first `replies` replies in depth-first order, plus one
+    extra row that tells build_comment_threads whether more exist. The
+    per-thread cutoff is looked up through the (root_id, path) index, so a
+    page costs the same however long its threads are.
+    """
+    return (f'''
+        WITH page AS (
+            SELECT p.id,
+                   (SELECT x.path FROM comments x
+                    WHERE x.root_id = p.id
+                    ORDER BY x.path
+                    LIMIT 1 OFFSET ?) AS cutoff
+            FROM comments p
+            WHERE p.content_type = ? AND p.content_id = ? AND p.depth = 0 AND p.id > ?
+            ORDER BY p.id
+            LIMIT ?
+        )
+        SELECT {COMMENT_COLUMNS}
+        FROM page
+        JOIN comments c ON c.root_id = page.id AND c.path <= COALESCE(page.cutoff, '~')
+        LEFT JOIN users u ON c.user_id = u.id
+        ORDER BY c.root_id, c.path
+    ''', (replies + 1, content_type, content_id, after_id or 0, limit + 1), 'all')
+
+def replies_query(root_id, after_path=None, limit=REPLIES_PER_PAGE):
+    """Statement loading the next replies of a thread after a path cursor"""
+    return (f'''
+        SELECT {COMMENT_COLUMNS}
         FROM comments c
         LEFT JOIN users u ON c.user_id = u.id
-        WHERE c.content_type = ? AND c.content_id = ?
-        ORDER BY thread_id ASC, c.parent_id ASC, c.created_at ASC
-    ''', (content_type, content_id), fetch='all')
-    
-    # Organize comments into threaded structure
+        WHERE c.root_id = ? AND c.path > ?
+        ORDER BY c.path
+        LIMIT ?
+    ''', (root_id, after_path or comment_path(root_id), limit + 1), 'all')
+
+def build_comment_threads(all_comments, limit=COMMENTS_PER_PAGE, replies=REPLIES_PER_THREAD):
+    """Organize a comments_query page into nested threads
+
+    Returns (threads, next_cursor). A thread with more replies than were
+    loaded gets more_replies=True and a replies_cursor to continue from.
+    """
     comments_dict = {}
     top_level_comments = []
+    loaded_replies = {}
     
-    for comment in all_comments:
+    for comment in all_comments or []:
         comment_dict = dict(comment)
         comment_dict['replies'] = []
         
-        if comment['parent_id'] is None:
+        if comment_dict['depth'] == 0:
             # Top level comment
-            comments_dict[comment['id']] = comment_dict
+            comment_dict['more_replies'] = False
+            comment_dict['replies_cursor'] = comment_dict['path']
+            comments_dict[comment_dict['id']] = comment_dict
             top_level_comments.append(comment_dict)
-        else:
-            # Reply - add to parent's replies
-            parent_id = comment['parent_id']
-            if parent_id in comments_dict:
-                comments_dict[parent_id]['replies'].append(comment_dict)
+            loaded_replies[comment_dict['id']] = 0
+            continue
+
+        thread = comments_dict.get(comment_dict['root_id'])
+        if thread is None:
+            continue
+        if loaded_replies[thread['id']] >= replies:
+            # The extra row: there is more to load for this thread
+            thread['more_replies'] = True
+            continue
+
+        # Depth-first order guarantees the parent has already been seen
+        parent = comments_dict.get(comment_dict['parent_id'])
+        if parent is not None:
+            parent['replies'].append(comment_dict)
+            comments_dict[comment_dict['id']] = comment_dict
+            loaded_replies[thread['id']] += 1
+            thread['replies_cursor'] = comment_dict['path']
     
-    return top_level_comments
+    next_cursor = None
+    if len(top_level_comments) > limit:
+        top_level_comments = top_level_comments[:limit]
+        next_cursor = top_level_comments[-1]['id']
+
+    return top_level_comments, next_cursor
+
+def get_comments_with_replies(content_type, content_id, after_id=None, limit=COMMENTS_PER_PAGE):
+    """Get a page of comment threads in a single query"""
+    query, params, fetch = comments_query(content_type, content_id, after_id, limit)
+    all_comments = execute_batch([(query, params, fetch)], cache=True)[0]
+    return build_comment_threads(all_comments, limit)
+
+def get_thread_replies(root_id, after_path=None, limit=REPLIES_PER_PAGE):
+    """Get the next replies of a thread, in depth-first order
+
+    Returns (replies, next_cursor). Replies are flat; each carries its
+    parent_id and depth so the caller can attach it under its parent.
+    """
+    if after_path is not None and not PATH_PATTERN.match(after_path):
+        raise ValueError("Invalid replies cursor")
+
+    query, params, fetch = replies_query(root_id, after_path, limit)
+    rows = execute_batch([(query, params, fetch)], cache=True)[0]
+    replies = [dict(row) for row in rows[:limit]]
+    next_cursor = replies[-1]['path'] if len(rows) > limit else None
+    return replies, next_cursor
 
 def add_comment(user_id, content_type, content_id, comment_text, parent_id=None, country=None):
-    """Add a new comment"""
-    execute_query('''
-        INSERT INTO comments (user_id, content_type, content_id, parent_id, content, country)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_id, content_type, content_id, parent_id, comment_text, country))
+    """Add a new comment and return its id
+
+    A parent that does not exist or belongs to other content is ignored, so
+    the comment becomes a new top-level thread.
+    """
+    parent_lookup = 'SELECT {} FROM comments WHERE id = ? AND content_type = ? AND content_id = ?'
+    parent_params = (parent_id, content_type, content_id)
+
+    results = execute_batch([
+        (f'''
+            INSERT INTO comments (user_id, content_type, content_id, parent_id, content, country, root_id, depth)
+            VALUES (?, ?, ?, ({parent_lookup.format('id')}), ?, ?,
+                    ({parent_lookup.format('root_id')}),
+                    COALESCE(({parent_lookup.format('depth + 1')}), 0))
+        ''', (user_id, content_type, content_id) + parent_params + (comment_text, country) +
+             parent_params + parent_params),
+        ('''
+            UPDATE comments SET
+                root_id = COALESCE(root_id, id),
+                path = COALESCE((SELECT p.path || '/' FROM comments p WHERE p.id = comments.parent_id), '')
+                       || printf('%010d', id)
+            WHERE id = last_insert_rowid()
+        ''',),
+    ], transaction=True)
+    invalidate_tables('comments')
+    return results[0].lastrowid
 
 def vote_comment(user_id, comment_id, vote_type):
-    """Handle comment voting"""
-    # Check existing vote
-    existing_vote = execute_query('''
-        SELECT vote_type FROM comment_votes 
-        WHERE user_id = ? AND comment_id = ?
-    ''', (user_id, comment_id), fetch='one')
-    
-    if existing_vote:
-        if existing_vote['vote_type'] == vote_type:
-            # Remove vote
-            execute_query(
-                'DELETE FROM comment_votes WHERE user_id = ? AND comment_id = ?',
-                (user_id, comment_id)
-            )
-        else:
-            # Change vote
-            execute_query(
-                'UPDATE comment_votes SET vote_type = ? WHERE user_id = ? AND comment_id = ?',
-                (vote_type, user_id, comment_id)
-            )
-    else:
-        # Add new vote
-        execute_query(
-            'INSERT INTO comment_votes (user_id, comment_id, vote_type) VALUES (?, ?, ?)',
-            (user_id, comment_id, vote_type)
-        )
-    
-    # Get updated counts
-    upvotes = execute_query(
-        'SELECT COUNT(*) as count FROM comment_votes WHERE comment_id = ? AND vote_type = "up"',
-        (comment_id,), fetch='one'
-    )['count']
-    
-    downvotes = execute_query(
-        'SELECT COUNT(*) as count FROM comment_votes WHERE comment_id = ? AND vote_type = "down"',
-        (comment_id,), fetch='one'
-    )['count']
-    
-    # Update comment counts
-    execute_query(
-        'UPDATE comments SET upvotes = ?, downvotes = ? WHERE id = ?',
-        (upvotes, downvotes, comment_id)
-    )
-    
-    return upvotes, downvotes
+    """Handle comment voting
+
+    Voting the same way twice removes the vote, voting the other way
+    switches it. The counters on comments are adjusted by delta from the
+    user's previous vote, and everything runs as one atomic batch, which
+    is a single round trip on Turso.
+    """
+    if vote_type not in ('up', 'down'):
+        raise ValueError(f"Invalid vote type: {vote_type}")
+
+    existing_vote = 'SELECT vote_type FROM comment_votes WHERE user_id = ? AND comment_id = ?'
+    existing_params = (user_id, comment_id)
+
+    results = execute_batch([
+        # Adjust counters from the previous vote before it is overwritten
+        (f'''
+            UPDATE comments SET
+                upvotes = upvotes
+                    + (CASE WHEN ({existing_vote}) IS ? THEN 0 ELSE ? = 'up' END)
+                    - (({existing_vote}) IS 'up'),
+                downvotes = downvotes
+                    + (CASE WHEN ({existing_vote}) IS ? THEN 0 ELSE ? = 'down' END)
+                    - (({existing_vote}) IS 'down')
+            WHERE id = ?
+        ''', existing_params + (vote_type, vote_type) + existing_params +
+             existing_params + (vote_type, vote_type) + existing_params + (comment_id,)),
+        # Record the vote, marking a repeated vote with NULL...
+        ('''
+            INSERT INTO comment_votes (user_id, comment_id, vote_type) VALUES (?, ?, ?)
+            ON CONFLICT (user_id, comment_id) DO UPDATE SET vote_type =
+                CASE WHEN vote_type = excluded.vote_type THEN NULL ELSE excluded.vote_type END
+        ''', (user_id, comment_id, vote_type)),
+        # ...and drop it, since voting twice the same way removes the vote
+        (
+            'DELETE FROM comment_votes WHERE user_id = ? AND comment_id = ? AND vote_type IS NULL',
+            (user_id, comment_id)
+        ),
+        ('SELECT upvotes, downvotes FROM comments WHERE id = ?', (comment_id,), 'one'),
+    ], transaction=True)
+
+    invalidate_tables('comments', 'comment_votes')
+
+    counts = results[3]
+    if not counts:
+        return 0, 0
+    return counts['upvotes'], counts['downvotes']
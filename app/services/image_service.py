@@ -1,69 +1,453 @@
-from flask import send_file, current_app
+from flask import send_file, current_app, request, redirect
+from functools import partial
+from werkzeug.exceptions import HTTPException
+from app.database import execute_batch, invalidate_tables
+from app.image_cache import get_image_cache, source_digest, derivative_key
+from app.process_pool import run_in_pool, submit_to_pool
+from app.services.storage_service import store_bytes, local_path, read_stored, is_blob_path, stored_path_from_route
+import base64
+import hashlib
+import io
 import os
 
+DEFAULT_QUALITY = 85
+
+# Qualities the on-demand cache will render; requests snap to the nearest,
+# so arbitrary ?quality= values cannot fill the cache with near-duplicates
+QUALITY_LEVELS = (50, 70, 85, 95)
+
+# Size presets
+SIZE_PRESETS = {
+    'thumb': (150, 150),
+    'small': (300, 300),
+    'medium': (600, 600),
+    'large': (1200, 1200),
+    'original': None
+}
+
+# Inline placeholders: a WebP this many pixels on its longest side, a
+# couple of hundred bytes, stretched behind the <img> until it loads
+PLACEHOLDER_SIZE = 24
+PLACEHOLDER_QUALITY = 30
+
+# EXIF orientations that turn the image a quarter, swapping width and height
+EXIF_ORIENTATION_TAG = 0x0112
+QUARTER_TURN_ORIENTATIONS = (5, 6, 7, 8)
+
+# Image URLs name a unique upload, so responses can be cached for a year;
+# redirects to Blob derivatives get a day in case they are regenerated
+IMAGE_MAX_AGE = 365 * 24 * 3600
+REDIRECT_MAX_AGE = 24 * 3600
+
+# Output format -> (Pillow format, content type, extension)
+FORMATS = {
+    'webp': ('WebP', 'image/webp', '.webp'),
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg'),
+    'png': ('PNG', 'image/png', '.png'),
+}
+
+def fallback_format(filename):
+    """Format served to browsers without WebP support"""
+    ext = os.path.splitext(filename.split('?')[0])[1].lower()
+    return 'png' if ext in ('.png', '.gif') else 'jpeg'
+
+def derivative_name(source_path, size, fmt):
+    """Filename of a derivative, stored next to its original"""
+    base = os.path.splitext(os.path.basename(source_path.split('?')[0]))[0]
+    return f"{base}.{size}{FORMATS[fmt][2]}"
+
+def read_image_header(stream):
+    """Width, height, format and content type of an uploaded image
+
+    Only the header is parsed, no pixels are decoded, and the stream is
+    rewound afterwards. Width and height are as displayed, after EXIF
+    orientation. Raises ValueError if Pillow cannot identify the file.
+    Cheap enough to run in the request, without the worker pool.
+    """
+    from PIL import Image
+
+    stream.seek(0)
+    try:
+        with Image.open(stream) as img:
+            width, height = img.size
+            fmt = img.format
+            # A PNG's EXIF chunk may follow the pixel data, and reading it
+            # there would decode the image; only look when the header had it
+            if 'exif' in img.info and img.getexif().get(EXIF_ORIENTATION_TAG) in QUARTER_TURN_ORIENTATIONS:
+                width, height = height, width
+    except OSError:
+        # Includes PIL.UnidentifiedImageError
+        raise ValueError("Not a readable image")
+    finally:
+        stream.seek(0)
+    return {'width': width, 'height': height, 'format': fmt, 'content_type': Image.MIME.get(fmt)}
+
+def _open_source(source):
+    """Something Image.open reads: image bytes, or a stored path to load
+
+    Used in worker processes, so a stored original is read there rather
+    than shipped over from the request.
+    """
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if is_blob_path(source):
+        return io.BytesIO(read_stored(source))
+    return local_path(source)
+
+def _prepare(img):
+    """Normalize mode and orientation before resizing
+
+    Transparency is kept (RGBA): clothing overlays depend on it, and WebP
+    and PNG both carry it.
+    """
+    from PIL import ImageOps
+
+    if img.mode == 'P':
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    elif img.mode in ('LA', 'PA'):
+        img = img.convert('RGBA')
+    elif img.mode not in ('RGB', 'RGBA', 'L'):
+        img = img.convert('RGB')
+
+    # Auto-orient based on EXIF
+    return ImageOps.exif_transpose(img)
+
+def _encode(img, fmt, quality):
+    if fmt == 'jpeg' and img.mode == 'RGBA':
+        # JPEG has no alpha: flatten onto white rather than black
+        from PIL import Image
+
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    buffer = io.BytesIO()
+    img.save(buffer, FORMATS[fmt][0], quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def render_derivatives(source, fallback, quality=DEFAULT_QUALITY):
+    """Decode an original once and encode every size preset as WebP and fallback
+
+    Runs in a worker process, so it only touches Pillow and returns plain
+    data: a list of dicts with size, format, data, width and height.
+    source is the image bytes or its stored path.
+    """
+    from PIL import Image
+
+    results = []
+    with Image.open(_open_source(source)) as img:
+        img = _prepare(img)
+
+        # Largest preset first, so each smaller one resizes the previous
+        # result instead of the full original
+        presets = sorted(
+            SIZE_PRESETS.items(),
+            key=lambda preset: -preset[1][0] if preset[1] else float('-inf')
+        )
+        current = img
+        for size, target in presets:
+            if target:
+                current = current.copy()
+                current.thumbnail(target, Image.Resampling.LANCZOS)
+
+            for fmt in ('webp', fallback):
+                results.append({
+                    'size': size,
+                    'format': fmt,
+                    'data': _encode(current, fmt, quality),
+                    'width': current.width,
+                    'height': current.height,
+                })
+    return results
+
+def _dominant_color(img):
+    """Most common color of an RGB/RGBA image as #rrggbb, ignoring transparent pixels"""
+    from PIL import Image
+
+    sample = img.copy()
+    sample.thumbnail((64, 64))
+    pixels = list(sample.getdata())
+    if sample.mode == 'RGBA':
+        pixels = [pixel[:3] for pixel in pixels if pixel[3] >= 128] or [(0, 0, 0)]
+
+    # Cluster into a few colors so noise and gradients don't split the vote
+    strip = Image.new('RGB', (len(pixels), 1))
+    strip.putdata(pixels)
+    quantized = strip.quantize(colors=5)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+def render_placeholder(source):
+    """Tiny inline WebP, dominant color and displayed size of an image
+
+    Runs in a worker process. Transparency is kept so clothing layers get
+    a placeholder of their own shape. source is the image bytes or its
+    stored path. Returns a dict with placeholder (a data: URI), color,
+    width and height.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(_open_source(source)) as img:
+        width, height = img.size
+        # JPEGs can decode straight at a fraction of their size
+        img.draft('RGB', (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))
+        decoded_size = img.size
+        img = ImageOps.exif_transpose(img)
+        if img.size != decoded_size:
+            width, height = height, width
+
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+        color = _dominant_color(img)
+        img.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.LANCZOS)
+        data = _encode(img, 'webp', PLACEHOLDER_QUALITY)
+
+    return {
+        'placeholder': 'data:image/webp;base64,' + base64.b64encode(data).decode('ascii'),
+        'color': color,
+        'width': width,
+        'height': height,
+    }
+
+def describe_image(source):
+    """Placeholder, color and dimensions of an image (bytes or stored path), rendered on the worker pool
+
+    A file Pillow cannot read is logged and gives empty values; worker pool
+    failures are raised.
+    """
+    try:
+        return run_in_pool(render_placeholder, source, max_workers=current_app.config.get('IMAGE_WORKERS'))
+    except OSError as e:
+        # Includes PIL.UnidentifiedImageError
+        current_app.logger.exception(f"Error rendering placeholder: {e}")
+        return {'placeholder': None, 'color': None, 'width': None, 'height': None}
+
+def render_trimmed_layer(source):
+    """Crop an overlay to the bounding box of its visible pixels
+
+    Runs in a worker process. Returns a dict with data (the trimmed layer
+    as PNG), left/top (its offset within the uploaded canvas) and
+    canvas_width/canvas_height, or None if no pixel is visible.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(source)) as img:
+        img = _prepare(img).convert('RGBA')
+        bbox = img.getchannel('A').getbbox()
+        if bbox is None:
+            return None
+        buffer = io.BytesIO()
+        img.crop(bbox).save(buffer, 'PNG', optimize=True)
+        return {
+            'data': buffer.getvalue(),
+            'left': bbox[0],
+            'top': bbox[1],
+            'canvas_width': img.width,
+            'canvas_height': img.height,
+        }
+
+def render_derivative(original_path, size, fmt, quality):
+    """Render a single size/format of a local original; runs in a worker process"""
+    from PIL import Image
+
+    with Image.open(original_path) as img:
+        img = _prepare(img)
+        target_size = SIZE_PRESETS.get(size)
+        if target_size:
+            img.thumbnail(target_size, Image.Resampling.LANCZOS)
+        return _encode(img, fmt, quality)
+
+def store_derivatives(source_path, folder, rendered):
+    """Store rendered derivatives next to the original and record them"""
+    statements = []
+    for derivative in rendered:
+        content_type = FORMATS[derivative['format']][1]
+        path = store_bytes(
+            derivative['data'], folder,
+            derivative_name(source_path, derivative['size'], derivative['format']),
+            content_type
+        )
+        statements.append(('''
+            INSERT INTO image_derivatives (source, size, format, path, width, height, bytes, digest)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (source, size, format) DO UPDATE SET
+                path = excluded.path,
+                width = excluded.width,
+                height = excluded.height,
+                bytes = excluded.bytes,
+                digest = excluded.digest
+        ''', (source_path, derivative['size'], derivative['format'], path,
+              derivative['width'], derivative['height'], len(derivative['data']),
+              hashlib.sha256(derivative['data']).hexdigest())))
+
+    execute_batch(statements, transaction=True)
+    invalidate_tables('image_derivatives')
+
+def _store_in_background(app, source_path, folder, future):
+    """Done-callback for a derivative job: store results in an app context"""
+    try:
+        rendered = future.result()
+        with app.app_context():
+            store_derivatives(source_path, folder, rendered)
+    except Exception as e:
+        app.logger.exception(f"Error generating derivatives for {source_path}: {e}")
+
+def schedule_derivatives(source_path, folder, source=None, wait=None):
+    """Generate every preset of an uploaded image on the worker pool
+
+    The worker reads the stored original unless the image bytes are
+    passed as source.
+
+    By default the upload request returns straight away and the results are
+    stored from a done-callback. With IMAGE_DERIVATIVES_WAIT (needed on
+    serverless hosts that freeze the instance after the response) the
+    request waits for the worker and stores the results itself.
+    """
+    app = current_app._get_current_object()
+    future = submit_to_pool(
+        render_derivatives, source if source is not None else source_path, fallback_format(source_path),
+        max_workers=app.config.get('IMAGE_WORKERS')
+    )
+
+    if wait is None:
+        wait = app.config.get('IMAGE_DERIVATIVES_WAIT', False)
+    if wait:
+        store_derivatives(source_path, folder, future.result())
+    else:
+        future.add_done_callback(partial(_store_in_background, app, source_path, folder))
+    return future
+
+def find_derivative(source_path, size, fmt):
+    """Return the stored derivative row for an image, or None"""
+    return execute_batch([('''
+        SELECT path, width, height, bytes, digest FROM image_derivatives
+        WHERE source = ? AND size = ? AND format = ?
+    ''', (source_path, size, fmt), 'one')], cache=True)[0]
+
+def find_stored_image(digest):
+    """The stored_images row for content with this sha256, or None
+
+    has_derivatives tells whether its derivatives were ever recorded. A
+    local file that has gone missing counts as not stored.
+    """
+    row = execute_batch([('''
+        SELECT path, width, height, placeholder, color,
+               EXISTS (SELECT 1 FROM image_derivatives WHERE source = stored_images.path) AS has_derivatives
+        FROM stored_images WHERE digest = ?
+    ''', (digest,), 'one')])[0]
+    if row and not is_blob_path(row['path']) and not os.path.exists(local_path(row['path'])):
+        return None
+    return row
+
+def record_stored_image(digest, image, size):
+    """Remember where content with this sha256 is stored, for find_stored_image"""
+    execute_batch([('''
+        INSERT INTO stored_images (digest, path, bytes, width, height, placeholder, color)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (digest) DO UPDATE SET
+            path = excluded.path,
+            bytes = excluded.bytes,
+            width = excluded.width,
+            height = excluded.height,
+            placeholder = excluded.placeholder,
+            color = excluded.color
+    ''', (digest, image['path'], size, image['width'], image['height'], image['placeholder'], image['color']))])
+
+def send_image(path, etag, mimetype=None):
+    """Send a local image file with HTTP caching done properly
+
+    send_file streams the file through wsgi.file_wrapper (or X-Sendfile
+    with USE_X_SENDFILE), answers If-None-Match with 304 and serves Range
+    requests against the strong, content-based ETag.
+    """
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=IMAGE_MAX_AGE)
+    response.cache_control.immutable = True
+    response.accept_ranges = 'bytes'
+    # The same URL yields WebP or a fallback depending on Accept
+    response.vary.add('Accept')
+    return response
+
+def redirect_image(url):
+    """Redirect to a Blob-hosted image, cacheable per Accept"""
+    response = redirect(url)
+    response.cache_control.public = True
+    response.cache_control.max_age = REDIRECT_MAX_AGE
+    response.vary.add('Accept')
+    return response
+
+def serve_stored(stored_path, digest=None, mimetype=None):
+    """Serve a stored file: from disk locally, by redirect from Blob
+
+    A local file that is missing is a 404.
+    """
+    if is_blob_path(stored_path):
+        return redirect_image(stored_path)
+    path = local_path(stored_path)
+    if not os.path.exists(path):
+        return '', 404
+    return send_image(path, digest or source_digest(path), mimetype)
+
+def normalize_params(args, accept_header, source_path):
+    """Map request parameters onto the finite set of derivatives we render
+
+    Returns (size, format, quality).
+    """
+    size = args.get('size', 'original')
+    if size not in SIZE_PRESETS:
+        size = 'original'
+
+    try:
+        requested = int(args.get('quality', DEFAULT_QUALITY))
+    except (TypeError, ValueError):
+        requested = DEFAULT_QUALITY
+    quality = min(QUALITY_LEVELS, key=lambda level: abs(level - requested))
+
+    # Check WebP support
+    fmt = 'webp' if 'image/webp' in accept_header else fallback_format(source_path)
+    return size, fmt, quality
+
 def optimize_image(filename, args):
     """Handle image optimization and serving"""
+    source_path = stored_path_from_route(filename)
+    if '..' in source_path.split('/'):
+        return '', 404
+
     try:
-        from PIL import Image, ImageOps
-        import requests
-        
-        # Check WebP support
-        accept_header = request.headers.get('Accept', '')
-        supports_webp = 'image/webp' in accept_header
-        
-        # Parse parameters
-        size = args.get('size', 'original')
-        quality = int(args.get('quality', '85'))
-        
-        # Size presets
-        size_presets = {
-            'thumb': (150, 150),
-            'small': (300, 300),
-            'medium': (600, 600),
-            'large': (1200, 1200),
-            'original': None
-        }
-        
-        target_size = size_presets.get(size)
-        
-        # Generate cache filename
-        base_name = os.path.splitext(filename)[0]
-        ext = '.webp' if supports_webp else os.path.splitext(filename)[1]
-        cache_name = f"{base_name}_{size}_q{quality}{ext}"
-        cache_path = os.path.join(current_app.config['CACHE_FOLDER'], cache_name)
-        
-        # Serve from cache if exists
-        if os.path.exists(cache_path):
-            return send_file(cache_path)
-        
+        size, fmt, quality = normalize_params(args, request.headers.get('Accept', ''), source_path)
+
+        # Derivatives generated at upload time
+        if quality == DEFAULT_QUALITY:
+            derivative = find_derivative(source_path, size, fmt)
+            if derivative:
+                return serve_stored(derivative['path'], derivative['digest'], FORMATS[fmt][1])
+
+        if is_blob_path(source_path):
+            return redirect_image(source_path)
+
         # Load original image
-        original_path = os.path.join('static', filename)
+        original_path = local_path(source_path)
         if not os.path.exists(original_path):
             return '', 404
-        
-        with Image.open(original_path) as img:
-            # Convert to RGB if necessary
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            # Auto-orient based on EXIF
-            img = ImageOps.exif_transpose(img)
-            
-            # Resize if needed
-            if target_size:
-                img.thumbnail(target_size, Image.Resampling.LANCZOS)
-            
-            # Ensure cache directory exists
-            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-            
-            # Save optimized image
-            if supports_webp:
-                img.save(cache_path, 'WebP', quality=quality, optimize=True)
-            else:
-                img.save(cache_path, quality=quality, optimize=True)
-        
-        return send_file(cache_path)
-        
+
+        # Render on demand into the shared, bounded derivative cache
+        config = current_app.config
+        cache = get_image_cache(config)
+        key = derivative_key(source_digest(original_path), size, fmt, quality)
+
+        def render():
+            return run_in_pool(
+                render_derivative, original_path, size, fmt, quality,
+                max_workers=config.get('IMAGE_WORKERS')
+            )
+
+        cache_path = cache.get_or_create(key, FORMATS[fmt][2], render)
+        # The key already hashes the source content and every parameter
+        return send_image(cache_path, key, FORMATS[fmt][1])
+
+    except HTTPException:
+        # e.g. 416 for an unsatisfiable Range
+        raise
     except Exception as e:
+        current_app.logger.exception(f"Error optimizing image {filename}: {e}")
         # Fallback to original
-        return send_file(os.path.join('static', filename))
+        return serve_stored(source_path)
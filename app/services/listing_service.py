@@ -0,0 +1,123 @@
+import base64
+import json
+from app.database import execute_batch
+
+MAX_PAGE_SIZE = 60
+
+# Card projections: only what a listing card renders, plus created_at for
+# the cursor. Long text is read from the precomputed snippet column;
+# images come with their dimensions and inline placeholder.
+GALLERY_CARD_COLUMNS = 'id, title, filename, snippet, width, height, placeholder, color, created_at'
+BLOG_CARD_COLUMNS = (
+    'id, title, featured_image, featured_width, featured_height, featured_placeholder, featured_color, '
+    'snippet, created_at'
+)
+OC_CARD_COLUMNS = (
+    'id, name, profile_image, profile_width, profile_height, profile_placeholder, profile_color, '
+    'snippet, created_at'
+)
+
+# Listing name -> (table, card columns). Every listing is ordered newest
+# first by (created_at, id), which the created_at indexes serve directly.
+LISTINGS = {
+    'gallery': ('gallery_images', GALLERY_CARD_COLUMNS),
+    'blog': ('blog_posts', BLOG_CARD_COLUMNS),
+    'ocs': ('ocs', OC_CARD_COLUMNS),
+}
+
+# Snippet lengths, matching what each card shows
+GALLERY_SNIPPET_LENGTH = 100
+BLOG_SNIPPET_LENGTH = 200
+OC_SNIPPET_LENGTH = 80
+
+def make_snippet(text, length):
+    """Truncated card text stored alongside the full column at write time"""
+    if not text:
+        return None
+    if len(text) > length:
+        return text[:length] + '...'
+    return text
+
+def encode_cursor(row):
+    """Opaque, URL-safe cursor pointing just past row"""
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor, or raise ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+def page_size(config, requested=None):
+    """Page size from a request argument, falling back to LISTING_PAGE_SIZE"""
+    size = requested or config.get('LISTING_PAGE_SIZE', 24)
+    return max(1, min(int(size), MAX_PAGE_SIZE))
+
+def listing_query(listing, after=None, limit=24, tag=None):
+    """Statement for one page of a listing, fetching one extra row
+
+    The extra row tells get_listing_page whether there is a next page
+    without a COUNT(*). tag narrows the gallery to one tag's images.
+    """
+    if tag is not None:
+        if listing != 'gallery':
+            raise ValueError(f"The {listing} listing has no tags")
+        return tagged_gallery_query(tag, after, limit)
+
+    table, columns = LISTINGS[listing]
+    if after is None:
+        return (f'''
+            SELECT {columns} FROM {table}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (limit + 1,), 'all')
+
+    created_at, row_id = decode_cursor(after)
+    return (f'''
+        SELECT {columns} FROM {table}
+        WHERE (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', (created_at, row_id, limit + 1), 'all')
+
+def tagged_gallery_query(tag, after=None, limit=24):
+    """Statement for one page of the gallery images carrying a tag
+
+    Walks the tag's (tag_id, created_at, image_id) index range newest
+    first and looks each image up by primary key, so the cost follows the
+    page size rather than the size of the gallery. Cursors are the same
+    (created_at, id) pairs as the unfiltered listing.
+    """
+    columns = ', '.join(f'gallery_images.{column.strip()}' for column in GALLERY_CARD_COLUMNS.split(','))
+    keyset = ''
+    params = (tag.strip(),)
+    if after is not None:
+        keyset = 'AND (gallery_image_tags.created_at, gallery_image_tags.image_id) < (?, ?)'
+        params += decode_cursor(after)
+    return (f'''
+        SELECT {columns} FROM tags
+        JOIN gallery_image_tags ON gallery_image_tags.tag_id = tags.id
+        JOIN gallery_images ON gallery_images.id = gallery_image_tags.image_id
+        WHERE tags.name = ? {keyset}
+        ORDER BY gallery_image_tags.created_at DESC, gallery_image_tags.image_id DESC
+        LIMIT ?
+    ''', params + (limit + 1,), 'all')
+
+def split_page(rows, limit):
+    """Trim the look-ahead row and return (rows, next_cursor)"""
+    rows = list(rows or [])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+def get_listing_page(listing, after=None, limit=24, tag=None):
+    """Return (rows, next_cursor) for one page of a listing"""
+    rows = execute_batch([listing_query(listing, after, limit, tag)], cache=True)[0]
+    return split_page(rows, limit)
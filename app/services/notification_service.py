@@ -0,0 +1,172 @@
+import re
+import threading
+from flask import current_app, url_for
+from app.database import execute_batch, invalidate_tables
+from app.services.listing_service import decode_cursor, split_page, make_snippet
+
+NOTIFICATIONS_PER_PAGE = 20
+NOTIFICATION_SNIPPET_LENGTH = 140
+MAX_MENTIONS = 10
+MAX_MARK_READ = 500
+
+NOTIFICATION_COLUMNS = 'id, type, title, content, link, read, created_at'
+
+# @name, not inside a word or an email address; trailing dots and dashes
+# are punctuation rather than part of the name
+MENTION_PATTERN = re.compile(r'(?<![\w@])@([A-Za-z0-9_.-]{3,32})')
+
+# Comment content type -> (detail endpoint, its id argument)
+CONTENT_ENDPOINTS = {
+    'gallery': ('gallery.image_detail', 'image_id'),
+    'blog': ('blog.post_detail', 'post_id'),
+    'oc': ('ocs.detail', 'oc_id'),
+}
+
+def mentioned_usernames(text):
+    """Distinct names mentioned with @name in text, first MAX_MENTIONS only"""
+    names = []
+    for match in MENTION_PATTERN.finditer(text):
+        name = match.group(1).rstrip('.-')
+        if len(name) >= 3 and name.lower() not in (n.lower() for n in names):
+            names.append(name)
+    return names[:MAX_MENTIONS]
+
+def comment_link(content_type, content_id, comment_id):
+    """URL of a comment on its content page, or None for unknown content"""
+    endpoint = CONTENT_ENDPOINTS.get(content_type)
+    if not endpoint:
+        return None
+    try:
+        content_id = int(content_id)
+    except (TypeError, ValueError):
+        return None
+    return url_for(endpoint[0], **{endpoint[1]: content_id}, _anchor=f'comment-{comment_id}')
+
+def fanout_statement(comment_id, author_id, author_name, text, link):
+    """One INSERT ... SELECT creating every notification for a new comment
+
+    The author of the comment replied to gets a reply notification, and
+    users named with @name get a mention unless they already get the
+    reply. Authors are never notified of their own comments.
+    """
+    snippet = make_snippet(text, NOTIFICATION_SNIPPET_LENGTH)
+    parent_author = '''
+        SELECT parent.user_id FROM comments reply
+        JOIN comments parent ON parent.id = reply.parent_id
+        WHERE reply.id = ? AND parent.user_id IS NOT NULL
+    '''
+    selects = [f'''
+        SELECT user_id, 'reply', ?, ?, ? FROM ({parent_author}) WHERE user_id != ?
+    ''']
+    params = [f'{author_name} replied to your comment', snippet, link, comment_id, author_id]
+
+    names = mentioned_usernames(text)
+    if names:
+        selects.append(f'''
+            SELECT id, 'mention', ?, ?, ? FROM users
+            WHERE username COLLATE NOCASE IN ({', '.join('?' * len(names))})
+              AND id != ? AND id NOT IN ({parent_author})
+        ''')
+        params += [f'{author_name} mentioned you', snippet, link, *names, author_id, comment_id]
+
+    return (
+        f"INSERT INTO notifications (user_id, type, title, content, link) {' UNION ALL '.join(selects)}",
+        tuple(params)
+    )
+
+def _fan_out(app, statement):
+    """Run a fan-out statement in its own app context, on a pool thread"""
+    try:
+        with app.app_context():
+            execute_batch([statement])
+            invalidate_tables('notifications', 'users')
+    except Exception as e:
+        app.logger.exception(f"Error creating notifications: {e}")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Threads for fan-out, which is database round trips rather than CPU"""
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='notifications')
+    return _executor
+
+def notify_comment(comment_id, author_id, author_name, content_type, content_id, text, wait=None):
+    """Create reply and mention notifications for a new comment
+
+    By default the fan-out runs on a background thread so posting a
+    comment does not wait for it. With NOTIFICATIONS_WAIT (serverless
+    hosts freeze the instance after the response) it runs inline.
+    """
+    app = current_app._get_current_object()
+    statement = fanout_statement(
+        comment_id, author_id, author_name or 'Someone', text,
+        comment_link(content_type, content_id, comment_id)
+    )
+
+    if wait is None:
+        wait = app.config.get('NOTIFICATIONS_WAIT', False)
+    if wait:
+        _fan_out(app, statement)
+        return None
+    return _get_executor().submit(_fan_out, app, statement)
+
+def unread_count_query(user_id):
+    """Statement for a user's unread badge: one primary key lookup"""
+    return ('SELECT unread_notifications FROM users WHERE id = ?', (user_id,), 'one')
+
+def get_notifications_page(user_id, after=None, limit=NOTIFICATIONS_PER_PAGE):
+    """Return (notifications, next_cursor, unread count), newest first
+
+    Paged by (created_at, id) keyset like the listings; raises ValueError
+    for a malformed cursor.
+    """
+    keyset = ''
+    params = (user_id,)
+    if after:
+        keyset = 'AND (created_at, id) < (?, ?)'
+        params += decode_cursor(after)
+
+    rows, unread = execute_batch([
+        (f'''
+            SELECT {NOTIFICATION_COLUMNS} FROM notifications
+            WHERE user_id = ? {keyset}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', params + (limit + 1,), 'all'),
+        unread_count_query(user_id),
+    ])
+    notifications, next_cursor = split_page(rows, limit)
+    return notifications, next_cursor, unread['unread_notifications'] if unread else 0
+
+def mark_read(user_id, ids=None, up_to=None):
+    """Mark a user's notifications read and return the new unread count
+
+    ids marks just those (at most MAX_MARK_READ); otherwise every unread
+    notification is marked, or only those with id <= up_to, so ones that
+    arrived after the page was rendered stay unread.
+    """
+    clause = ''
+    params = (user_id,)
+    if ids is not None:
+        ids = [int(notification_id) for notification_id in ids][:MAX_MARK_READ]
+        if not ids:
+            raise ValueError("No notifications given")
+        clause = f"AND id IN ({', '.join('?' * len(ids))})"
+        params += tuple(ids)
+    elif up_to is not None:
+        clause = 'AND id <= ?'
+        params += (int(up_to),)
+
+    _, unread = execute_batch([
+        (f'UPDATE notifications SET read = TRUE WHERE user_id = ? AND read = FALSE {clause}', params),
+        unread_count_query(user_id),
+    ], transaction=True)
+    invalidate_tables('notifications', 'users')
+    return unread['unread_notifications'] if unread else 0
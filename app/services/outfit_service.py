@@ -0,0 +1,203 @@
+from flask import current_app, request, redirect, url_for
+from functools import partial
+from app.database import execute_batch
+from app.image_cache import get_image_cache
+from app.process_pool import run_in_pool, submit_to_pool
+from app.services.image_service import FORMATS, DEFAULT_QUALITY, SIZE_PRESETS, send_image
+from app.services.storage_service import (
+    SRCSET_PRESETS, image_attrs, is_blob_path, local_path, optimize_image_url, read_stored
+)
+import hashlib
+import io
+
+# Layers keep their transparency, so browsers without WebP get PNG
+OUTFIT_FALLBACK_FORMAT = 'png'
+OUTFIT_DEFAULT_SIZE = 'large'
+
+def outfit_queries(oc_id):
+    """Statements for an OC's base image and its clothing, bottom layer first"""
+    return [
+        ('SELECT id, base_image, base_width, base_height FROM ocs WHERE id = ?', (oc_id,), 'one'),
+        ('''
+            SELECT id, filename, z_index, offset_x, offset_y FROM oc_clothing
+            WHERE oc_id = ?
+            ORDER BY z_index ASC, id ASC
+        ''', (oc_id,), 'all'),
+    ]
+
+def get_outfit_layers(oc_id):
+    """Return (oc, clothing) for compositing; oc is None for unknown OCs"""
+    oc, clothing = execute_batch(outfit_queries(oc_id), cache=True)
+    return oc, list(clothing or [])
+
+def outfit_version(base_image, clothing):
+    """Short hash of the whole layer stack
+
+    Changes whenever clothing is added, removed or reordered, so outfit
+    URLs carrying it can be cached as immutable.
+    """
+    sha = hashlib.sha256(base_image.encode('utf-8'))
+    for item in clothing:
+        sha.update(f"|{item['id']}:{item['filename']}:{item['z_index']}".encode('utf-8'))
+    return sha.hexdigest()[:12]
+
+def select_layers(clothing, items):
+    """Clothing rows picked by an items argument ("3,7"), in stacking order
+
+    None selects every item (the default outfit); an empty string selects
+    none. Raises ValueError for malformed or foreign ids.
+    """
+    if items is None:
+        return list(clothing)
+    try:
+        ids = {int(item_id) for item_id in items.split(',') if item_id}
+    except ValueError:
+        raise ValueError("Invalid clothing items")
+    selected = [item for item in clothing if item['id'] in ids]
+    if len(selected) != len(ids):
+        raise ValueError("Unknown clothing items")
+    return selected
+
+def outfit_key(base_image, layers, size, fmt, quality=DEFAULT_QUALITY):
+    """Cache key of a composite: stored paths name unique uploads, so
+    hashing the ordered paths identifies the content"""
+    parts = ['outfit', base_image, *(item['filename'] for item in layers), size, fmt, str(quality)]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+def _source(stored_path):
+    """A local path, or the downloaded bytes of a Blob file, for a worker to open"""
+    if is_blob_path(stored_path):
+        return read_stored(stored_path)
+    return local_path(stored_path)
+
+def _open_layer(source):
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+        return ImageOps.exif_transpose(img).convert('RGBA')
+
+def _layer_sources(layers):
+    """(source, (offset_x, offset_y)) for each clothing row, for render_outfit"""
+    return [(_source(item['filename']), (item['offset_x'], item['offset_y'])) for item in layers]
+
+def render_outfit(base, layers, sizes, fmt, quality=DEFAULT_QUALITY):
+    """Flatten a base image and clothing layers (bottom first) at each size
+
+    Runs in a worker process. base is a local path or bytes; layers are
+    (source, (x, y)) pairs, each trimmed layer drawn at its offset on the
+    base. Returns {size: encoded bytes}.
+    """
+    from PIL import Image
+
+    canvas = _open_layer(base)
+    for source, (left, top) in layers:
+        overlay = _open_layer(source)
+        if left < 0 or top < 0:
+            # Hanging off the top or left edge: drop the part outside
+            overlay = overlay.crop((max(0, -left), max(0, -top), overlay.width, overlay.height))
+            left, top = max(0, left), max(0, top)
+        if overlay.width and overlay.height and left < canvas.width and top < canvas.height:
+            canvas.alpha_composite(overlay, (left, top))
+
+    results = {}
+    for size in sizes:
+        image = canvas.copy()
+        target = SIZE_PRESETS.get(size)
+        if target:
+            image.thumbnail(target, Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, FORMATS[fmt][0], quality=quality, optimize=True)
+        results[size] = buffer.getvalue()
+    return results
+
+def _store_outfits(app, keys, future):
+    """Done-callback for a precompute job: put each size in the image cache"""
+    try:
+        rendered = future.result()
+        cache = get_image_cache(app.config)
+        for size, data in rendered.items():
+            key, ext = keys[size]
+            cache.get_or_create(key, ext, lambda data=data: data)
+    except Exception as e:
+        app.logger.exception(f"Error precomputing outfit: {e}")
+
+def schedule_default_outfit(oc_id, wait=None):
+    """Render the default outfit (every layer) at each srcset size, WebP
+
+    Called after uploads and reorders so the first view of a character
+    sheet is a cache hit. Honors IMAGE_DERIVATIVES_WAIT like derivatives.
+    """
+    app = current_app._get_current_object()
+    oc, clothing = get_outfit_layers(oc_id)
+    if not oc or not oc['base_image']:
+        return None
+
+    keys = {
+        size: (outfit_key(oc['base_image'], clothing, size, 'webp'), FORMATS['webp'][2])
+        for size in SRCSET_PRESETS
+    }
+    future = submit_to_pool(
+        render_outfit, _source(oc['base_image']),
+        _layer_sources(clothing), SRCSET_PRESETS, 'webp',
+        max_workers=app.config.get('IMAGE_WORKERS')
+    )
+
+    if wait is None:
+        wait = app.config.get('IMAGE_DERIVATIVES_WAIT', False)
+    if wait:
+        _store_outfits(app, keys, future)
+    else:
+        future.add_done_callback(partial(_store_outfits, app, keys))
+    return future
+
+def serve_outfit(oc_id, args):
+    """Serve one composite of an OC: ?items= selects layers, ?size= a preset
+
+    Rendered once per layer set and size into the shared image cache.
+    Responses for the current ?v= version are immutable; anything else
+    must be revalidated against the content ETag.
+    """
+    oc, clothing = get_outfit_layers(oc_id)
+    if not oc or not oc['base_image']:
+        return '', 404
+    try:
+        layers = select_layers(clothing, args.get('items'))
+    except ValueError:
+        return '', 400
+
+    size = args.get('size', OUTFIT_DEFAULT_SIZE)
+    if size not in SRCSET_PRESETS:
+        size = OUTFIT_DEFAULT_SIZE
+    fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else OUTFIT_FALLBACK_FORMAT
+    key = outfit_key(oc['base_image'], layers, size, fmt)
+
+    config = current_app.config
+
+    def render():
+        return run_in_pool(
+            render_outfit, _source(oc['base_image']),
+            _layer_sources(layers), (size,), fmt,
+            max_workers=config.get('IMAGE_WORKERS')
+        )[size]
+
+    try:
+        path = get_image_cache(config).get_or_create(key, FORMATS[fmt][2], render)
+    except Exception as e:
+        current_app.logger.exception(f"Error compositing outfit for OC {oc_id}: {e}")
+        # Fall back to the bare base image
+        return redirect(optimize_image_url(oc['base_image'], size))
+
+    response = send_image(path, key, FORMATS[fmt][1])
+    if args.get('v') != outfit_version(oc['base_image'], clothing):
+        response.cache_control.immutable = False
+        response.cache_control.max_age = 0
+        response.cache_control.no_cache = True
+    return response
+
+def outfit_image_attrs(oc, version, sizes='100vw', placeholder=None, color=None):
+    """Responsive <img> attributes for an OC's default outfit"""
+    return image_attrs(
+        lambda size: url_for('api.oc_outfit', oc_id=oc['id'], size=size, v=version),
+        oc['base_width'], oc['base_height'], OUTFIT_DEFAULT_SIZE, sizes,
+        placeholder=placeholder, color=color
+    )
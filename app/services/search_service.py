@@ -0,0 +1,80 @@
+import re
+from flask import url_for
+from markupsafe import escape
+from app.database import cached_query
+from app.services.notification_service import CONTENT_ENDPOINTS
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_TERMS = 8
+EXCERPT_TOKENS = 16
+
+# search_index rowids are id * 4 + kind (see migration 0013)
+SEARCH_KINDS = {'gallery': 1, 'blog': 2, 'oc': 3}
+KIND_NAMES = {kind: name for name, kind in SEARCH_KINDS.items()}
+
+# Match markers that cannot occur in stored text, swapped for <mark> tags
+# once the excerpt is HTML-escaped
+MARK_OPEN, MARK_CLOSE = '\x02', '\x03'
+
+TERM_PATTERN = re.compile(r'\w+')
+
+def match_expression(query):
+    """FTS5 query for free text: every word must match, the last by prefix
+
+    Words are quoted, so FTS5 operators and punctuation in the input are
+    taken literally. The last word is a prefix match unless the input ends
+    in whitespace, which is what makes search-as-you-type work. Returns
+    None when there is nothing to search for.
+    """
+    terms = TERM_PATTERN.findall(query or '')[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    if not query[-1].isspace():
+        phrases[-1] += '*'
+    return ' '.join(phrases)
+
+def _excerpt_html(excerpt):
+    return str(escape(excerpt or '')).replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>')
+
+def search(query, kind=None, offset=0, limit=SEARCH_PAGE_SIZE):
+    """Return (results, next_offset) for a search, best BM25 match first
+
+    Results are dicts with type, id, title, excerpt (HTML with the matched
+    words in <mark>) and url. Pages are by offset: ranking has to score
+    every match anyway, so there is no cheaper keyset to seek to.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return [], None
+
+    kind_filter = ''
+    params = (MARK_OPEN, MARK_CLOSE, expression)
+    if kind is not None:
+        if kind not in SEARCH_KINDS:
+            raise ValueError(f"Unknown search type: {kind}")
+        kind_filter = 'AND rowid % 4 = ?'
+        params += (SEARCH_KINDS[kind],)
+
+    rows = cached_query(f'''
+        SELECT rowid, title,
+               snippet(search_index, -1, ?, ?, '...', {EXCERPT_TOKENS}) AS excerpt
+        FROM search_index
+        WHERE search_index MATCH ? {kind_filter}
+        ORDER BY rank, rowid
+        LIMIT ? OFFSET ?
+    ''', params + (limit + 1, offset)) or []
+
+    results = []
+    for row in rows[:limit]:
+        name = KIND_NAMES[row['rowid'] % 4]
+        item_id = row['rowid'] // 4
+        endpoint, argument = CONTENT_ENDPOINTS[name]
+        results.append({
+            'type': name,
+            'id': item_id,
+            'title': row['title'],
+            'excerpt': _excerpt_html(row['excerpt']),
+            'url': url_for(endpoint, **{argument: item_id}),
+        })
+    return results, offset + limit if len(rows) > limit else None
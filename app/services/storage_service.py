@@ -1,68 +1,127 @@
 from flask import current_app
+from app.blob_client import BlobError, get_blob_client
+import hashlib
+import io
 import requests
 import uuid
 import os
 from werkzeug.utils import secure_filename
 
-def upload_file(file, folder):
-    """Upload file to appropriate storage (Vercel Blob or local)"""
+def upload_file(file, folder, content_type=None):
+    """Upload file to appropriate storage (Vercel Blob or local)
+
+    The upload is streamed in chunks, never read whole; content_type
+    overrides the one the client sent.
+    """
     if not file or not file.filename:
         raise ValueError("No file provided")
-    
+
     # Generate secure filename
-    filename = secure_filename(file.filename)
-    unique_filename = f"{uuid.uuid4()}_{filename}"
-    
-    config = current_app.config
-    
-    if config.get('USE_BLOB_STORAGE'):
-        # Upload to Vercel Blob
-        return upload_to_blob(file, folder, unique_filename)
-    else:
-        # Save locally for development
-        return save_locally(file, folder, unique_filename)
+    filename = f"{uuid.uuid4()}_{secure_filename(file.filename)}"
+    file.stream.seek(0)
+    return store_stream(file.stream, folder, filename, content_type or file.content_type)
+
+def hash_upload(file, chunk_size=1024 * 1024):
+    """sha256 hex digest and size of an uploaded file, read in chunks
 
-def upload_to_blob(file, folder, filename):
-    """Upload file to Vercel Blob storage"""
+    Werkzeug has already spooled the upload to memory or a temp file, so
+    this is a local read; the file is rewound afterwards.
+    """
+    file.stream.seek(0)
+    sha = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: file.stream.read(chunk_size), b''):
+        sha.update(chunk)
+        size += len(chunk)
+    file.stream.seek(0)
+    return sha.hexdigest(), size
+
+def upload_bytes_to_blob(data, folder, filename, content_type):
+    """Upload raw bytes to Vercel Blob storage and return the blob URL"""
+    return upload_stream_to_blob(io.BytesIO(data), folder, filename, content_type)
+
+def upload_stream_to_blob(stream, folder, filename, content_type):
+    """Upload a binary stream to Vercel Blob storage and return the blob URL
+
+    The stream is read in parts, never whole; see BlobClient.
+    """
     config = current_app.config
-    blob_token = config.get('BLOB_READ_WRITE_TOKEN')
-    
-    if not blob_token:
+    if not config.get('BLOB_READ_WRITE_TOKEN'):
         raise ValueError("Blob storage token not configured")
-    
-    # Vercel Blob API endpoint
-    blob_url = f"https://blob.vercel-storage.com/upload"
-    
-    # Prepare the file data
-    file.seek(0)  # Reset file pointer
-    files = {
-        'file': (filename, file.read(), file.content_type)
-    }
-    
-    headers = {
-        'Authorization': f'Bearer {blob_token}',
-    }
-    
-    # Upload to Vercel Blob
-    response = requests.post(blob_url, files=files, headers=headers)
-    
-    if response.status_code != 200:
-        raise ValueError(f"Blob upload failed: {response.text}")
-    
-    data = response.json()
-    
-    # Return the blob URL - we'll store this in the database
-    return data['url']
-
-def save_locally(file, folder, filename):
-    """Save file locally for development"""
+
+    try:
+        return get_blob_client(config).put(f"{folder}/{filename}", stream, content_type)
+    except BlobError as e:
+        raise ValueError(f"Blob upload failed: {e}")
+
+def store_stream(stream, folder, filename, content_type, chunk_size=1024 * 1024):
+    """Store a binary stream next to the uploads, reading it in chunks
+
+    Returns the stored path: a Blob URL, or uploads/<folder>/<filename>
+    for local storage.
+    """
+    if current_app.config.get('USE_BLOB_STORAGE'):
+        return upload_stream_to_blob(stream, folder, filename, content_type)
+
     filepath = os.path.join('static/uploads', folder, filename)
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    file.save(filepath)
-    
-    # Return local path
+    # Write then rename so readers never see a partial file
+    tmp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                f.write(chunk)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
     return f"uploads/{folder}/{filename}"
 
+def store_bytes(data, folder, filename, content_type):
+    """Store generated bytes (e.g. an image derivative) next to the uploads
+
+    Returns the stored path, in the same form upload_file returns.
+    """
+    return store_stream(io.BytesIO(data), folder, filename, content_type)
+
+def local_path(stored_path):
+    """Absolute filesystem path of a locally stored file
+
+    Absolute because send_file resolves relative paths against the app
+    package, while uploads are saved relative to the working directory.
+    """
+    return os.path.abspath(os.path.join('static', stored_path))
+
+def read_stored(stored_path):
+    """Bytes of a stored file, from disk or downloaded from Blob"""
+    if is_blob_path(stored_path):
+        response = requests.get(stored_path, timeout=30)
+        response.raise_for_status()
+        return response.content
+    with open(local_path(stored_path), 'rb') as f:
+        return f.read()
+
+def is_blob_path(stored_path):
+    """True when the stored path is a Blob URL rather than a local path"""
+    return stored_path.startswith('https://')
+
+def image_route_path(stored_path):
+    """Path segment for the optimize_image route
+
+    Blob URLs cannot go into a <path:> segment as-is (the double slash
+    gets merged), so they travel as blob/<host>/<path>.
+    """
+    if is_blob_path(stored_path):
+        return 'blob/' + stored_path[len('https://'):]
+    return stored_path
+
+def stored_path_from_route(route_path):
+    """Inverse of image_route_path"""
+    if route_path.startswith('blob/'):
+        return 'https://' + route_path[len('blob/'):]
+    return route_path
+
 def get_file_url(stored_path):
     """Get the full URL for a stored file"""
     if stored_path.startswith('https://'):
@@ -75,14 +134,11 @@ def get_file_url(stored_path):
 
 def optimize_image_url(stored_path, size='medium', quality=85):
     """Generate optimized image URL"""
-    if stored_path.startswith('https://'):
-        # For Blob storage, we can add query parameters for optimization
-        # Vercel automatically optimizes images from Blob storage
-        return f"{stored_path}?w={get_size_width(size)}&q={quality}"
-    else:
-        # For local development, use our optimization API
-        from flask import url_for
-        return url_for('api.optimize_image_api', filename=stored_path, size=size, quality=quality)
+    from flask import url_for
+    params = {'size': size}
+    if quality != 85:
+        params['quality'] = quality
+    return url_for('api.optimize_image_api', filename=image_route_path(stored_path), **params)
 
 def get_size_width(size):
     """Get pixel width for size preset"""
@@ -93,3 +149,73 @@ def get_size_width(size):
         'large': 1200
     }
     return sizes.get(size, 600)
+
+# Presets offered to the browser in srcset, smallest first
+SRCSET_PRESETS = ('thumb', 'small', 'medium', 'large')
+
+def preset_dimensions(size, width, height):
+    """Dimensions of a preset derivative of a width x height original
+
+    Derivatives are scaled to fit a square box of the preset width and
+    never upscaled, matching image_service.render_derivatives.
+    """
+    box = get_size_width(size)
+    scale = min(1, box / width, box / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def responsive_image_attrs(stored_path, width=None, height=None, size='medium', sizes='100vw', style=None,
+                           placeholder=None, color=None):
+    """Responsive <img> attributes for a stored image; see image_attrs"""
+    return image_attrs(
+        lambda preset: optimize_image_url(stored_path, preset),
+        width, height, size, sizes, style, placeholder, color
+    )
+
+def image_attrs(url_for_size, width=None, height=None, size='medium', sizes='100vw', style=None,
+                placeholder=None, color=None):
+    """src, srcset, sizes, width/height and aspect-ratio attributes for an <img>
+
+    url_for_size maps a size preset to the URL serving that variant.
+
+    srcset lists every preset with its real width, so the browser fetches
+    the smallest variant that covers the rendered size; presets that would
+    be no smaller than a previous one (small originals) are left out. With
+    unknown dimensions the preset widths are used as upper bounds and the
+    width/height attributes are omitted. size picks the src fallback.
+
+    placeholder (an inline data: URI) and color are painted as the
+    element's background, so the box is filled on first paint; data-lqip
+    lets script.js clear it once the image loads.
+    """
+    from markupsafe import Markup, escape
+
+    known = bool(width and height)
+    candidates = []
+    seen = set()
+    for preset in SRCSET_PRESETS:
+        preset_width = preset_dimensions(preset, width, height)[0] if known else get_size_width(preset)
+        if preset_width in seen:
+            continue
+        seen.add(preset_width)
+        candidates.append(f"{url_for_size(preset)} {preset_width}w")
+
+    attrs = [
+        f'src="{escape(url_for_size(size))}"',
+        f'srcset="{escape(", ".join(candidates))}"',
+        f'sizes="{escape(sizes)}"',
+    ]
+    styles = [style.rstrip('; ')] if style else []
+    if known:
+        # Intrinsic size of the src variant; reserves the box before load
+        src_width, src_height = preset_dimensions(size, width, height)
+        attrs.append(f'width="{src_width}" height="{src_height}"')
+        styles.append(f'aspect-ratio: {width} / {height}')
+    if placeholder or color:
+        background = [color] if color else []
+        if placeholder:
+            background.append(f"url('{placeholder}') center / cover no-repeat")
+            attrs.append('data-lqip')
+        styles.append(f"background: {' '.join(background)}")
+    if styles:
+        attrs.append(f'style="{escape("; ".join(styles))};"')
+    return Markup(' '.join(attrs))
@@ -0,0 +1,43 @@
+import math
+
+TAG_CLOUD_SIZE = 40
+TAG_CLOUD_LEVELS = 5
+
+def tag_cloud_query(limit=TAG_CLOUD_SIZE):
+    """Statement for the most used tags, read off their precomputed counts"""
+    return ('''
+        SELECT name, image_count FROM tags
+        WHERE image_count > 0
+        ORDER BY image_count DESC, name
+        LIMIT ?
+    ''', (limit,), 'all')
+
+def image_tags_query(image_id):
+    """Statement for one gallery image's tags"""
+    return ('''
+        SELECT tags.name, tags.image_count FROM gallery_image_tags
+        JOIN tags ON tags.id = gallery_image_tags.tag_id
+        WHERE gallery_image_tags.image_id = ?
+        ORDER BY tags.name
+    ''', (image_id,), 'all')
+
+def build_tag_cloud(rows):
+    """Alphabetical cloud entries with a 1..TAG_CLOUD_LEVELS size level
+
+    Levels follow the log of the count, so one very popular tag does not
+    flatten everything else to the smallest size.
+    """
+    rows = list(rows or [])
+    if not rows:
+        return []
+    counts = [math.log(row['image_count']) for row in rows]
+    low, high = min(counts), max(counts)
+    spread = (high - low) or 1
+    return sorted((
+        {
+            'name': row['name'],
+            'count': row['image_count'],
+            'level': 1 + round((count - low) / spread * (TAG_CLOUD_LEVELS - 1)),
+        }
+        for row, count in zip(rows, counts)
+    ), key=lambda entry: entry['name'].lower())
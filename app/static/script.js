@@ -1,7 +1,7 @@
 class ErrorLogger{static log(error,context=''){const timestamp=new Date().toISOString();const errorInfo={timestamp,context,message:error.message||'Unknown error',stack:error.stack||'No stack trace available',userAgent:navigator.userAgent,url:window.location.href};console.error('Error logged:',errorInfo);if(window.gtag){window.gtag('event','exception',{description:`${context}: ${error.message}`,fatal:!1})}}
 static showUserMessage(message,type='error'){try{let notification=document.querySelector('.error-notification');if(!notification){notification=document.createElement('div');notification.className=`error-notification ${type}`;document.body.appendChild(notification)}
 notification.textContent=message;notification.classList.add('show');setTimeout(()=>{notification.classList.remove('show')},5000)}catch(e){alert(message)}}}
-document.addEventListener('DOMContentLoaded',function(){try{initializeNavigation();initializeGallery();initializeVoting();initializePageFeatures()}catch(error){ErrorLogger.log(error,'DOMContentLoaded initialization')}});function initializeNavigation(){try{const navTabs=document.querySelectorAll('.nav-tab');const contentSections=document.querySelectorAll('.content-section');if(navTabs.length===0){console.warn('No navigation tabs found');return}
+document.addEventListener('DOMContentLoaded',function(){try{initializeNavigation();initializeGallery();initializeVoting();initializeNotifications();initializePlaceholders();initializePageFeatures()}catch(error){ErrorLogger.log(error,'DOMContentLoaded initialization')}});function initializeNavigation(){try{const navTabs=document.querySelectorAll('.nav-tab');const contentSections=document.querySelectorAll('.content-section');if(navTabs.length===0){console.warn('No navigation tabs found');return}
 navTabs.forEach((tab,index)=>{try{tab.addEventListener('click',function(e){try{e.preventDefault();navTabs.forEach(t=>{try{t.classList.remove('active')}catch(err){ErrorLogger.log(err,`Removing active class from nav tab ${t.dataset.section || 'unknown'}`)}});contentSections.forEach(s=>{try{s.classList.remove('active')}catch(err){ErrorLogger.log(err,'Removing active class from content section')}});this.classList.add('active');const sectionName=this.dataset.section;if(!sectionName){throw new Error('Tab missing data-section attribute')}
 const targetSection=document.querySelector(`.${sectionName}-section`);if(targetSection){targetSection.classList.add('active')}else{console.warn(`Target section .${sectionName}-section not found`)}}catch(error){ErrorLogger.log(error,`Navigation tab click handler for ${this.dataset.section || 'unknown'}`);ErrorLogger.showUserMessage('Navigation error occurred. Please refresh the page.')}})}catch(error){ErrorLogger.log(error,`Adding click listener to nav tab ${index}`)}});try{const defaultTab=document.querySelector('.nav-tab[data-section="gallery"]');if(defaultTab){defaultTab.click()}}catch(error){ErrorLogger.log(error,'Clicking default navigation tab')}}catch(error){ErrorLogger.log(error,'Navigation initialization')}}
 function initializeGallery(){try{const galleryItems=document.querySelectorAll('.gallery-item');const infoPanel=document.querySelector('.info-panel .info-content');if(!infoPanel){console.warn('Info panel not found - gallery hover effects disabled');return}
@@ -13,10 +13,16 @@ infoPanel.innerHTML=infoHTML}catch(error){ErrorLogger.log(error,`Gallery item mo
                             <h4>Hover over artwork to see details! ✨</h4>
                             <p class="info-text">Click to view full size and leave comments</p>
                         `}catch(error){ErrorLogger.log(error,`Gallery item mouseleave for item ${index}`)}})}catch(error){ErrorLogger.log(error,`Adding event listeners to gallery item ${index}`)}})}catch(error){ErrorLogger.log(error,'Gallery initialization')}}
-function initializeVoting(){try{const voteButtons=document.querySelectorAll('.vote-btn');if(voteButtons.length===0){console.warn('No vote buttons found');return}
-voteButtons.forEach((button,index)=>{try{button.addEventListener('click',function(){try{const commentId=this.dataset.comment;const voteType=this.classList.contains('upvote')?'up':'down';if(!commentId){throw new Error('Vote button missing comment ID')}
-this.disabled=!0;const originalText=this.textContent;this.textContent='...';fetch('/api/vote_comment',{method:'POST',headers:{'Content-Type':'application/json',},body:JSON.stringify({comment_id:commentId,vote_type:voteType})}).then(response=>{if(!response.ok){throw new Error(`HTTP error! status: ${response.status}`)}
-return response.json()}).then(result=>{try{if(result.success){const upvoteBtn=document.querySelector(`.upvote[data-comment="${commentId}"]`);const downvoteBtn=document.querySelector(`.downvote[data-comment="${commentId}"]`);if(upvoteBtn)upvoteBtn.textContent=`↑ ${result.upvotes || 0}`;if(downvoteBtn)downvoteBtn.textContent=`↓ ${result.downvotes || 0}`;this.style.transform='scale(1.2)';setTimeout(()=>{this.style.transform='scale(1)'},200)}else{throw new Error(result.message||'Voting failed')}}catch(error){ErrorLogger.log(error,'Processing vote response');ErrorLogger.showUserMessage('Error processing vote result')}}).catch(error=>{ErrorLogger.log(error,`Voting for comment ${commentId}`);ErrorLogger.showUserMessage('Error voting. Please try again.');this.textContent=originalText}).finally(()=>{this.disabled=!1})}catch(error){ErrorLogger.log(error,`Vote button click handler for comment ${this.dataset.comment || 'unknown'}`);ErrorLogger.showUserMessage('Error processing vote');this.disabled=!1}})}catch(error){ErrorLogger.log(error,`Adding click listener to vote button ${index}`)}})}catch(error){ErrorLogger.log(error,'Vote button initialization')}}
+function initializeVoting(){try{document.addEventListener('click',function(e){try{const button=e.target.closest('.vote-btn');if(button&&!button.disabled){handleVoteClick(button)}}catch(error){ErrorLogger.log(error,'Delegated vote click')}})}catch(error){ErrorLogger.log(error,'Vote button initialization')}}
+function initializePlaceholders(){try{document.addEventListener('load',function(e){try{if(e.target.hasAttribute&&e.target.hasAttribute('data-lqip')){clearPlaceholder(e.target)}}catch(error){ErrorLogger.log(error,'Delegated placeholder load')}},!0);document.querySelectorAll('img[data-lqip]').forEach(img=>{if(img.complete&&img.naturalWidth){clearPlaceholder(img)}})}catch(error){ErrorLogger.log(error,'Placeholder initialization')}}
+function initializeNotifications(){try{document.addEventListener('click',function(e){try{const button=e.target.closest('.mark-read-btn');if(button&&!button.disabled){handleMarkRead(button)}}catch(error){ErrorLogger.log(error,'Delegated mark read click')}})}catch(error){ErrorLogger.log(error,'Notification initialization')}}
+function handleMarkRead(button){const notificationId=button.dataset.notification;const body=notificationId?{ids:[Number(notificationId)]}:{all:!0,up_to:button.dataset.upTo?Number(button.dataset.upTo):null};button.disabled=!0;fetch('/api/notifications/read',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(body)}).then(response=>{if(!response.ok){throw new Error(`HTTP error! status: ${response.status}`)}
+return response.json()}).then(data=>{if(!data.success){throw new Error(data.message||'Failed to mark notifications read')}
+const items=notificationId?[button.closest('.notification-item')]:document.querySelectorAll('.notification-item.unread');items.forEach(item=>{if(!item)return;item.classList.remove('unread');const itemButton=item.querySelector('.mark-read-btn');if(itemButton){itemButton.remove()}});document.querySelectorAll('.unread-count').forEach(count=>{count.textContent=data.unread});const markAll=document.querySelector('.mark-all-read');if(markAll&&data.unread===0){markAll.remove()}else if(markAll===button){button.disabled=!1}}).catch(error=>{ErrorLogger.log(error,'Marking notifications read');button.disabled=!1})}
+function clearPlaceholder(img){img.style.background='none';img.removeAttribute('data-lqip')}
+function handleVoteClick(button){try{const commentId=button.dataset.comment;const voteType=button.classList.contains('upvote')?'up':'down';if(!commentId){throw new Error('Vote button missing comment ID')}
+button.disabled=!0;const originalText=button.textContent;button.textContent='...';fetch('/api/vote_comment',{method:'POST',headers:{'Content-Type':'application/json',},body:JSON.stringify({comment_id:commentId,vote_type:voteType})}).then(response=>{if(!response.ok){throw new Error(`HTTP error! status: ${response.status}`)}
+return response.json()}).then(result=>{try{if(result.success){const upvoteBtn=document.querySelector(`.upvote[data-comment="${commentId}"]`);const downvoteBtn=document.querySelector(`.downvote[data-comment="${commentId}"]`);if(upvoteBtn)upvoteBtn.textContent=`↑ ${result.upvotes || 0}`;if(downvoteBtn)downvoteBtn.textContent=`↓ ${result.downvotes || 0}`;button.style.transform='scale(1.2)';setTimeout(()=>{button.style.transform='scale(1)'},200)}else{throw new Error(result.message||'Voting failed')}}catch(error){ErrorLogger.log(error,'Processing vote response');ErrorLogger.showUserMessage('Error processing vote result')}}).catch(error=>{ErrorLogger.log(error,`Voting for comment ${commentId}`);ErrorLogger.showUserMessage('Error voting. Please try again.');button.textContent=originalText}).finally(()=>{button.disabled=!1})}catch(error){ErrorLogger.log(error,`Vote button click handler for comment ${button.dataset.comment || 'unknown'}`);ErrorLogger.showUserMessage('Error processing vote');button.disabled=!1}}
 function _calculatePrice(){try{const form=document.getElementById('commissionForm');if(!form){throw new Error('Commission form not found')}
 const formData=new FormData(form);const data={type:formData.get('type'),multiple_characters:document.getElementById('multipleChars')?.checked||!1,nsfw:document.getElementById('nsfw')?.checked||!1,rush:document.getElementById('rush')?.checked||!1,unrendered:document.getElementById('unrendered')?.checked||!1,indonesian_discount:document.getElementById('indonesian')?.checked||!1};if(!data.type){throw new Error('Please select a commission type')}
 const submitButton=form.querySelector('button[type="button"]');if(submitButton){submitButton.disabled=!0;submitButton.textContent='Calculating...'}
@@ -25,15 +31,20 @@ return response.json()}).then(result=>{try{if(result.error){throw new Error(resu
 const basePriceEl=document.getElementById('basePrice');const totalPriceEl=document.getElementById('totalPrice');const priceResultEl=document.getElementById('priceResult');if(!basePriceEl||!totalPriceEl||!priceResultEl){throw new Error('Price display elements not found')}
 basePriceEl.textContent=result.base_price||'N/A';totalPriceEl.textContent=result.total_price||'N/A';priceResultEl.style.display='block';priceResultEl.style.opacity='0';priceResultEl.style.transform='translateY(20px)';setTimeout(()=>{priceResultEl.style.transition='all 0.5s ease';priceResultEl.style.opacity='1';priceResultEl.style.transform='translateY(0)'},100)}catch(error){ErrorLogger.log(error,'Processing price calculation result');ErrorLogger.showUserMessage('Error displaying price calculation')}}).catch(error=>{ErrorLogger.log(error,'Price calculation request');ErrorLogger.showUserMessage('Error calculating price. Please try again.')}).finally(()=>{if(submitButton){submitButton.disabled=!1;submitButton.textContent='Calculate Price'}})}catch(error){ErrorLogger.log(error,'Price calculation initialization');ErrorLogger.showUserMessage('Error initializing price calculation')}}
 function toggleClothing(itemId){try{if(!itemId){throw new Error('No item ID provided')}
-const clothingItem=document.getElementById(itemId);if(!clothingItem){throw new Error(`Clothing item with ID ${itemId} not found`)}
-const isHidden=clothingItem.style.opacity==='0'||clothingItem.style.opacity==='';if(isHidden){clothingItem.style.opacity='1';clothingItem.style.visibility='visible'}else{clothingItem.style.opacity='0';clothingItem.style.visibility='hidden'}}catch(error){ErrorLogger.log(error,`Toggle clothing for item ${itemId}`);ErrorLogger.showUserMessage('Error toggling clothing item')}}
+const outfit=document.querySelector('img[data-outfit]');if(!outfit){throw new Error('Outfit image not found')}
+updateOutfit(outfit)}catch(error){ErrorLogger.log(error,`Toggle clothing for item ${itemId}`);ErrorLogger.showUserMessage('Error toggling clothing item')}}
+function updateOutfit(img,version){const inputs=[...document.querySelectorAll('.clothing-toggle input[data-item]')];const checked=inputs.filter(input=>input.checked).map(input=>Number(input.dataset.item.replace('item-',''))).sort((a,b)=>a-b);const rewrite=url=>{const outfitUrl=new URL(url,window.location.href);if(checked.length===inputs.length){outfitUrl.searchParams.delete('items')}else{outfitUrl.searchParams.set('items',checked.join(','))}
+if(version){outfitUrl.searchParams.set('v',version)}
+return outfitUrl.pathname+outfitUrl.search};if(img.srcset){img.srcset=img.srcset.split(', ').map(candidate=>{const[url,descriptor]=candidate.split(' ');return`${rewrite(url)} ${descriptor}`}).join(', ')}
+img.src=rewrite(img.getAttribute('src'))}
 function toggleReply(commentId){try{if(!commentId){throw new Error('No comment ID provided')}
 const replyForm=document.getElementById(`reply-${commentId}`);if(!replyForm){throw new Error(`Reply form for comment ${commentId} not found`)}
 const isHidden=replyForm.style.display==='none'||replyForm.style.display==='';if(isHidden){replyForm.style.display='block';replyForm.style.opacity='0';replyForm.style.transform='translateY(-10px)';setTimeout(()=>{replyForm.style.transition='all 0.3s ease';replyForm.style.opacity='1';replyForm.style.transform='translateY(0)'},50)}else{replyForm.style.opacity='0';replyForm.style.transform='translateY(-10px)';setTimeout(()=>{replyForm.style.display='none'},300)}}catch(error){ErrorLogger.log(error,`Toggle reply for comment ${commentId}`);ErrorLogger.showUserMessage('Error toggling reply form')}}
 function initializePageFeatures(){try{adjustGalleryLayout();adjustCharacterCanvas();enhanceFormExperience();animateNotifications();initializeSmoothScrolling();try{const lazyLoader=new LazyLoader()}catch(error){ErrorLogger.log(error,'LazyLoader initialization')}
 try{const responsiveHandler=new ResponsiveHandler()}catch(error){ErrorLogger.log(error,'ResponsiveHandler initialization')}
 try{const performanceMonitor=new PerformanceMonitor()}catch(error){ErrorLogger.log(error,'PerformanceMonitor initialization')}
-try{const ocId=document.body.dataset.ocId;if(ocId){new ClothingReorderer(ocId)}}catch(error){ErrorLogger.log(error,'ClothingReorderer initialization')}}catch(error){ErrorLogger.log(error,'Page features initialization')}}
+try{const ocId=document.body.dataset.ocId;if(ocId){new ClothingReorderer(ocId)}}catch(error){ErrorLogger.log(error,'ClothingReorderer initialization')}
+try{document.querySelectorAll('.comments-section[data-content-type]').forEach(section=>{new CommentLoader(section)})}catch(error){ErrorLogger.log(error,'CommentLoader initialization')}}catch(error){ErrorLogger.log(error,'Page features initialization')}}
 function adjustGalleryLayout(){try{const galleryItems=document.querySelectorAll('.gallery-item');galleryItems.forEach((item,index)=>{try{const img=item.querySelector('img');if(img){img.onload=function(){try{item.classList.add('loaded')}catch(error){ErrorLogger.log(error,`Adding loaded class to gallery item ${index}`)}};img.onerror=function(){ErrorLogger.log(new Error('Image failed to load'),`Gallery image load error for item ${index}`);item.classList.add('error')}}}catch(error){ErrorLogger.log(error,`Processing gallery item ${index}`)}})}catch(error){ErrorLogger.log(error,'Adjusting gallery layout')}}
 function adjustCharacterCanvas(){try{const canvas=document.getElementById('characterCanvas');if(!canvas){return}
 const baseCharacter=document.getElementById('baseCharacter');if(baseCharacter){const clothingItems=document.querySelectorAll('.clothing-item');clothingItems.forEach((item,index)=>{try{item.style.position='absolute';item.style.top='0';item.style.left='50%';item.style.transform='translateX(-50%)'}catch(error){ErrorLogger.log(error,`Positioning clothing item ${index}`)}})}}catch(error){ErrorLogger.log(error,'Adjusting character canvas')}}
@@ -79,10 +90,32 @@ handleDrop(e){try{e.preventDefault();this.updateZIndices()}catch(error){ErrorLog
 handleDragEnd(e){try{e.target.classList.remove('dragging');this.draggedElement=null}catch(error){ErrorLogger.log(error,'Handling drag end')}}
 getDragAfterElement(container,y){try{const draggableElements=[...container.querySelectorAll('.clothing-toggle:not(.dragging)')];return draggableElements.reduce((closest,child)=>{try{const box=child.getBoundingClientRect();const offset=y-box.top-box.height/2;if(offset<0&&offset>closest.offset){return{offset:offset,element:child}}else{return closest}}catch(error){ErrorLogger.log(error,'Processing drag after element');return closest}},{offset:Number.NEGATIVE_INFINITY}).element}catch(error){ErrorLogger.log(error,'Getting drag after element');return null}}
 updateZIndices(){try{const clothingToggles=document.querySelectorAll('.clothing-toggle');const newOrder=[];clothingToggles.forEach((toggle,index)=>{try{const input=toggle.querySelector('input');if(!input||!input.dataset.item){throw new Error('Toggle missing input or data-item attribute')}
-const itemId=input.dataset.item.replace('item-','');const zIndex=clothingToggles.length-index;newOrder.push({id:itemId,z_index:zIndex});const clothingItem=document.getElementById(`item-${itemId}`);if(clothingItem){clothingItem.style.zIndex=zIndex}}catch(error){ErrorLogger.log(error,`Processing clothing toggle ${index} for z-index update`)}});fetch('/admin/reorder_clothing',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({oc_id:this.ocId,clothing_order:newOrder})}).then(response=>{if(!response.ok){throw new Error(`HTTP error! status: ${response.status}`)}
-return response.json()}).catch(error=>{ErrorLogger.log(error,'Sending clothing reorder to server');ErrorLogger.showUserMessage('Error saving clothing order')})}catch(error){ErrorLogger.log(error,'Updating z-indices')}}
+const itemId=input.dataset.item.replace('item-','');const zIndex=clothingToggles.length-index;newOrder.push({id:itemId,z_index:zIndex});toggle.dataset.zIndex=zIndex}catch(error){ErrorLogger.log(error,`Processing clothing toggle ${index} for z-index update`)}});fetch('/api/reorder_clothing',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({oc_id:this.ocId,clothing_order:newOrder})}).then(response=>{if(!response.ok){throw new Error(`HTTP error! status: ${response.status}`)}
+return response.json()}).then(result=>{const outfit=document.querySelector('img[data-outfit]');if(result.success&&result.outfit_version&&outfit){updateOutfit(outfit,result.outfit_version)}}).catch(error=>{ErrorLogger.log(error,'Sending clothing reorder to server');ErrorLogger.showUserMessage('Error saving clothing order')})}catch(error){ErrorLogger.log(error,'Updating z-indices')}}
 toggleReorderMode(){try{const clothingControls=document.querySelector('.clothing-controls');if(clothingControls){clothingControls.classList.toggle('reorder-mode')}}catch(error){ErrorLogger.log(error,'Toggling reorder mode')}}}
-class GalleryManager{constructor(){this.currentImageIndex=0;this.images=[];try{this.initLightbox()}catch(error){ErrorLogger.log(error,'GalleryManager constructor')}}
+class CommentLoader{constructor(section){this.section=section;this.contentType=section.dataset.contentType;this.contentId=section.dataset.contentId;this.loggedIn=section.dataset.loggedIn==='true';try{this.init()}catch(error){ErrorLogger.log(error,'CommentLoader constructor')}}
+init(){try{this.section.addEventListener('click',(e)=>{try{const moreComments=e.target.closest('.load-comments');if(moreComments){this.loadComments(moreComments);return}
+const moreReplies=e.target.closest('.load-replies');if(moreReplies){this.loadReplies(moreReplies)}}catch(error){ErrorLogger.log(error,'CommentLoader click handler')}})}catch(error){ErrorLogger.log(error,'CommentLoader initialization')}}
+fetchJSON(url,button){button.disabled=!0;const originalText=button.textContent;button.textContent='Loading...';return fetch(url).then(response=>{if(!response.ok){throw new Error(`HTTP error! status: ${response.status}`)}
+return response.json()}).then(result=>{if(!result.success){throw new Error(result.message||'Loading comments failed')}
+return result}).finally(()=>{button.disabled=!1;button.textContent=originalText})}
+loadComments(button){try{const url=`/api/comments/${this.contentType}/${this.contentId}?cursor=${encodeURIComponent(button.dataset.cursor)}`;this.fetchJSON(url,button).then(result=>{const list=this.section.querySelector('.comments-list');result.comments.forEach(comment=>{list.appendChild(this.renderComment(comment))});if(result.next_cursor){button.dataset.cursor=result.next_cursor}else{button.remove()}}).catch(error=>{ErrorLogger.log(error,'Loading more comments');ErrorLogger.showUserMessage('Error loading comments. Please try again.')})}catch(error){ErrorLogger.log(error,'Loading more comments')}}
+loadReplies(button){try{const rootId=button.dataset.root;const url=`/api/comments/${rootId}/replies?after=${encodeURIComponent(button.dataset.after)}`;this.fetchJSON(url,button).then(result=>{result.replies.forEach(reply=>{const container=document.getElementById(`replies-${reply.parent_id}`);if(container){container.appendChild(this.renderComment(reply))}});if(result.next_cursor){button.dataset.after=result.next_cursor}else{button.remove()}}).catch(error=>{ErrorLogger.log(error,`Loading replies for comment ${button.dataset.root}`);ErrorLogger.showUserMessage('Error loading replies. Please try again.')})}catch(error){ErrorLogger.log(error,'Loading more replies')}}
+element(tag,className,text){const el=document.createElement(tag);if(className)el.className=className;if(text!==undefined)el.textContent=text;return el}
+renderComment(comment){const el=this.element('div',comment.depth?'comment reply':'comment');el.id=`comment-${comment.id}`;el.dataset.depth=comment.depth;const header=this.element('div','comment-header');header.appendChild(this.element('strong','',comment.username||'Anonymous'));if(comment.country){header.appendChild(this.element('span','country-tag',`from ${comment.country}`))}
+header.appendChild(this.element('time','',comment.created_at));el.appendChild(header);el.appendChild(this.element('p','comment-content',comment.content));const actions=this.element('div','comment-actions');const up=this.element('button','vote-btn upvote',`↑ ${comment.upvotes || 0}`);up.dataset.comment=comment.id;const down=this.element('button','vote-btn downvote',`↓ ${comment.downvotes || 0}`);down.dataset.comment=comment.id;actions.append(up,down);if(this.loggedIn){const reply=this.element('button','reply-btn','Reply');reply.addEventListener('click',()=>toggleReply(comment.id));actions.appendChild(reply)}
+el.appendChild(actions);if(this.loggedIn){el.appendChild(this.renderReplyForm(comment))}
+const replies=this.element('div','replies');replies.id=`replies-${comment.id}`;(comment.replies||[]).forEach(reply=>{replies.appendChild(this.renderComment(reply))});el.appendChild(replies);if(comment.more_replies){const more=this.element('button','reply-btn load-replies','Load more replies');more.dataset.root=comment.id;more.dataset.after=comment.replies_cursor;el.appendChild(more)}
+return el}
+renderReplyForm(comment){const wrapper=this.element('div','reply-form');wrapper.id=`reply-${comment.id}`;wrapper.style.display='none';const form=this.element('form');form.method='POST';form.action='/api/add_comment';[['content_type',this.contentType],['content_id',this.contentId],['parent_id',comment.id]].forEach(([name,value])=>{const input=this.element('input');input.type='hidden';input.name=name;input.value=value;form.appendChild(input)});const textarea=this.element('textarea');textarea.name='comment';textarea.placeholder=`Reply to ${comment.username || 'Anonymous'}...`;textarea.required=!0;form.append(textarea,this.element('button','','Reply'));wrapper.appendChild(form);return wrapper}}
+class GalleryManager{constructor(){this.currentImageIndex=0;this.images=[];try{this.initLightbox();this.initInfiniteScroll()}catch(error){ErrorLogger.log(error,'GalleryManager constructor')}}
+initInfiniteScroll(){try{document.querySelectorAll('.feed-more[data-feed]').forEach(more=>{try{const container=document.querySelector(`[data-feed-items="${more.dataset.feed}"]`);if(!container)return;const link=more.querySelector('a');if(link){link.addEventListener('click',(e)=>{e.preventDefault();this.loadMore(more,container)})}
+if('IntersectionObserver' in window){more.observer=new IntersectionObserver((entries)=>{entries.forEach(entry=>{if(entry.isIntersecting){this.loadMore(more,container)}})},{rootMargin:'400px 0px'});more.observer.observe(more)}}catch(error){ErrorLogger.log(error,`Setting up infinite scroll for ${more.dataset.feed}`)}})}catch(error){ErrorLogger.log(error,'Infinite scroll initialization')}}
+loadMore(more,container){try{if(more.dataset.loading==='true')return;more.dataset.loading='true';const params=new URLSearchParams({after:more.dataset.cursor});if(more.dataset.tag){params.set('tag',more.dataset.tag)}fetch(`/api/feed/${more.dataset.feed}?${params}`).then(response=>{if(!response.ok){throw new Error(`HTTP error! status: ${response.status}`)}
+return response.json()}).then(result=>{if(!result.success){throw new Error(result.message||'Loading more items failed')}
+container.insertAdjacentHTML('beforeend',result.html);more.dataset.loading='false';if(!result.next_cursor){if(more.observer)more.observer.disconnect();more.remove();return}
+more.dataset.cursor=result.next_cursor;const link=more.querySelector('a');if(link){const url=new URL(link.href);url.searchParams.set('after',result.next_cursor);link.href=url.toString()}
+if(more.getBoundingClientRect().top<window.innerHeight){this.loadMore(more,container)}}).catch(error=>{more.dataset.loading='false';ErrorLogger.log(error,`Loading more ${more.dataset.feed}`);ErrorLogger.showUserMessage('Error loading more items. Please try again.')})}catch(error){ErrorLogger.log(error,'Loading more feed items')}}
 initLightbox(){try{const lightbox=document.createElement('div');lightbox.className='lightbox-overlay';lightbox.innerHTML=`
                 <div class="lightbox-content">
                     <button class="lightbox-close">&times;</button>
@@ -126,15 +159,26 @@ switchTheme(themeName){try{if(!this.themes[themeName]){throw new Error(`Theme ${
 this.currentTheme=themeName;this.setSavedTheme(themeName);this.applyTheme(themeName)}catch(error){ErrorLogger.log(error,`Switching theme to ${themeName}`)}}
 applyTheme(themeName){try{document.body.className=`theme-${themeName}`;const root=document.documentElement;if(!root){throw new Error('Document root not found')}
 switch(themeName){case 'autumn':root.style.setProperty('--primary-cream','#FFF4E6');root.style.setProperty('--dusty-rose','#C17A74');root.style.setProperty('--sage-green','#8B7355');root.style.setProperty('--golden-yellow','#D4A574');break;case 'spring':root.style.setProperty('--primary-cream','#F8FFF8');root.style.setProperty('--dusty-rose','#F8C8DC');root.style.setProperty('--sage-green','#90EE90');root.style.setProperty('--golden-yellow','#FFE135');break;case 'winter':root.style.setProperty('--primary-cream','#F0F8FF');root.style.setProperty('--dusty-rose','#B6D7FF');root.style.setProperty('--sage-green','#4F94CD');root.style.setProperty('--golden-yellow','#E6E6FA');break;default:root.style.setProperty('--primary-cream','#FFF8E7');root.style.setProperty('--dusty-rose','#D4A5A5');root.style.setProperty('--sage-green','#9CAF88');root.style.setProperty('--golden-yellow','#E8D5A3')}}catch(error){ErrorLogger.log(error,`Applying theme ${themeName}`)}}}
-class SearchManager{constructor(){try{this.createSearchBar();this.setupSearch()}catch(error){ErrorLogger.log(error,'SearchManager constructor')}}
+class SearchManager{constructor(){try{this.timer=null;this.controller=null;this.query='';this.createSearchBar();this.setupSearch()}catch(error){ErrorLogger.log(error,'SearchManager constructor')}}
 createSearchBar(){try{const searchContainer=document.createElement('div');searchContainer.className='search-container';searchContainer.innerHTML=`
                 <input type="text" class="search-input" placeholder="Search artwork, characters, or blog posts...">
                 <button class="search-clear" style="display: none;">&times;</button>
+                <div class="search-results" style="display: none;"></div>
             `;const topNav=document.querySelector('.top-nav');if(topNav){topNav.appendChild(searchContainer)}else{console.warn('Top navigation not found - search bar not added')}}catch(error){ErrorLogger.log(error,'Creating search bar')}}
-setupSearch(){try{const searchInput=document.querySelector('.search-input');const searchClear=document.querySelector('.search-clear');if(searchInput){searchInput.addEventListener('input',(e)=>{try{const query=e.target.value.toLowerCase().trim();if(query.length>0){if(searchClear)searchClear.style.display='block';this.performSearch(query)}else{if(searchClear)searchClear.style.display='none';this.clearSearch()}}catch(error){ErrorLogger.log(error,'Processing search input')}})}
+setupSearch(){try{const searchInput=document.querySelector('.search-input');const searchClear=document.querySelector('.search-clear');if(searchInput){searchInput.addEventListener('input',(e)=>{try{const query=e.target.value;if(query.trim().length>0){if(searchClear)searchClear.style.display='block';clearTimeout(this.timer);this.timer=setTimeout(()=>this.performSearch(query),200)}else{if(searchClear)searchClear.style.display='none';this.clearSearch()}}catch(error){ErrorLogger.log(error,'Processing search input')}})}
 if(searchClear){searchClear.addEventListener('click',()=>{try{if(searchInput){searchInput.value='';searchClear.style.display='none';this.clearSearch()}}catch(error){ErrorLogger.log(error,'Clearing search')}})}}catch(error){ErrorLogger.log(error,'Setting up search functionality')}}
-performSearch(query){try{const galleryItems=document.querySelectorAll('.gallery-item');galleryItems.forEach(item=>{try{const title=(item.dataset.title||'').toLowerCase();const caption=(item.dataset.caption||'').toLowerCase();if(title.includes(query)||caption.includes(query)){item.style.display='block';item.classList.add('search-match')}else{item.style.display='none';item.classList.remove('search-match')}}catch(error){ErrorLogger.log(error,'Processing gallery item in search')}});const ocFolders=document.querySelectorAll('.oc-folder');ocFolders.forEach(folder=>{try{const nameElement=folder.querySelector('.folder-tab');const name=(nameElement?.textContent||'').toLowerCase();if(name.includes(query)){folder.style.display='block';folder.classList.add('search-match')}else{folder.style.display='none';folder.classList.remove('search-match')}}catch(error){ErrorLogger.log(error,'Processing OC folder in search')}});const blogPosts=document.querySelectorAll('.blog-preview');blogPosts.forEach(post=>{try{const titleElement=post.querySelector('.post-title');const summaryElement=post.querySelector('.post-summary');const title=(titleElement?.textContent||'').toLowerCase();const summary=(summaryElement?.textContent||'').toLowerCase();if(title.includes(query)||summary.includes(query)){post.style.display='block';post.classList.add('search-match')}else{post.style.display='none';post.classList.remove('search-match')}}catch(error){ErrorLogger.log(error,'Processing blog post in search')}})}catch(error){ErrorLogger.log(error,`Performing search for query: ${query}`)}}
-clearSearch(){try{const allItems=document.querySelectorAll('.gallery-item, .oc-folder, .blog-preview');allItems.forEach(item=>{try{item.style.display='block';item.classList.remove('search-match')}catch(error){ErrorLogger.log(error,'Clearing search result for item')}})}catch(error){ErrorLogger.log(error,'Clearing search results')}}}
+performSearch(query,cursor){try{const results=document.querySelector('.search-results');if(!results)return;if(this.controller){this.controller.abort()}
+this.controller=new AbortController();this.query=query;const params=new URLSearchParams({q:query});if(cursor){params.set('cursor',cursor)}
+fetch(`/api/search?${params}`,{signal:this.controller.signal}).then(response=>{if(!response.ok){throw new Error(`HTTP error! status: ${response.status}`)}
+return response.json()}).then(data=>{if(!data.success){throw new Error(data.message||'Search failed')}
+if(!cursor){results.innerHTML=''}
+const more=results.querySelector('.search-more');if(more){more.remove()}
+data.results.forEach(result=>{results.appendChild(this.renderResult(result))});if(!results.children.length){const empty=document.createElement('p');empty.className='search-empty';empty.textContent='No matches';results.appendChild(empty)}
+if(data.next_cursor){const button=document.createElement('button');button.type='button';button.className='search-more';button.textContent='More results';button.addEventListener('click',()=>this.performSearch(this.query,data.next_cursor));results.appendChild(button)}
+results.style.display='block'}).catch(error=>{if(error.name!=='AbortError'){ErrorLogger.log(error,`Performing search for query: ${query}`)}})}catch(error){ErrorLogger.log(error,`Performing search for query: ${query}`)}}
+renderResult(result){const link=document.createElement('a');link.className='search-result';link.href=result.url;const type=document.createElement('span');type.className='search-result-type';type.textContent=result.type==='oc'?'Character':result.type==='blog'?'Blog':'Gallery';const title=document.createElement('strong');title.textContent=result.title;const excerpt=document.createElement('span');excerpt.className='search-result-excerpt';excerpt.innerHTML=result.excerpt;link.append(type,title,excerpt);return link}
+clearSearch(){try{clearTimeout(this.timer);if(this.controller){this.controller.abort();this.controller=null}
+const results=document.querySelector('.search-results');if(results){results.innerHTML='';results.style.display='none'}}catch(error){ErrorLogger.log(error,'Clearing search results')}}}
 let galleryManager,themeManager,searchManager;document.addEventListener('DOMContentLoaded',function(){try{try{galleryManager=new GalleryManager()}catch(error){ErrorLogger.log(error,'GalleryManager initialization')}try{themeManager=new ThemeManager()}catch(error){ErrorLogger.log(error,'ThemeManager initialization')}try{searchManager=new SearchManager()}catch(error){ErrorLogger.log(error,'SearchManager initialization')}}
 catch(error){ErrorLogger.log(error,'Secondary DOMContentLoaded initialization')}});window.toggleClothing=function(itemId){try{toggleClothing(itemId)}catch(error){ErrorLogger.log(error,'Global toggleClothing wrapper');ErrorLogger.showUserMessage('Error toggling clothing item')}};window.toggleReply=function(commentId){try{toggleReply(commentId)}catch(error){ErrorLogger.log(error,'Global toggleReply wrapper');ErrorLogger.showUserMessage('Error toggling reply form')}};window.calculatePrice=function(){try{_calculatePrice()}catch(error){ErrorLogger.log(error,'Global calculatePrice wrapper');ErrorLogger.showUserMessage('Error calculating price')}};window.addEventListener('error',function(event){ErrorLogger.log(event.error||new Error(event.message),'Uncaught error')});window.addEventListener('unhandledrejection',function(event){ErrorLogger.log(new Error(event.reason),'Unhandled promise rejection')});const errorNotificationCSS=`
 .error-notification{position:fixed;top:20px;right:20px;background:#f8d7da;color:#721c24;border:1px solid #f5c6cb;padding:12px 16px;border-radius:8px;font-size:14px;z-index:10000;max-width:300px;opacity:0;transform:translateY(-20px);transition:all 0.3s ease;box-shadow:0 4px 12px rgba(0,0,0,0.15)}
@@ -11,13 +11,77 @@ class Config:
     TURSO_DATABASE_URL = os.environ.get('TURSO_DATABASE_URL')
     TURSO_AUTH_TOKEN = os.environ.get('TURSO_AUTH_TOKEN')
 
+    # Shared HTTP connection pool for Turso
+    TURSO_POOL_SIZE = int(os.environ.get('TURSO_POOL_SIZE', 10))
+    TURSO_POOL_IDLE_TIMEOUT = int(os.environ.get('TURSO_POOL_IDLE_TIMEOUT', 60))
+
     if not TURSO_DATABASE_URL or not TURSO_AUTH_TOKEN:
         print("Warning: TURSO_DATABASE_URL or TURSO_AUTH_TOKEN not set.  Using SQLite fallback.")
 
+    # Startup: 'fingerprint' skips schema bootstrap when the stored schema
+    # fingerprint matches, 'always' runs migrations on every cold start
+    DB_BOOTSTRAP = os.environ.get('DB_BOOTSTRAP', 'fingerprint')
+    COLD_START_BUDGET_MS = int(os.environ.get('COLD_START_BUDGET_MS', 500))
+
+    # Query cache: 'none', 'memory' (per process) or 'disk' (shared by workers)
+    QUERY_CACHE_BACKEND = os.environ.get('QUERY_CACHE_BACKEND', 'none')
+    QUERY_CACHE_TTL = int(os.environ.get('QUERY_CACHE_TTL', 300))
+    QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', 512))
+    QUERY_CACHE_PATH = os.environ.get('QUERY_CACHE_PATH', '/tmp/cache/query_cache.db')
+
+    # Listings: items per page for /gallery, /blog, /ocs and their feeds
+    LISTING_PAGE_SIZE = int(os.environ.get('LISTING_PAGE_SIZE', 24))
+
+    # Image derivatives: worker processes that encode every size/format at
+    # upload time. Serverless hosts freeze after the response, so wait there.
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    IMAGE_DERIVATIVES_WAIT = os.environ.get(
+        'IMAGE_DERIVATIVES_WAIT', 'true' if os.environ.get('VERCEL') else 'false'
+    ).lower() == 'true'
+
+    # Reply/mention notifications are written on a background thread after
+    # a comment is posted; like derivatives, serverless hosts wait for them
+    NOTIFICATIONS_WAIT = os.environ.get(
+        'NOTIFICATIONS_WAIT', 'true' if os.environ.get('VERCEL') else 'false'
+    ).lower() == 'true'
+
+    # Byte budget for images rendered on demand (non-default qualities,
+    # images without upload-time derivatives); least recently used go first
+    IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_MB', 256)) * 1024 * 1024
+
+    # Let a fronting nginx/Apache send image files via X-Sendfile
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
+
     # Upload settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     BLOB_READ_WRITE_TOKEN = os.environ.get('BLOB_READ_WRITE_TOKEN')
 
+    # Blob uploads: files over the threshold go up as parallel multipart
+    # parts, each retried with backoff. BLOB_API_URL can point at a local
+    # stand-in server for testing.
+    BLOB_API_URL = os.environ.get('BLOB_API_URL', 'https://blob.vercel-storage.com')
+    BLOB_MULTIPART_THRESHOLD = int(os.environ.get('BLOB_MULTIPART_THRESHOLD_MB', 8)) * 1024 * 1024
+    BLOB_PART_SIZE = int(os.environ.get('BLOB_PART_SIZE_MB', 8)) * 1024 * 1024
+    BLOB_UPLOAD_CONCURRENCY = int(os.environ.get('BLOB_UPLOAD_CONCURRENCY', 3))
+    BLOB_UPLOAD_RETRIES = int(os.environ.get('BLOB_UPLOAD_RETRIES', 3))
+    BLOB_TIMEOUT = int(os.environ.get('BLOB_TIMEOUT', 30))
+
+    # Bulk gallery uploads: files stored and probed in parallel per request,
+    # and the most files (including zip members) one request may carry
+    BULK_UPLOAD_WORKERS = int(os.environ.get('BULK_UPLOAD_WORKERS', 4))
+    BULK_UPLOAD_MAX_FILES = int(os.environ.get('BULK_UPLOAD_MAX_FILES', 500))
+
+    # Comment country tags come from a local range table built with
+    # `flask build-geoip`; without one, comments are simply not tagged
+    GEOIP_DB_PATH = os.environ.get(
+        'GEOIP_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'geoip.bin')
+    )
+    GEOIP_CACHE_SIZE = int(os.environ.get('GEOIP_CACHE_SIZE', 4096))
+
+    # Proxies in front of the app whose X-Forwarded-For entries are trusted;
+    # Vercel's edge is one
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1 if os.environ.get('VERCEL') else 0))
+
     # Admin settings
     ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
     ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin123')
@@ -0,0 +1,147 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from unittest import mock
+from urllib.parse import parse_qs, unquote, urlparse
+import requests
+from app import blob_client
+from app.blob_client import BlobClient, BlobError
+
+PART_SIZE = 1024
+
+class StubBlobAPI(BaseHTTPRequestHandler):
+    """Just enough of the Blob REST API: single PUTs and multipart uploads
+
+    The server's `failures` maps a part number to how many more times that
+    part answers 503; every call is recorded in `calls`.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read(self):
+        server = self.server
+        pathname = parse_qs(urlparse(self.path).query)['pathname'][0]
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        return server, pathname, body
+
+    def do_PUT(self):
+        server, pathname, body = self._read()
+        with server.lock:
+            server.calls.append(('put', len(body)))
+            server.blobs[pathname] = body
+        self._reply(200, {'url': f'https://blob.test/{pathname}'})
+
+    def do_POST(self):
+        server, pathname, body = self._read()
+        action = self.headers['x-mpu-action']
+        if action == 'create':
+            with server.lock:
+                server.calls.append(('create',))
+                server.parts = {}
+            return self._reply(200, {'key': f'key/{pathname}', 'uploadId': 'upload-1'})
+
+        if unquote(self.headers['x-mpu-key']) != f'key/{pathname}' or self.headers['x-mpu-upload-id'] != 'upload-1':
+            return self._reply(400, {'error': 'unknown upload'})
+        if action == 'upload':
+            number = int(self.headers['x-mpu-part-number'])
+            with server.lock:
+                if server.failures.get(number, 0) > 0:
+                    server.failures[number] -= 1
+                    server.calls.append(('part-503', number))
+                    return self._reply(503, {'error': 'busy'})
+                server.calls.append(('part', number, len(body)))
+                server.parts[number] = body
+            return self._reply(200, {'etag': f'etag-{number}'})
+        if action == 'complete':
+            parts = json.loads(body)
+            with server.lock:
+                server.calls.append(('complete', [part['partNumber'] for part in parts]))
+                server.blobs[pathname] = b''.join(server.parts[part['partNumber']] for part in parts)
+            return self._reply(200, {'url': f'https://blob.test/{pathname}'})
+        if action == 'abort':
+            with server.lock:
+                server.calls.append(('abort',))
+                server.parts = {}
+            return self._reply(200, {})
+        self._reply(400, {'error': 'unknown action'})
+
+class BlobClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBlobAPI)
+        self.server.lock = threading.Lock()
+        self.server.calls = []
+        self.server.blobs = {}
+        self.server.parts = {}
+        self.server.failures = {}
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        session = requests.Session()
+        self.addCleanup(session.close)
+        # Parts below the API's 5MB minimum keep the test data small
+        with mock.patch.object(blob_client, 'MIN_PART_SIZE', PART_SIZE):
+            self.client = BlobClient(
+                'token', api_url=f'http://127.0.0.1:{self.server.server_port}',
+                part_size=PART_SIZE, multipart_threshold=PART_SIZE,
+                concurrency=2, retries=2, backoff=0, session=session
+            )
+
+    def calls(self, kind):
+        return [call for call in self.server.calls if call[0] == kind]
+
+    def test_small_file_is_one_put(self):
+        data = b'x' * PART_SIZE
+        url = self.client.put('gallery/small.png', BytesIO(data), 'image/png')
+        self.assertEqual(url, 'https://blob.test/gallery/small.png')
+        self.assertEqual(self.server.calls, [('put', len(data))])
+
+    def test_large_file_is_split_into_parts(self):
+        data = bytes(range(256)) * 14  # 3.5 parts
+        self.client.put('gallery/large.png', BytesIO(data), 'image/png')
+
+        # The first part is the read that found the file over the threshold
+        parts = sorted(self.calls('part'))
+        self.assertEqual(parts, [
+            ('part', 1, PART_SIZE + 1), ('part', 2, PART_SIZE),
+            ('part', 3, PART_SIZE), ('part', 4, len(data) - 3 * PART_SIZE - 1),
+        ])
+        self.assertEqual(self.server.calls[0], ('create',))
+        self.assertEqual(self.server.calls[-1], ('complete', [1, 2, 3, 4]))
+        self.assertEqual(self.server.blobs['gallery/large.png'], data)
+
+    def test_failed_part_is_retried(self):
+        self.server.failures = {2: 2}
+        data = b'y' * (3 * PART_SIZE + 1)
+        self.client.put('gallery/retry.png', BytesIO(data), 'image/png')
+
+        self.assertEqual(self.calls('part-503'), [('part-503', 2), ('part-503', 2)])
+        self.assertEqual(self.server.calls[-1], ('complete', [1, 2, 3]))
+        self.assertEqual(self.server.blobs['gallery/retry.png'], data)
+        self.assertEqual(self.calls('abort'), [])
+
+    def test_upload_is_aborted_when_a_part_fails_for_good(self):
+        self.server.failures = {2: 3}
+        with self.assertRaises(BlobError):
+            self.client.put('gallery/broken.png', BytesIO(b'z' * (3 * PART_SIZE)), 'image/png')
+
+        self.assertEqual(self.server.calls[-1], ('abort',))
+        self.assertEqual(self.calls('complete'), [])
+        self.assertNotIn('gallery/broken.png', self.server.blobs)
+
+if __name__ == '__main__':
+    unittest.main()